@@ -0,0 +1,164 @@
+# analytics.py
+import hashlib
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from storage import load_json, save_json
+
+def summarize_sales(orders_data, start_date, end_date, top_n=10):
+    """Aggregate revenue, daily sales and top items for a date range."""
+    filtered = [o for o in orders_data if start_date <= datetime.strptime(o['date'], "%Y-%m-%d").date() <= end_date]
+
+    total_revenue = sum(o['total'] for o in filtered)
+    total_orders = len(filtered)
+    avg_order = total_revenue / total_orders if total_orders else 0
+
+    daily_sales = {}
+    for o in filtered:
+        daily_sales[o['date']] = daily_sales.get(o['date'], 0) + o['total']
+
+    item_sales = {}
+    for o in filtered:
+        for item in o['items']:
+            name = item['name']
+            item_sales.setdefault(name, 0)
+            item_sales[name] += item['quantity']
+
+    # Tax and combo figures come from each order's stored quote, never recomputed.
+    tax_by_rate = {}
+    for o in filtered:
+        for t in o.get('tax_lines') or [{"label": "Tax", "amount": o.get('tax', 0)}]:
+            tax_by_rate[t['label']] = tax_by_rate.get(t['label'], 0) + t['amount']
+
+    return {
+        "total_revenue": total_revenue,
+        "total_orders": total_orders,
+        "avg_order": avg_order,
+        "daily_sales": sorted(daily_sales.items()),
+        "top_items": sorted(item_sales.items(), key=lambda x: x[1], reverse=True)[:top_n],
+        "total_tax": sum(tax_by_rate.values()),
+        "tax_by_rate": sorted(tax_by_rate.items()),
+        "combo_savings": sum(o.get('combo_savings', 0) for o in filtered)
+    }
+
+# --- Multi-outlet consolidation ---
+# Each branch is reduced to per-day partial aggregates, which merge cheaply for
+# any date range. Partials are cached by the source file's (mtime, size), so a
+# re-run only rescans branches whose data changed.
+
+ANALYTICS_CACHE_DIR = ".analytics_cache"
+BRANCH_ORDERS_FILE = "orders_data.json"
+BRANCH_DB_FILE = "cafe.db"
+
+def branch_source(branch_dir):
+    """Return (path, version) of the branch's order store; JSON wins over SQLite."""
+    for name in (BRANCH_ORDERS_FILE, BRANCH_DB_FILE):
+        path = os.path.join(branch_dir, name)
+        if os.path.exists(path):
+            st = os.stat(path)
+            return path, [st.st_mtime_ns, st.st_size]
+    return None, None
+
+def _iter_branch_orders(path):
+    """Yield (date, time, total, [(item_name, qty), ...]) from a JSON or SQLite store."""
+    if path.endswith(".db"):
+        conn = sqlite3.connect(path)
+        try:
+            items = {}
+            for order_id, name, qty in conn.execute(
+                    "SELECT oi.order_id, COALESCE(m.name, oi.item_id), oi.quantity FROM order_items oi "
+                    "LEFT JOIN menu_items m ON m.item_id = oi.item_id"):
+                items.setdefault(order_id, []).append((name, qty))
+            for order_id, d, t, total in conn.execute("SELECT order_id, date, time, total FROM orders"):
+                yield d, t, total or 0, items.get(order_id, [])
+        finally:
+            conn.close()
+        return
+    for o in load_json(path) or []:
+        yield o.get('date'), o.get('time'), o.get('total', 0), [(i['name'], i['quantity']) for i in o.get('items', [])]
+
+def scan_branch(path):
+    """Reduce one branch store to {date: {"revenue", "orders", "items", "hours"}}."""
+    partials = {}
+    for d, t, total, items in _iter_branch_orders(path):
+        if not d:
+            continue
+        day = partials.get(d)
+        if day is None:
+            day = partials[d] = {"revenue": 0.0, "orders": 0, "items": {}, "hours": [0] * 24}
+        day["revenue"] += total
+        day["orders"] += 1
+        for name, qty in items:
+            day["items"][name] = day["items"].get(name, 0) + qty
+        try:
+            day["hours"][int(t[:2])] += 1
+        except (TypeError, ValueError, IndexError):
+            pass
+    return partials
+
+def _cache_path(branch_dir):
+    key = hashlib.sha1(os.path.abspath(branch_dir).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(ANALYTICS_CACHE_DIR, f"{key}.json")
+
+def load_branch_partials(branch_dirs, max_workers=None):
+    """Return {branch_dir: partials}, rescanning only branches whose store changed."""
+    results, stale = {}, []
+    for branch_dir in branch_dirs:
+        path, version = branch_source(branch_dir)
+        if path is None:
+            results[branch_dir] = {}
+            continue
+        cached = load_json(_cache_path(branch_dir))
+        if cached and cached.get("path") == path and cached.get("version") == version:
+            results[branch_dir] = cached["partials"]
+        else:
+            stale.append((branch_dir, path, version))
+
+    if stale:
+        if len(stale) == 1:
+            scanned = [scan_branch(stale[0][1])]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                scanned = list(pool.map(scan_branch, [path for _, path, _ in stale]))
+        os.makedirs(ANALYTICS_CACHE_DIR, exist_ok=True)
+        for (branch_dir, path, version), partials in zip(stale, scanned):
+            save_json(_cache_path(branch_dir), {"path": path, "version": version, "partials": partials})
+            results[branch_dir] = partials
+    return results
+
+def consolidate_sales(branch_dirs, start_date, end_date, top_n=10, max_workers=None):
+    """Merge branch partials into revenue, top items and hourly load for a date range."""
+    start, end = str(start_date), str(end_date)
+    by_branch = load_branch_partials(branch_dirs, max_workers)
+
+    branch_revenue = {}
+    daily_sales = {}
+    item_sales = {}
+    hourly_orders = [0] * 24
+    total_revenue = 0.0
+    total_orders = 0
+    for branch_dir, partials in by_branch.items():
+        revenue = 0.0
+        for d, day in partials.items():
+            if not start <= d <= end:
+                continue
+            revenue += day["revenue"]
+            total_orders += day["orders"]
+            daily_sales[d] = daily_sales.get(d, 0) + day["revenue"]
+            for name, qty in day["items"].items():
+                item_sales[name] = item_sales.get(name, 0) + qty
+            for h, n in enumerate(day["hours"]):
+                hourly_orders[h] += n
+        branch_revenue[branch_dir] = revenue
+        total_revenue += revenue
+
+    return {
+        "total_revenue": total_revenue,
+        "total_orders": total_orders,
+        "avg_order": total_revenue / total_orders if total_orders else 0,
+        "daily_sales": sorted(daily_sales.items()),
+        "top_items": sorted(item_sales.items(), key=lambda x: x[1], reverse=True)[:top_n],
+        "branch_revenue": branch_revenue,
+        "hourly_orders": hourly_orders
+    }
@@ -0,0 +1,535 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the Cafe Management System hot paths.
+Generates synthetic data (see synthetic_data.py), times each case, writes the
+results as JSON and compares them against a stored baseline.
+
+Usage:
+    python benchmark.py --orders 10000 100000
+    python benchmark.py --orders 10000 --save-baseline
+    python benchmark.py --orders 1000000 --cases load_json sales_analytics
+    python benchmark.py --suite serializers --orders 10000 100000
+    python benchmark.py --suite workers --workers 1 2 4 --orders 10000   # needs >= 4 CPUs to show scaling
+
+Exits with status 1 when a case is slower than the baseline by more than
+--threshold (default 20%).
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Manager
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+import synthetic_data
+import storage
+from storage import load_json, save_json
+from orders import deduct_inventory, new_order
+from order_ids import OrderIdAllocator, max_id_number
+from analytics import summarize_sales
+from order_search import OrderSearchIndex
+from order_store import OrderStore
+from pricing import PriceBook
+from menu_search import MenuIndex
+from shared_cache import SharedCache, data_version
+import invalidation
+
+DEFAULT_BASELINE = os.path.join(HERE, "benchmark_baseline.json")
+DEFAULT_RESULTS_DIR = os.path.join(HERE, "bench_results")
+
+CASES = {}
+
+
+class Skip(Exception):
+    """Raised by a case whose optional dependency is not installed."""
+
+
+def case(name):
+    def register(fn):
+        CASES[name] = fn
+        return fn
+    return register
+
+
+def measure(fn, repeat):
+    """Run fn `repeat` times and return timing stats in milliseconds."""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - start) * 1000)
+    return {
+        "min_ms": round(min(runs), 3),
+        "median_ms": round(statistics.median(runs), 3),
+        "mean_ms": round(statistics.fmean(runs), 3),
+        "repeat": repeat
+    }
+
+
+@contextmanager
+def repo_root_cwd():
+    """bill_mail resolves its font path relative to the repository root."""
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(HERE))
+    try:
+        yield
+    finally:
+        os.chdir(cwd)
+
+
+class Dataset:
+    def __init__(self, data_dir, n_orders):
+        self.dir = data_dir
+        self.n_orders = n_orders
+        self.paths = synthetic_data.write_dataset(data_dir, n_orders=n_orders)
+        self.menu_file = self.paths["menu_data.json"]
+        self.orders_file = self.paths["orders_data.json"]
+        self.menu = load_json(self.menu_file)
+        self.orders = load_json(self.orders_file)
+        self.last_date = date.fromisoformat(self.orders[-1]["date"]) if self.orders else date.today()
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+
+# --- Cases ---
+# Each case receives a Dataset and returns the callable to time.
+
+@case("load_json")
+def bench_load_json(ds):
+    return lambda: load_json(ds.orders_file)
+
+
+@case("save_json")
+def bench_save_json(ds):
+    target = ds.path("orders_save_bench.json")
+    return lambda: save_json(target, ds.orders)
+
+
+@case("place_order")
+def bench_place_order(ds):
+    """The full New Order path: deduct inventory, save the menu, append the order."""
+    menu_file = ds.path("menu_place_bench.json")
+    orders_file = ds.path("orders_place_bench.json")
+    shutil.copyfile(ds.orders_file, orders_file)
+    menu = json.loads(json.dumps(ds.menu))
+    for t_items in menu.values():
+        for itm in t_items:
+            itm["inventory"] = 10 ** 9
+    save_json(menu_file, menu)
+    item = next(itm for t_items in menu.values() for itm in t_items)
+    cart = [{"id": item["id"], "name": item["name"], "price": item["price"],
+             "quantity": 2, "subtotal": round(item["price"] * 2, 2)}]
+
+    store = OrderStore(orders_file)
+    store.ensure()
+    allocator = OrderIdAllocator(ds.path("order_seq.json"),
+                                 seed=lambda prefix: max_id_number(store.ids(prefix), prefix))
+    book = PriceBook(load_json(ds.paths["settings.json"]) or {})
+
+    def place():
+        menu_data = load_json(menu_file)
+        deduct_inventory(menu_data, cart)
+        save_json(menu_file, menu_data)
+        store.append(new_order(allocator.next_id(), "Bench", "1", cart, book.cart(cart).quote(), "Paid"))
+    return place
+
+
+@case("cart_quote")
+def bench_cart_quote(ds):
+    """Build a 20-line cart one line at a time, quoting after each add, then empty it."""
+    items = [(section, itm) for section, t_items in ds.menu.items() for itm in t_items][:20]
+    settings = {"tax_rate": 0.1, "service_charge": 0.05, "category_tax_rates": {"beverages": 0.05, "food": 0.12},
+                "combos": [{"name": "Pair", "items": {items[0][1]["id"]: 1, items[-1][1]["id"]: 1}, "price": 1.0}]}
+    book = PriceBook(settings)
+    lines = [{"id": itm["id"], "name": itm["name"], "price": itm["price"], "quantity": 2,
+              "subtotal": round(itm["price"] * 2, 2), "category": itm["category"], "section": section}
+             for section, itm in items]
+
+    def run():
+        cart = book.cart()
+        for line in lines:
+            cart.add(line)
+            cart.quote(1.0)
+        for line in lines:
+            cart.remove(line)
+            cart.quote()
+    return run
+
+
+@case("order_lookup")
+def bench_order_lookup(ds):
+    """Fetch one order and update its status in place, as Order History does."""
+    orders_file = ds.path("orders_lookup_bench.json")
+    shutil.copyfile(ds.orders_file, orders_file)
+    store = OrderStore(orders_file)
+    store.ensure()
+    order_id = ds.orders[len(ds.orders) // 2]["id"]
+
+    def run():
+        store.get(order_id)
+        store.update(order_id, {"status": "Completed"})
+    return run
+
+
+@case("order_checkpoint")
+def bench_order_checkpoint(ds):
+    """One background checkpoint of the order history. Writers only wait for the locked copy."""
+    orders_file = ds.path("orders_checkpoint_bench.json")
+    shutil.copyfile(ds.orders_file, orders_file)
+    return lambda: storage.checkpoint_file(orders_file)
+
+
+@case("order_history_filter")
+def bench_order_history_filter(ds):
+    """Order History without a query: count and page by status and date, then read the page."""
+    orders_file = ds.path("orders_filter_bench.json")
+    shutil.copyfile(ds.orders_file, orders_file)
+    store = OrderStore(orders_file)
+    store.ensure()
+    index = OrderSearchIndex(ds.path("orders_filter_bench.db"))
+    index.add(ds.orders)
+
+    def run():
+        for status, day in [(None, None), ("Completed", ds.last_date)]:
+            index.count(status, day)
+            for order_id in index.browse(status, day, limit=20):
+                store.get(order_id)
+    return run
+
+
+@case("order_search")
+def bench_order_search(ds):
+    """A selective and a broad Order History query, then a filtered page, against a prebuilt index."""
+    index = OrderSearchIndex(ds.path("orders_search_bench.db"))
+    index.add(ds.orders)
+    last = ds.orders[-1]
+    queries = [f"{last['customer_name']} {last['items'][0]['name']}", last["id"], "5"]
+
+    def run():
+        for q in queries:
+            index.search(q, status="Completed")
+        index.count("Completed", ds.last_date)
+        index.browse("Completed", ds.last_date, limit=20)
+    return run
+
+
+@case("sales_analytics")
+def bench_sales_analytics(ds):
+    start = ds.last_date - timedelta(days=30)
+    return lambda: summarize_sales(ds.orders, start, ds.last_date)
+
+
+@case("build_pdf")
+def bench_build_pdf(ds):
+    try:
+        with repo_root_cwd():
+            from bill_mail import build_pdf
+    except (ImportError, FileNotFoundError) as e:
+        raise Skip(str(e))
+    order = max(ds.orders, key=lambda o: len(o["items"]))
+    return lambda: build_pdf(order)
+
+
+@case("generate_menu_qr")
+def bench_generate_menu_qr(ds):
+    try:
+        from menu_qr import generate_menu_qr
+    except ImportError as e:
+        raise Skip(str(e))
+    return lambda: generate_menu_qr("https://mycafe.com/menu")
+
+
+# --- Serializer comparison ---
+# Size and encode/decode speed of each available codec on realistic menu and
+# order files. Codecs whose package is not installed are left out.
+
+def serializer_codecs():
+    codecs = {
+        "json_pretty": (lambda d: json.dumps(d, indent=2).encode("utf-8"),
+                        lambda b: json.loads(b)),
+        "json_compact": (lambda d: json.dumps(d, separators=(",", ":"), ensure_ascii=False).encode("utf-8"),
+                         lambda b: json.loads(b))
+    }
+    if storage.orjson is not None:
+        codecs["orjson"] = (storage.orjson.dumps, storage.orjson.loads)
+    if storage.msgpack is not None:
+        codecs["msgpack"] = (lambda d: storage.msgpack.packb(d, use_bin_type=True),
+                             lambda b: storage.msgpack.unpackb(b, raw=False))
+    return codecs
+
+
+def run_serializer_suite(order_sizes, repeat):
+    results = {}
+    menu = synthetic_data.generate_menu(400)
+    for n_orders in order_sizes:
+        print(f"Generating {n_orders} orders...")
+        docs = {"menu": menu, "orders": synthetic_data.generate_orders(n_orders, menu)}
+        for codec, (enc, dec) in serializer_codecs().items():
+            for doc_name, data in docs.items():
+                payload = enc(data)
+                for phase, fn in (("encode", lambda: enc(data)), ("decode", lambda: dec(payload))):
+                    key = f"serialize.{codec}.{doc_name}.{phase}@{n_orders}"
+                    results[key] = measure(fn, repeat)
+                    results[key]["bytes"] = len(payload)
+                    print(f"  {key:<48} median {results[key]['median_ms']:>10.3f} ms  {len(payload) / 1024:>10.0f} KB")
+    return results
+
+
+# --- Worker scaling ---
+# N processes share one data directory, shared cache and invalidation bus (the
+# workers.py deployment without the websocket transport) and replay, for a
+# fixed time, either the till's data-path mix (menu search, a cart quote, the
+# menu QR image and an order lookup) or full Streamlit reruns of the Order
+# Management page. One request in WRITE_EVERY (RERUN_WRITE_EVERY for reruns)
+# is a stock update that every other worker has to pick up. Workers are separate processes, so throughput
+# can grow only up to the number of CPUs; on fewer CPUs than workers the
+# suite measures the cost of contention, not scaling.
+
+WRITE_EVERY = 50
+RERUN_WRITE_EVERY = 5
+WORKER_MODES = ["request", "rerun"]
+
+
+def _page_rerun(bus_dir):
+    """A logged-in session of cafe.py on Order Management; each call is one rerun
+    through Streamlit's script runner."""
+    from streamlit.logger import set_log_level
+    from streamlit.testing.v1 import AppTest
+    set_log_level("error")   # AppTest warns about running in bare mode
+    os.environ[invalidation.BUS_DIR_ENV] = bus_dir
+    os.environ["SUPABASE_URL"] = ""   # never replicate benchmark data to head office
+    at = AppTest.from_file(os.path.join(HERE, "cafe.py"), default_timeout=60)
+    at.session_state["logged_in"] = True
+    at.session_state["user"] = {"username": "admin", "role": "admin"}
+    at.run()
+    at.sidebar.selectbox[0].select("Order Management")
+
+    def rerun():
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+    return rerun
+
+
+def _worker_requests(data_dir, bus_dir, seconds, barrier, seed, mode="request"):
+    os.chdir(data_dir)
+    bus = invalidation.start(bus_dir)
+    cache = SharedCache(os.path.join(data_dir, ".shared_cache"))
+    store = OrderStore("orders_data.json")
+    order_ids = [o["id"] for o in (load_json("orders_data.json") or [])[-1000:]]
+    indexes, books = {}, {}
+    rng = random.Random(seed)
+
+    def menu_search():
+        version = data_version("menu_data.json")
+        if version not in indexes:
+            indexes.clear()
+            indexes[version] = MenuIndex(cache.document("menu_data.json"))
+        indexes[version].search(rng.choice(["latte", "pasta", "juice", "sandw"]))
+
+    def cart_quote():
+        version = data_version("settings.json")
+        if version not in books:
+            books.clear()
+            books[version] = PriceBook(cache.document("settings.json"), version)
+        menu = cache.document("menu_data.json")
+        lines = [{"id": itm["id"], "price": itm["price"], "quantity": 1, "subtotal": itm["price"],
+                  "section": section, "category": itm["category"]}
+                 for section, items in menu.items() for itm in items[:3]]
+        books[version].cart(lines).quote()
+
+    def menu_qr():
+        from menu_qr import generate_menu_qr
+        cache.blob("menu_qr", "https://mycafe.com/menu", lambda: generate_menu_qr("https://mycafe.com/menu").getvalue())
+
+    def order_lookup():
+        store.get(rng.choice(order_ids))
+
+    def stock_update():
+        with storage.file_lock("menu_data.json"):
+            menu = load_json("menu_data.json")
+            itm = rng.choice(menu["beverages"])
+            itm["inventory"] = itm.get("inventory", 0) + 1
+            save_json("menu_data.json", menu)
+
+    if mode == "rerun":
+        requests, write_every = [_page_rerun(bus_dir)], RERUN_WRITE_EVERY
+    else:
+        requests, write_every = [menu_search, cart_quote, menu_qr, order_lookup], WRITE_EVERY
+    barrier.wait(timeout=600)   # all workers start together once set up
+    deadline = time.time() + seconds
+    latencies = []
+    n = 0
+    while time.time() < deadline:
+        fn = stock_update if n % write_every == write_every - 1 else requests[n % len(requests)]
+        t0 = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - t0) * 1000)
+        n += 1
+    time.sleep(0.2)   # let the last invalidations arrive
+    in_step = cache.document("menu_data.json") == load_json("menu_data.json")
+    return latencies, list(bus.delays), in_step
+
+
+def run_worker_suite(worker_counts, n_orders, seconds, modes=WORKER_MODES):
+    results = {}
+    cpus = os.cpu_count() or 1
+    data_dir = tempfile.mkdtemp(prefix="cafe_workers_")
+    try:
+        print(f"Generating {n_orders} orders in {data_dir}...")
+        synthetic_data.write_dataset(data_dir, n_orders=n_orders)
+        OrderStore(os.path.join(data_dir, "orders_data.json")).ensure()
+        print(f"  {cpus} CPU(s): speedup is bounded by min(workers, CPUs)")
+        for mode in modes:
+            if mode == "rerun" and importlib.util.find_spec("streamlit") is None:
+                print("  workers.rerun skipped: streamlit is not installed")
+                continue
+            single = None
+            for n in worker_counts:
+                bus_dir = os.path.join(data_dir, f"bus_{mode}_{n}")
+                with Manager() as manager, ProcessPoolExecutor(max_workers=n) as pool:
+                    barrier = manager.Barrier(n)
+                    futures = [pool.submit(_worker_requests, data_dir, bus_dir, seconds, barrier, i, mode)
+                               for i in range(n)]
+                    outcomes = [f.result() for f in futures]
+                latencies = sorted(ms for lat, _, _ in outcomes for ms in lat)
+                delays = sorted(d * 1000 for _, ds, _ in outcomes for d in ds)
+                stale = sum(not in_step for _, _, in_step in outcomes)
+                throughput = len(latencies) / seconds
+                single = single or throughput
+                key = f"workers.{mode}@{n}w"
+                results[key] = {
+                    "min_ms": round(latencies[0], 3),
+                    "median_ms": round(statistics.median(latencies), 3),
+                    "mean_ms": round(statistics.fmean(latencies), 3),
+                    "repeat": len(latencies),
+                    "throughput_rps": round(throughput, 1),
+                    "speedup": round(throughput / single, 2),
+                    "cpus": cpus,
+                    "invalidation_p50_ms": round(statistics.median(delays), 3) if delays else None,
+                    "invalidation_max_ms": round(delays[-1], 3) if delays else None,
+                    "stale_workers": stale
+                }
+                print(f"  {key:<24} {throughput:>9.1f} req/s  x{throughput / single:.2f}  "
+                      f"median {results[key]['median_ms']:.3f} ms  "
+                      f"invalidation p50 {results[key]['invalidation_p50_ms']} ms over {len(delays)} messages"
+                      + (f"  ({n} workers on {cpus} CPU(s): no speedup possible)" if n > cpus else "")
+                      + (f"  ❌ {stale} worker(s) still serving a stale menu" if stale else ""))
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return results
+
+
+# --- Runner ---
+
+def run_suite(order_sizes, case_names, repeat):
+    results = {}
+    for n_orders in order_sizes:
+        data_dir = tempfile.mkdtemp(prefix=f"cafe_bench_{n_orders}_")
+        try:
+            print(f"Generating {n_orders} orders in {data_dir}...")
+            ds = Dataset(data_dir, n_orders)
+            for name in case_names:
+                key = f"{name}@{n_orders}"
+                try:
+                    fn = CASES[name](ds)
+                except Skip as e:
+                    print(f"  {key:<32} skipped ({e})")
+                    continue
+                results[key] = measure(fn, repeat)
+                print(f"  {key:<32} median {results[key]['median_ms']:>10.3f} ms")
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return the list of (key, baseline_ms, current_ms) regressions."""
+    regressions = []
+    for key, stats in results.items():
+        base = baseline.get("results", {}).get(key)
+        if not base:
+            continue
+        ratio = stats["median_ms"] / base["median_ms"] if base["median_ms"] else 1.0
+        flag = "REGRESSION" if ratio > 1 + threshold else ""
+        print(f"  {key:<32} {base['median_ms']:>10.3f} -> {stats['median_ms']:>10.3f} ms ({ratio:.2f}x) {flag}")
+        if flag:
+            regressions.append((key, base["median_ms"], stats["median_ms"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cafe hot paths")
+    parser.add_argument("--orders", type=int, nargs="+", default=[10000],
+                        help="order history sizes to benchmark (e.g. 10000 100000 1000000)")
+    parser.add_argument("--suite", choices=["hot_paths", "serializers", "workers", "all"], default="hot_paths")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4],
+                        help="worker counts for the workers suite")
+    parser.add_argument("--seconds", type=float, default=5.0, help="run time per worker count (workers suite)")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="results file (default: bench_results/<timestamp>.json)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.20,
+                        help="allowed slowdown against the baseline (0.20 = 20%%)")
+    args = parser.parse_args()
+
+    results = {}
+    if args.suite in ("hot_paths", "all"):
+        results.update(run_suite(args.orders, args.cases, args.repeat))
+    if args.suite in ("serializers", "all"):
+        results.update(run_serializer_suite(args.orders, args.repeat))
+    if args.suite in ("workers", "all"):
+        results.update(run_worker_suite(args.workers, args.orders[0], args.seconds))
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat
+        },
+        "results": results
+    }
+
+    output = args.output or os.path.join(DEFAULT_RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    baseline = load_json(args.baseline)
+    if not baseline:
+        print("No baseline found; run with --save-baseline to create one.")
+        return
+    print(f"Comparing against {args.baseline} (threshold {args.threshold:.0%}):")
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s) detected")
+        sys.exit(1)
+    print("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ from reportlab.pdfgen import canvas
 from reportlab.lib.units import cm
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
+import metrics
 
 # ---------------------------------------------------------
 # Gmail credentials
@@ -28,12 +29,30 @@ if os.path.exists(FONT_PATH):
 else:
     raise FileNotFoundError("DejaVuSans.ttf not found. Please check the FONT_PATH.")
 
+def bill_totals(order_dict: dict) -> list:
+    """(label, amount) rows from the order's stored quote, shared by the PDF and the e-mail."""
+    totals = [("Subtotal", order_dict["subtotal"])]
+    for combo in order_dict.get("combos", []):
+        totals.append((f"{combo['name']} x{combo['count']}", -combo["saving"]))
+    totals.append(("Discount", -order_dict["discount"]))
+    tax_lines = order_dict.get("tax_lines") or []
+    if tax_lines:
+        totals.extend((t["label"], t["amount"]) for t in tax_lines)
+    else:
+        totals.append(("Tax", order_dict["tax"]))
+    totals.append(("Service", order_dict["service_charge"]))
+    totals.append(("Total", order_dict["total"]))
+    return totals
+
+
+@metrics.timed("build_pdf")
 def build_pdf(order_dict: dict) -> bytes:
     """Generate a clean PDF bill with ₹ symbol support."""
     LEFT, RIGHT = 2 * cm, 17.5 * cm
     LINE_H = 0.55 * cm
 
-    rows = len(order_dict["items"]) + 6
+    totals = bill_totals(order_dict)
+    rows = len(order_dict["items"]) + len(totals) + 1
     page_height = 4 * cm + rows * LINE_H + 1 * cm
     page_size = (RIGHT + 1 * cm, page_height)
 
@@ -80,13 +99,6 @@ def build_pdf(order_dict: dict) -> bytes:
     # Totals
     y -= 0.3 * cm
     c.setFont("Helvetica-Bold", 10)
-    totals = [
-        ("Subtotal",  order_dict["subtotal"]),
-        ("Discount", -order_dict["discount"]),
-        ("Tax",       order_dict["tax"]),
-        ("Service",   order_dict["service_charge"]),
-        ("Total",     order_dict["total"])
-    ]
     for label, value in totals:
         c.drawRightString(15 * cm, y, f"{label}:")
         c.setFont("DejaVu", 10)
@@ -104,14 +116,17 @@ def build_pdf(order_dict: dict) -> bytes:
     return buffer.read()
 
 
+@metrics.timed("send_email")
 def send_email(to_email: str, order_dict: dict, pdf_bytes: bytes):
     """Send the PDF bill via email."""
     if not to_email.strip():
         return
     subject = f"Your bill – {order_dict['id']}"
+    totals = "".join(f"{label}: ₹{value:.2f}\n" for label, value in bill_totals(order_dict))
     body = (
         f"Hi {order_dict['customer_name']},\n\n"
-        f"Please find your bill attached.\n"
+        f"Please find your bill attached.\n\n"
+        f"{totals}\n"
         f"Thank you for visiting us!\n\n"
         f"Regards,\nMy Café"
     )
@@ -130,3 +145,4 @@ def send_email(to_email: str, order_dict: dict, pdf_bytes: bytes):
         srv.starttls()
         srv.login(SMTP_USERNAME, SMTP_PASSWORD)
         srv.sendmail(FROM_EMAIL, to_email.strip(), msg.as_string())
+    metrics.incr("emails_sent")
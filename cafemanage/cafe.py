@@ -1,9 +1,28 @@
 import streamlit as st
 import json
 import os
-from datetime import datetime, date
-import qrcode
-import io
+from contextlib import nullcontext
+from datetime import date
+from menu_qr import generate_menu_qr
+from storage import load_json, save_json, export_json, file_lock, file_version, recover_data_files
+from orders import ORDER_STATUSES, PAYMENT_STATUSES, deduct_inventory, new_order
+from order_actions import OutOfStock, change_orders, settle_pending
+from order_ids import get_allocator, max_id_number
+from analytics import summarize_sales, consolidate_sales
+import invalidation
+import metrics
+import profiler
+import replication
+from database import init_db, get_connection
+from menu_search import MenuIndex
+from forecast import HORIZON_DAYS, build_watchlist, menu_inventory
+from order_search import OrderSearchIndex, SEARCH_WINDOW, index_path
+from order_store import OrderStore
+from pricing import PriceBook, parse_combos, validate_combos
+from shared_cache import SharedCache, data_version
+from menu_import import template_csv, read_upload, validate, upsert_menu_file, upsert_sqlite
+from table_state import (STATUS_OPTIONS, default_tables, load_stats, summarize_stats, apply_status_updates,
+                         resize_tables)
 
 # --- File paths ---
 MENU_FILE = "menu_data.json"
@@ -60,8 +79,7 @@ def initialize_data_files():
             json.dump(default_settings, f, indent=2)
             
     if not os.path.exists(TABLES_FILE):
-        # Initialize 10 tables for the cafe
-        tables = [{"table_number": str(i), "status": "Available"} for i in range(1, 11)]
+        tables = default_tables()
         with open(TABLES_FILE, 'w') as f:
             json.dump(tables, f, indent=2)
             
@@ -74,19 +92,6 @@ def initialize_data_files():
         with open(USERS_FILE, 'w') as f:
             json.dump(default_users, f, indent=2)
 
-# --- Load and save helpers ---
-
-def load_json(filepath):
-    try:
-        with open(filepath, 'r') as f:
-            return json.load(f)
-    except Exception:
-        return None
-
-def save_json(filepath, data):
-    with open(filepath, 'w') as f:
-        json.dump(data, f, indent=2)
-
 # --- Authentication functions ---
 
 def authenticate(username, password):
@@ -96,21 +101,43 @@ def authenticate(username, password):
             return user
     return None
 
-# --- QR Code generation ---
-
-def generate_menu_qr(cafe_url):
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(cafe_url)
-    qr.make(fit=True)
-    qr_img = qr.make_image(fill_color="black", back_color="white")
-    img_buffer = io.BytesIO()
-    qr_img.save(img_buffer, format='PNG')
-    img_buffer.seek(0)
-    return img_buffer
+@st.cache_resource(show_spinner=False)
+def order_store():
+    # Shared by every session: O(1) order lookups, appends and status updates.
+    return OrderStore(ORDERS_FILE)
+
+@st.cache_resource(show_spinner=False)
+def order_search_index():
+    # One connection shared by every session; the index serialises access.
+    return OrderSearchIndex(index_path(ORDERS_FILE))
+
+@st.cache_resource(show_spinner=False)
+def shared_cache():
+    # Read-mostly documents, decoded once per version; QR images are shared with the other workers.
+    return SharedCache()
+
+@st.cache_resource(show_spinner=False)
+def recovered_files():
+    # Once per process, not per rerun: drop a torn order append left by a
+    # crash before checkpoints are considered, restore any damaged or missing
+    # file from its checkpoints, then finish an interrupted cancel or reopen.
+    order_store().ensure()
+    restored = recover_data_files([MENU_FILE, ORDERS_FILE, SETTINGS_FILE, TABLES_FILE, USERS_FILE])
+    previous_version = file_version(ORDERS_FILE)
+    updated, menu_data = settle_pending(order_store(), MENU_FILE)
+    order_search_index().add(updated, file_version(ORDERS_FILE), previous_version)
+    replication.record_orders(updated)
+    if menu_data is not None:
+        replication.record_menu(menu_data)
+    return restored
 
 # --- Initialize ---
 
+recovered_files()
 initialize_data_files()
+metrics.serve_from_env()
+invalidation.start()
+replication.start_worker(MENU_FILE)
 
 # --- Session State Init ---
 
@@ -144,9 +171,9 @@ def login_page():
 
 def dashboard_page():
     st.header("🏠 Dashboard")
-    menu_data = load_json(MENU_FILE) or {"beverages": [], "food": []}
+    menu_data = shared_cache().document(MENU_FILE) or {"beverages": [], "food": []}
     orders_data = load_json(ORDERS_FILE) or []
-    settings = load_json(SETTINGS_FILE) or {}
+    settings = shared_cache().document(SETTINGS_FILE) or {}
     
     total_items = sum(len(menu_data[key]) for key in menu_data)
     total_orders = len(orders_data)
@@ -160,11 +187,44 @@ def dashboard_page():
     col3.metric("Today's Orders", len(today_orders))
     col4.metric("Today's Revenue", f"₹{today_revenue:.2f}")
 
+    st.subheader("⚠️ Low-stock Watchlist")
+    watch = low_stock_watchlist(menu_data, orders_data)
+    menu_version = data_version(MENU_FILE)
+    if watch.menu_version != menu_version:
+        # Menu edited outside the order path (Menu Management, another terminal).
+        watch.update_inventory(menu_inventory(menu_data), menu_version)
+    watch_rows = watch.top()
+    if watch_rows:
+        st.dataframe([{"Item": r["name"], "Stock": r["inventory"], "Demand / day": r["daily_demand"],
+                       "Days left": r["days_left"]} for r in watch_rows], use_container_width=True)
+    else:
+        st.info(f"No items are projected to run out in the next {HORIZON_DAYS} days.")
+
+@st.cache_resource(show_spinner=False)
+def watchlists():
+    # {day: Watchlist} shared by every session; the forecast is rebuilt once a day.
+    return {}
+
+def low_stock_watchlist(menu_data, orders_data):
+    lists = watchlists()
+    day = str(date.today())
+    if day not in lists:
+        lists.clear()
+        lists[day] = build_watchlist(menu_data, orders_data, menu_version=data_version(MENU_FILE))
+    return lists[day]
+
+def note_stock_change(menu_data, item_ids, previous_version):
+    """Re-project only the items whose stock just changed, if today's watchlist exists."""
+    watch = watchlists().get(str(date.today()))
+    if watch:
+        stock = menu_inventory(menu_data)
+        watch.update_inventory({i: stock.get(i) for i in item_ids}, data_version(MENU_FILE), previous_version)
+
 def menu_management_page():
     st.header("📋 Menu Management")
     menu_data = load_json(MENU_FILE) or {"beverages": [], "food": []}
     
-    tab1, tab2, tab3 = st.tabs(["View Menu", "Add Item", "Edit Items"])
+    tab1, tab2, tab3, tab4 = st.tabs(["View Menu", "Add Item", "Edit Items", "Bulk Import"])
 
     with tab1:
         st.subheader("Current Menu")
@@ -220,11 +280,43 @@ def menu_management_page():
                         menu_data[item_type] = []
                     menu_data[item_type].append(new_item)
                     save_json(MENU_FILE, menu_data)
+                    replication.record_menu({item_type: [new_item]})
                     st.success(f"Added {item_name} to menu!")
                     #st.experimental_rerun()
                 else:
                     st.error("Please fill all fields.")
 
+    with tab4:
+        st.subheader("Bulk Import")
+        st.download_button("Download CSV Template", template_csv(), "menu_import_template.csv", "text/csv")
+        upload = st.file_uploader("Menu file (CSV or JSON)", type=["csv", "json"])
+        if upload is not None:
+            try:
+                upload_df = read_upload(upload.getvalue(), upload.name)
+            except Exception as e:
+                st.error(f"Could not read {upload.name}: {e}")
+            else:
+                rows, errors = validate(upload_df, menu_data)
+                col1, col2, col3 = st.columns(3)
+                col1.metric("New Items", int((rows["action"] == "insert").sum()))
+                col2.metric("Updates", int((rows["action"] == "update").sum()))
+                col3.metric("Rows with Errors", int(errors["row"].nunique()))
+                if not errors.empty:
+                    st.write("Rows with errors are skipped:")
+                    st.dataframe(errors, hide_index=True)
+                also_sqlite = st.checkbox("Also upsert into cafe.db (SQLite)")
+                if st.button(f"Import {len(rows)} valid rows", disabled=rows.empty):
+                    inserted, updated, changed = upsert_menu_file(rows, MENU_FILE)
+                    if also_sqlite:
+                        init_db()
+                        conn = get_connection()
+                        try:
+                            upsert_sqlite(changed, conn)
+                        finally:
+                            conn.close()
+                    replication.record_menu(changed)
+                    st.success(f"Imported {inserted} new and {updated} updated items")
+
     with tab3:
         st.subheader("Edit Menu Items")
         all_items = []
@@ -262,6 +354,7 @@ def menu_management_page():
                                 "inventory": int(new_inventory), "available": new_available
                             })
                             save_json(MENU_FILE, menu_data)
+                            replication.record_menu({t: [menu_data[t][i]]})
                             st.success("Item updated.")
                             st.experimental_rerun()
             with col2:
@@ -269,38 +362,156 @@ def menu_management_page():
                     t = item["_type"]
                     menu_data[t] = [itm for itm in menu_data[t] if itm["id"] != item["id"]]
                     save_json(MENU_FILE, menu_data)
+                    replication.record_menu({}, deleted_ids=[item["id"]])
                     st.success("Item deleted.")
                     st.rerun() 
+@st.cache_data(show_spinner=False)
+def table_snapshot(version):
+    # Keyed on the file version, so every widget on the page renders from one read.
+    return load_json(TABLES_FILE) or []
+
+STATUS_COLOURS = {"Available": "#2e7d32", "Occupied": "#c62828", "Reserved": "#f9a825"}
+
+def floor_plan_html(tables):
+    tiles = "".join(
+        f'<div style="background:{STATUS_COLOURS.get(t["status"], "#616161")};color:white;'
+        f'border-radius:6px;padding:6px 0;text-align:center;font-size:0.8rem">'
+        f'{t["table_number"]}</div>'
+        for t in tables)
+    return f'<div style="display:grid;grid-template-columns:repeat(auto-fill,minmax(56px,1fr));gap:6px">{tiles}</div>'
+
 def table_management_page():
     st.header("🪑 Table Management")
-    tables = load_json(TABLES_FILE) or []
-    col1, col2, col3 = st.columns([1, 2, 1])
+    tables = table_snapshot(data_version(TABLES_FILE))
+    stats = summarize_stats(load_stats(), len(tables))
+
+    counts = {status: 0 for status in STATUS_OPTIONS}
+    for t in tables:
+        counts[t["status"]] = counts.get(t["status"], 0) + 1
+    col1, col2, col3, col4, col5 = st.columns(5)
+    col1.metric("Available", counts["Available"])
+    col2.metric("Occupied", counts["Occupied"])
+    col3.metric("Reserved", counts["Reserved"])
+    col4.metric("Utilisation", f"{stats['utilisation'] * 100:.0f}%")
+    col5.metric("Avg Turn Time", f"{stats['avg_turn_minutes']:.0f} min")
+
+    tab1, tab2 = st.tabs(["Floor Plan", "Update Statuses"])
+
+    with tab1:
+        st.markdown(floor_plan_html(tables), unsafe_allow_html=True)
+
+    with tab2:
+        edited = st.data_editor(
+            tables,
+            column_config={
+                "table_number": st.column_config.TextColumn("Table", disabled=True),
+                "status": st.column_config.SelectboxColumn("Status", options=STATUS_OPTIONS, required=True)
+            },
+            hide_index=True, use_container_width=True, key="table_editor")
+        if hasattr(edited, "to_dict"):
+            edited = edited.to_dict("records")
+
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            bulk_tables = st.multiselect("Set several tables at once", [t["table_number"] for t in tables])
+        with col2:
+            bulk_status = st.selectbox("New status", STATUS_OPTIONS)
+
+        if st.button("Apply Changes"):
+            updates = {row["table_number"]: row["status"] for row, old in zip(edited, tables)
+                       if row["status"] != old["status"]}
+            updates.update({tn: bulk_status for tn in bulk_tables})
+            changed = apply_status_updates(updates, TABLES_FILE)
+            st.success(f"Updated {changed} table(s)")
+            st.rerun()
+
+    if st.session_state['user']['role'] == 'admin':
+        with st.expander("Venue Size"):
+            table_count = st.number_input("Number of tables", min_value=1, max_value=1000,
+                                          value=max(len(tables), 1), step=1)
+            if st.button("Resize Venue"):
+                resize_tables(int(table_count), TABLES_FILE)
+                st.success(f"Venue now has {int(table_count)} tables")
+                st.rerun()
+
+MAX_VISIBLE_ITEMS = 25
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def menu_index(version):
+    # One index per menu file version, shared by every session.
+    return MenuIndex(shared_cache().document(MENU_FILE) or {})
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def price_book(version):
+    # Tax and combo rules compiled once per settings version, shared by every session.
+    return PriceBook(shared_cache().document(SETTINGS_FILE) or {}, version)
+
+def cart_quote():
+    """The session's running cart quote; rebuilt from the cart only when the
+    settings changed or the cart was replaced (order placed, logout)."""
+    book = price_book(data_version(SETTINGS_FILE))
+    quote = st.session_state.get('cart_quote')
+    if quote is None or quote.book is not book or quote.lines != len(st.session_state.cart):
+        quote = st.session_state['cart_quote'] = book.cart(st.session_state.cart)
+    return quote
+
+def menu_item_row(item, section=None):
+    col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
     with col1:
-        st.write("Table Number")
+        st.write(f"{item['name']} — {item.get('description', '')}")
     with col2:
-        st.write("Status")
+        st.write(f"₹{item['price']:.2f}")
     with col3:
-        st.write("Change Status")
-
-    status_options = ["Available", "Occupied", "Reserved"]
-    changed = False
-    for i, table in enumerate(tables):
-        col1, col2, col3 = st.columns([1, 2, 1])
-        col1.write(table["table_number"])
-        col2.write(table["status"])
-        new_status = col3.selectbox(f"Change status for Table {table['table_number']}", options=status_options, index=status_options.index(table["status"]), key=f"table_status_{table['table_number']}")
-        if new_status != table["status"]:
-            tables[i]["status"] = new_status
-            changed = True
-    if changed:
-        save_json(TABLES_FILE, tables)
-        st.success("Table statuses updated")
+        qty = st.number_input(f"Qty {item['id']}", min_value=0, max_value=100, key=f"qty_{item['id']}")
+    with col4:
+        add_pressed = st.button(f"Add to Cart {item['id']}", key=f"add_{item['id']}")
+        if add_pressed and qty > 0:
+            if item.get("inventory", 0) < qty:
+                st.error(f"Insufficient inventory for {item['name']} (Available: {item.get('inventory', 0)})")
+            else:
+                cart_item = {
+                    'id': item['id'],
+                    'name': item['name'],
+                    'price': item['price'],
+                    'quantity': qty,
+                    'subtotal': round(item['price'] * qty, 2),
+                    'category': item.get('category'),
+                    'section': section
+                }
+                quote = cart_quote()
+                st.session_state.cart.append(cart_item)
+                quote.add(cart_item)
+                st.success(f"Added {qty}x {item['name']} to cart!")
+                st.rerun() 
+
+ORDERS_PER_PAGE = 20
+BULK_OPTIONS = 500
+
+def apply_bulk_action(order_ids, status=None, payment_status=None, cancel=False):
+    """Status or payment change for the selected orders (one or many), with the
+    stock they move: cancelling restocks, reopening a cancelled order deducts.
+
+    The order and menu writes are all or nothing (see order_actions.py).
+    Returns (orders updated, units restocked); raises OutOfStock.
+    """
+    with file_lock(ORDERS_FILE), file_lock(MENU_FILE):
+        previous_version = file_version(ORDERS_FILE)
+        previous_menu_version = data_version(MENU_FILE)
+        updated, menu_data, stock_ids, restocked = change_orders(order_store(), MENU_FILE, order_ids, status,
+                                                                  payment_status, cancel)
+        # Re-indexed, not just advanced: Order History filters on the status.
+        order_search_index().add(updated, file_version(ORDERS_FILE), previous_version)
+        if menu_data is not None:
+            note_stock_change(menu_data, stock_ids, previous_menu_version)
+    if menu_data is not None:
+        replication.record_menu({t: [itm for itm in items if itm["id"] in stock_ids]
+                                 for t, items in menu_data.items()})
+    replication.record_orders(updated)
+    return len(updated), restocked
 
 def order_management_page():
     st.header("🛒 Order Management")
-    menu_data = load_json(MENU_FILE) or {"beverages": [], "food": []}
-    orders_data = load_json(ORDERS_FILE) or []
-    settings = load_json(SETTINGS_FILE) or {}
+    settings = shared_cache().document(SETTINGS_FILE) or {}
 
     tab1, tab2 = st.tabs(["New Order", "Order History"])
 
@@ -316,42 +527,26 @@ def order_management_page():
             customer_email = st.text_input("Customer e-mail (for bill)")
 
         st.write("### Menu Items")
-        all_items = []
-        for t_items in menu_data.values():
-            for itm in t_items:
-                if itm.get('available', True):
-                    all_items.append(itm)
-
-        for category in sorted(set(item["category"] for item in all_items)):
-            st.write(f"{category}")
-            for item in [x for x in all_items if x["category"] == category]:
-                col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
-                with col1:
-                    st.write(f"{item['name']} — {item.get('description', '')}")
-                with col2:
-                    st.write(f"₹{item['price']:.2f}")
-                with col3:
-                    qty = st.number_input(f"Qty {item['id']}", min_value=0, max_value=100, key=f"qty_{item['id']}")
-                with col4:
-                    add_pressed = st.button(f"Add to Cart {item['id']}", key=f"add_{item['id']}")
-                    if add_pressed and qty > 0:
-                        if item.get("inventory", 0) < qty:
-                            st.error(f"Insufficient inventory for {item['name']} (Available: {item.get('inventory', 0)})")
-                        else:
-                            cart_item = {
-                                'id': item['id'],
-                                'name': item['name'],
-                                'price': item['price'],
-                                'quantity': qty,
-                                'subtotal': round(item['price'] * qty, 2)
-                            }
-                            st.session_state.cart.append(cart_item)
-                            st.success(f"Added {qty}x {item['name']} to cart!")
-                            st.rerun() 
+        index = menu_index(data_version(MENU_FILE))
+        query = st.text_input("Search menu", placeholder="Item name or description")
+        if query:
+            results = index.search(query, limit=MAX_VISIBLE_ITEMS)
+            if not results:
+                st.info("No matching items.")
+            for item in results:
+                menu_item_row(item, index.sections.get(item['id']))
+        else:
+            # Only expanded categories build their widgets.
+            for category in index.categories():
+                items = index.in_category(category)
+                if st.checkbox(f"{category} ({len(items)})", key=f"show_category_{category}"):
+                    for item in items[:MAX_VISIBLE_ITEMS]:
+                        menu_item_row(item, index.sections.get(item['id']))
+                    if len(items) > MAX_VISIBLE_ITEMS:
+                        st.caption(f"Showing {MAX_VISIBLE_ITEMS} of {len(items)} items; search to narrow down.")
 
         st.subheader("Shopping Cart")
         if st.session_state.cart:
-            total = 0
             to_remove = []
             for idx, ci in enumerate(st.session_state.cart):
                 c1, c2, c3, c4 = st.columns([3, 1, 1, 1])
@@ -361,28 +556,28 @@ def order_management_page():
                 c4.write(f"₹{ci['subtotal']:.2f}")
                 if c4.button("Remove", key=f"remove_{idx}"):
                     to_remove.append(idx)
+            cart = cart_quote()
             for idx in reversed(to_remove):
-                st.session_state.cart.pop(idx)
-            total = sum(item['subtotal'] for item in st.session_state.cart)
+                cart.remove(st.session_state.cart.pop(idx))
 
-            discount = st.number_input("Discount ($)", min_value=0.0, max_value=total, value=st.session_state.discount, step=0.10)
+            undiscounted = cart.quote()
+            max_discount = round(undiscounted['subtotal'] - undiscounted['combo_savings'], 2)
+            discount = st.number_input("Discount ($)", min_value=0.0, max_value=max_discount,
+                                       value=min(st.session_state.discount, max_discount), step=0.10)
             st.session_state.discount = discount
-
-            tax_rate = settings.get('tax_rate', 0.10)
-            service_charge = settings.get('service_charge', 0.05)
-
-            tax_amt = (total - discount) * tax_rate
-            service_amt = (total - discount) * service_charge
-            final_total = total - discount + tax_amt + service_amt
+            quote = cart.quote(discount)
 
             st.write("---")
-            st.write(f"Subtotal: ₹{total:.2f}")
-            st.write(f"Discount: -₹{discount:.2f}")
-            st.write(f"Tax ({tax_rate*100:.0f}%): +₹{tax_amt:.2f}")
-            st.write(f"Service Charge ({service_charge*100:.0f}%): +₹{service_amt:.2f}")
-            st.write(f"*Total: ₹{final_total:.2f}*")
+            st.write(f"Subtotal: ₹{quote['subtotal']:.2f}")
+            for combo in quote['combos']:
+                st.write(f"{combo['name']} combo x{combo['count']}: -₹{combo['saving']:.2f}")
+            st.write(f"Discount: -₹{quote['discount']:.2f}")
+            for tax_line in quote['tax_lines']:
+                st.write(f"{tax_line['label']}: +₹{tax_line['amount']:.2f}")
+            st.write(f"Service Charge ({quote['service_rate']*100:g}%): +₹{quote['service_charge']:.2f}")
+            st.write(f"*Total: ₹{quote['total']:.2f}*")
 
-            payment_status = st.selectbox("Payment Status", ["Unpaid", "Paid", "Partial"])
+            payment_status = st.selectbox("Payment Status", PAYMENT_STATUSES)
 
             if st.button("Place Order"):
                 if not customer_name:
@@ -390,55 +585,50 @@ def order_management_page():
                 elif len(st.session_state.cart) == 0:
                     st.error("Cart is empty")
                 else:
-                    # inventory update
-                    for order_item in st.session_state.cart:
-                        for t in ["beverages", "food"]:
-                            for menu_item in menu_data.get(t, []):
-                                if menu_item["id"] == order_item["id"]:
-                                    if menu_item.get("inventory", 0) < order_item["quantity"]:
-                                        st.error(f"Not enough inventory for {menu_item['name']}")
-                                        return
-                                    else:
-                                        menu_item["inventory"] -= order_item["quantity"]
-                    save_json(MENU_FILE, menu_data)
-
-                    new_order = {
-                        "id": f"ORD{len(orders_data) + 1:05d}",
-                        "customer_name": customer_name,
-                        "table_number": table_number,
-                        "items": st.session_state.cart.copy(),
-                        "subtotal": total,
-                        "discount": discount,
-                        "tax": tax_amt,
-                        "service_charge": service_amt,
-                        "total": final_total,
-                        "date": str(date.today()),
-                        "time": datetime.now().strftime("%H:%M:%S"),
-                        "timestamp": datetime.now().isoformat(),
-                        "status": "Pending",
-                        "payment_status": payment_status
-                    }
-                    orders_data.append(new_order)
-                    save_json(ORDERS_FILE, orders_data)
-
-                    st.success(f"Order placed! ID: {new_order['id']}")
+                    # inventory update (against the latest stock, under the file lock)
+                    with file_lock(MENU_FILE):
+                        menu_data = load_json(MENU_FILE) or {"beverages": [], "food": []}
+                        short_item = deduct_inventory(menu_data, st.session_state.cart)
+                        if short_item:
+                            st.error(f"Not enough inventory for {short_item}")
+                            return
+                        previous_menu_version = data_version(MENU_FILE)
+                        save_json(MENU_FILE, menu_data)
+                        cart_ids = {ci["id"] for ci in st.session_state.cart}
+                        note_stock_change(menu_data, cart_ids, previous_menu_version)
+                    replication.record_menu({t: [itm for itm in items if itm["id"] in cart_ids]
+                                             for t, items in menu_data.items()})
+
+                    # First block for a prefix: seeded from the order store's id index, not the history.
+                    allocator = get_allocator(settings.get('outlet_prefix'),
+                                              seed=lambda prefix: max_id_number(order_store().ids(prefix), prefix))
+                    order = new_order(allocator.next_id(), customer_name, table_number,
+                                      st.session_state.cart, quote, payment_status)
+                    # Append in place; indexing under the same lock keeps the search index current.
+                    with file_lock(ORDERS_FILE):
+                        previous_version = file_version(ORDERS_FILE)
+                        order_store().append(order)
+                        order_search_index().add([order], file_version(ORDERS_FILE), previous_version)
+                    replication.record_order(order)
+
+                    st.success(f"Order placed! ID: {order['id']}")
 
                     # === PDF & EMAIL BLOCK ===
                     from bill_mail import build_pdf, send_email
-                    pdf_bytes = build_pdf(new_order)
+                    pdf_bytes = build_pdf(order)
 
                     # 1. Staff download
                     st.download_button(
                         label="Download PDF Bill",
                         data=pdf_bytes,
-                        file_name=f"{new_order['id']}.pdf",
+                        file_name=f"{order['id']}.pdf",
                         mime="application/pdf"
                     )
 
                     # 2. Customer e-mail
                     if customer_email.strip():
                         try:
-                            send_email(customer_email.strip(), new_order, pdf_bytes)
+                            send_email(customer_email.strip(), order, pdf_bytes)
                             st.success(f"Bill e-mailed to {customer_email}")
                         except Exception as e:
                             st.error(f"Could not send e-mail: {e}")
@@ -451,22 +641,74 @@ def order_management_page():
 
     with tab2:
         st.subheader("Order History")
-        orders_data = load_json(ORDERS_FILE) or []
-        if not orders_data:
+        # Searching, filtering and paging run on the index; only the orders
+        # shown are read, each with one lookup in the order store.
+        index = order_search_index()
+        store = order_store()
+        version = file_version(ORDERS_FILE)
+        if not index.is_current(version):
+            # Orders written outside the app (another tool, a crash mid-write).
+            index.catch_up(store.load_all(), version)
+        if not index.count():
             st.info("No orders found.")
             return
-        status_filter = st.selectbox("Filter by Status", ["All", "Pending", "Preparing", "Ready", "Completed", "Cancelled"])
+        query = st.text_input("Search orders", placeholder="Customer, order ID, table or item")
+        status_filter = st.selectbox("Filter by Status", ["All"] + ORDER_STATUSES)
         date_filter = st.date_input("Filter by Date", value=None)
+        status = None if status_filter == "All" else status_filter
+
+        if query:
+            ranked, total, windowed = index.search(query, status=status, date=date_filter)
+            if windowed:
+                st.caption(f"{total} matches among the newest {SEARCH_WINDOW:,} orders; add words to search further back.")
+            elif total > len(ranked):
+                st.caption(f"Showing the best {len(ranked)} of {total} matches.")
+            total = len(ranked)
+
+            def matching_ids(limit=-1, offset=0):
+                return ranked[offset:None if limit < 0 else offset + limit]
+        else:
+            total = index.count(status, date_filter)
 
-        filtered_orders = orders_data
-        if status_filter != "All":
-            filtered_orders = [o for o in filtered_orders if o.get('status', '') == status_filter]
-        if date_filter:
-            filtered_orders = [o for o in filtered_orders if o.get('date', '') == str(date_filter)]
+            def matching_ids(limit=-1, offset=0):
+                return index.browse(status, date_filter, limit, offset)
 
-        filtered_orders = sorted(filtered_orders, key=lambda o: o.get('timestamp', ''), reverse=True)
+        def fetch(order_ids):
+            return [o for o in (store.get(oid) for oid in order_ids) if o]
 
-        for order in filtered_orders:
+        if not total:
+            st.info("No matching orders.")
+        else:
+            # A form so picking orders does not rerun the page; Apply is one batch and one rerun.
+            with st.form("bulk_actions"):
+                st.write("#### Bulk Actions")
+                labels = {o['id']: f"{o['id']} — {o['customer_name']} ({o.get('status', 'Pending')}, {o.get('payment_status', 'Unpaid')})"
+                          for o in fetch(matching_ids(BULK_OPTIONS))}
+                selected = st.multiselect("Orders", list(labels), format_func=labels.get)
+                select_all = st.checkbox(f"All {total} matching orders")
+                b1, b2, b3 = st.columns(3)
+                bulk_status = b1.selectbox("Set status", ["—"] + [s for s in ORDER_STATUSES if s != "Cancelled"])
+                bulk_payment = b2.selectbox("Set payment", ["—"] + PAYMENT_STATUSES)
+                bulk_cancel = b3.checkbox("Cancel and restock")
+                apply_bulk = st.form_submit_button("Apply to Selected")
+            if apply_bulk:
+                order_ids = matching_ids() if select_all else selected
+                if not order_ids:
+                    st.error("Select at least one order")
+                else:
+                    try:
+                        n_updated, restocked = apply_bulk_action(
+                            order_ids, None if bulk_status == "—" else bulk_status,
+                            None if bulk_payment == "—" else bulk_payment, bulk_cancel)
+                    except OutOfStock as e:
+                        st.error(str(e))
+                    else:
+                        st.success(f"Updated {n_updated} orders" + (f", restocked {restocked} items" if restocked else ""))
+                        st.rerun()
+
+        page_count = max(1, -(-total // ORDERS_PER_PAGE))
+        page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1) if page_count > 1 else 1
+        for order in fetch(matching_ids(ORDERS_PER_PAGE, (page - 1) * ORDERS_PER_PAGE)):
             with st.expander(f"Order {order['id']} by {order['customer_name']} (₹{order['total']:.2f}) - Status: {order.get('status', 'Pending')}"):
                 st.write(f"Date: {order['date']} Time: {order['time']}")
                 st.write(f"Table: {order.get('table_number', 'N/A')}")
@@ -481,68 +723,102 @@ def order_management_page():
                 payment_status = order.get('payment_status', 'Unpaid')
                 st.write(f"Payment Status: {payment_status}")
 
-                new_status = st.selectbox("Update Status", ["Pending", "Preparing", "Ready", "Completed", "Cancelled"], index=["Pending", "Preparing", "Ready", "Completed", "Cancelled"].index(order.get('status', 'Pending')),
+                new_status = st.selectbox("Update Status", ORDER_STATUSES, index=ORDER_STATUSES.index(order.get('status', 'Pending')),
                                           key=f"status_{order['id']}")
                 if st.button("Update Status", key=f"update_{order['id']}"):
-                    for o in orders_data:
-                        if o['id'] == order['id']:
-                            o['status'] = new_status
-                            save_json(ORDERS_FILE, orders_data)
+                    # Same path as the bulk action, so cancelling or reopening moves stock.
+                    try:
+                        n_updated, _ = apply_bulk_action([order['id']], status=new_status)
+                    except OutOfStock as e:
+                        st.error(str(e))
+                    else:
+                        if n_updated:
                             st.success(f"Order {order['id']} status updated to {new_status}")
                             st.rerun() 
+
+                bill_email = st.text_input("E-mail bill to", key=f"bill_email_{order['id']}")
+                if st.button("Send Bill", key=f"bill_{order['id']}") and bill_email.strip():
+                    from bill_mail import build_pdf, send_email
+                    latest = order_store().get(order['id']) or order
+                    try:
+                        send_email(bill_email.strip(), latest, build_pdf(latest))
+                        st.success(f"Bill e-mailed to {bill_email}")
+                    except Exception as e:
+                        st.error(f"Could not send e-mail: {e}")
                     
 def sales_analytics_page():
     st.header("📊 Sales Analytics")
-    orders_data = load_json(ORDERS_FILE) or []
-    if not orders_data:
-        st.info("No sales data available.")
-        return
+    settings = load_json(SETTINGS_FILE) or {}
+
+    consolidated = st.checkbox("Consolidate all branches")
+    if consolidated:
+        branch_text = st.text_area("Branch data directories (one per line)",
+                                   value="\n".join(settings.get("branch_dirs", [])))
+        branch_dirs = [line.strip() for line in branch_text.splitlines() if line.strip()]
+        if branch_dirs != settings.get("branch_dirs", []):
+            settings["branch_dirs"] = branch_dirs
+            save_json(SETTINGS_FILE, settings)
+        missing = [d for d in branch_dirs if not os.path.isdir(d)]
+        if missing:
+            st.warning(f"Not found: {', '.join(missing)}")
+        branch_dirs = [d for d in branch_dirs if d not in missing]
+        if not branch_dirs:
+            st.info("Add at least one branch data directory.")
+            return
+    else:
+        orders_data = load_json(ORDERS_FILE) or []
+        if not orders_data:
+            st.info("No sales data available.")
+            return
 
     start_date = st.date_input("Start Date", value=date.today().replace(day=1))
     end_date = st.date_input("End Date", value=date.today())
 
-    filtered = [o for o in orders_data if start_date <= datetime.strptime(o['date'], "%Y-%m-%d").date() <= end_date]
+    if consolidated:
+        summary = consolidate_sales(branch_dirs, start_date, end_date)
+    else:
+        summary = summarize_sales(orders_data, start_date, end_date)
 
-    if not filtered:
+    if not summary["total_orders"]:
         st.warning("No orders in selected date range")
         return
 
-    total_revenue = sum(o['total'] for o in filtered)
-    total_orders = len(filtered)
-    avg_order = total_revenue / total_orders if total_orders else 0
-
-    st.metric("Total Revenue", f"₹{total_revenue:.2f}")
-    st.metric("Total Orders", total_orders)
-    st.metric("Average Order Value", f"₹{avg_order:.2f}")
+    st.metric("Total Revenue", f"₹{summary['total_revenue']:.2f}")
+    st.metric("Total Orders", summary["total_orders"])
+    st.metric("Average Order Value", f"₹{summary['avg_order']:.2f}")
+    if not consolidated:
+        st.metric("Tax Collected", f"₹{summary['total_tax']:.2f}")
+        if summary["combo_savings"]:
+            st.metric("Combo Savings Given", f"₹{summary['combo_savings']:.2f}")
+        st.subheader("Tax by Rate")
+        for label, amount in summary["tax_by_rate"]:
+            st.write(f"{label}: ₹{amount:.2f}")
 
     st.subheader("Daily Revenue")
-    daily_sales = {}
-    for o in filtered:
-        daily_sales[o['date']] = daily_sales.get(o['date'], 0) + o['total']
-    for d, rev in sorted(daily_sales.items()):
+    for d, rev in summary["daily_sales"]:
         st.write(f"{d}: ₹{rev:.2f}")
 
     st.subheader("Top Selling Items")
-    item_sales = {}
-    for o in filtered:
-        for item in o['items']:
-            name = item['name']
-            item_sales.setdefault(name, 0)
-            item_sales[name] += item['quantity']
-
-    for item_name, qty in sorted(item_sales.items(), key=lambda x: x[1], reverse=True)[:10]:
+    for item_name, qty in summary["top_items"]:
         st.write(f"{item_name}: {qty} units sold")
 
+    if consolidated:
+        st.subheader("Revenue by Branch")
+        for branch_dir, rev in sorted(summary["branch_revenue"].items(), key=lambda x: x[1], reverse=True):
+            st.write(f"{branch_dir}: ₹{rev:.2f}")
+
+        st.subheader("Hourly Load (orders)")
+        st.bar_chart({"Orders": summary["hourly_orders"]})
+
 def qr_generator_page():
     st.header("📱 QR Code Generator")
     settings = load_json(SETTINGS_FILE) or {}
     cafe_url = st.text_input("Cafe Menu URL", value=settings.get('barcode_url', 'https://mycafe.com/menu'))
     if st.button("Generate QR Code"):
         try:
-            qr_buffer = generate_menu_qr(cafe_url)
-            st.image(qr_buffer, caption="Menu QR Code", width=300)
-            qr_buffer.seek(0)
-            st.download_button("Download QR Code", qr_buffer.getvalue(), file_name="menu_qr_code.png", mime="image/png")
+            qr_png = shared_cache().blob("menu_qr", cafe_url, lambda: generate_menu_qr(cafe_url).getvalue())
+            st.image(qr_png, caption="Menu QR Code", width=300)
+            st.download_button("Download QR Code", qr_png, file_name="menu_qr_code.png", mime="image/png")
             settings['barcode_url'] = cafe_url
             save_json(SETTINGS_FILE, settings)
         except Exception as e:
@@ -558,40 +834,140 @@ def settings_page():
         barcode_url = st.text_input("Menu URL for QR Code", value=settings.get('barcode_url', 'https://mycafe.com/menu'))
         tax_rate = st.number_input("Tax Rate (%)", min_value=0.0, max_value=100.0, value=settings.get('tax_rate',0.10)*100, step=0.1)
         service_charge = st.number_input("Service Charge (%)", min_value=0.0, max_value=100.0, value=settings.get('service_charge',0.05)*100, step=0.1)
+        section_rates = settings.get('category_tax_rates', {})
+        col1, col2 = st.columns(2)
+        beverages_tax = col1.number_input("Beverages Tax (%)", min_value=0.0, max_value=100.0,
+                                          value=section_rates.get('beverages', settings.get('tax_rate', 0.10))*100, step=0.1)
+        food_tax = col2.number_input("Food Tax (%)", min_value=0.0, max_value=100.0,
+                                     value=section_rates.get('food', settings.get('tax_rate', 0.10))*100, step=0.1)
+        combos_text = st.text_area("Combos (JSON)", value=json.dumps(settings.get('combos', []), indent=2),
+                                   help='e.g. [{"name": "Breakfast", "items": {"BEV003": 1, "FOOD001": 1}, "price": 5.5}]')
+        outlet_prefix = st.text_input("Order ID Prefix", value=settings.get('outlet_prefix', 'ORD'),
+                                      help="Per-outlet prefix for new order IDs, e.g. BLR or MUM")
 
         if st.form_submit_button("Save Settings"):
-            new_settings = {
-                "cafe_name": cafe_name,
-                "barcode_url": barcode_url,
-                "tax_rate": tax_rate/100,
-                "service_charge": service_charge/100
-            }
-            save_json(SETTINGS_FILE, new_settings)
-            st.success("Settings saved")
-            st.rerun() 
+            try:
+                combos = parse_combos(combos_text)
+                combo_errors = validate_combos(combos, shared_cache().document(MENU_FILE) or {})
+            except ValueError as e:
+                combo_errors = [str(e)]
+            if combo_errors:
+                for error in combo_errors:
+                    st.error(error)
+            else:
+                new_settings = {
+                    **settings,
+                    "cafe_name": cafe_name,
+                    "barcode_url": barcode_url,
+                    "tax_rate": tax_rate/100,
+                    "service_charge": service_charge/100,
+                    # Category-level overrides added by hand are kept.
+                    "category_tax_rates": {**section_rates, "beverages": beverages_tax/100, "food": food_tax/100},
+                    "combos": combos,
+                    "outlet_prefix": outlet_prefix.strip().upper() or "ORD"
+                }
+                save_json(SETTINGS_FILE, new_settings)
+                st.success("Settings saved")
+                st.rerun() 
 
     st.subheader("Data Management")
     col1, col2, col3 = st.columns(3)
     with col1:
         if st.button("Export Menu Data"):
             menu = load_json(MENU_FILE)
-            st.download_button("Download Menu JSON", json.dumps(menu, indent=2), "menu_data.json", "application/json")
+            st.download_button("Download Menu JSON", export_json(menu), "menu_data.json", "application/json")
     with col2:
         if st.button("Export Orders Data"):
             orders = load_json(ORDERS_FILE)
-            st.download_button("Download Orders JSON", json.dumps(orders, indent=2), "orders_data.json", "application/json")
+            st.download_button("Download Orders JSON", export_json(orders), "orders_data.json", "application/json")
     with col3:
         if st.button("Clear All Data"):
             if st.checkbox("I understand this will delete all data"):
                 if st.button("Confirm Clear All"):
                     save_json(MENU_FILE, {"beverages": [], "food": []})
                     save_json(ORDERS_FILE, [])
-                    save_json(TABLES_FILE, [{"table_number":str(i), "status":"Available"} for i in range(1,11)])
+                    save_json(TABLES_FILE, default_tables())
                     save_json(USERS_FILE, [{"username": "admin", "password": "admin123", "role": "admin"},
                                            {"username": "staff", "password": "staff123", "role": "staff"}])
                     st.success("All data cleared")
                     st.rerun() 
 
+    st.subheader("Head-office Sync")
+    sync_status = replication.worker_status()
+    if sync_status is None:
+        st.caption("Replication is off. Set SUPABASE_URL and SUPABASE_KEY in .env to mirror orders and menu changes.")
+    else:
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Queued Changes", sync_status["queued"])
+        col2.metric("Sync Lag", f"{sync_status['lag_seconds']:.0f}s")
+        col3.metric("Rows Pushed", sync_status["pushed"])
+        if sync_status["last_error"]:
+            st.warning(f"Offline, retrying in {sync_status['backoff_seconds']:.0f}s: {sync_status['last_error']}")
+
+    st.subheader("Profiling")
+    pages = [p for p in ADMIN_OPTIONS if p != "Logout"]
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        profile_page = st.selectbox("Page to profile", pages)
+    with col2:
+        profile_runs = st.number_input("Next N reruns", min_value=1, max_value=50, value=3, step=1)
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Start Profiling"):
+            profiler.arm(profile_page, profile_runs)
+            st.success(f"Profiling the next {profile_runs} rerun(s) of {profile_page}")
+    with col2:
+        if st.button("Stop Profiling"):
+            profiler.disarm()
+            st.success("Profiling stopped")
+    for page, remaining in profiler.armed_pages().items():
+        st.info(f"{page}: {remaining} rerun(s) left to profile")
+
+    captures = profiler.list_captures()
+    if captures:
+        capture_name = st.selectbox("Captured profile", captures)
+        pstats_path, collapsed_path = profiler.capture_paths(capture_name)
+        sort = st.radio("Sort by", ["cumulative", "self"], horizontal=True)
+        st.table(profiler.top_functions(pstats_path, limit=20, sort=sort))
+        col1, col2 = st.columns(2)
+        with open(pstats_path, 'rb') as f:
+            col1.download_button("Download .pstats", f.read(), f"{capture_name}.pstats")
+        if os.path.exists(collapsed_path):
+            with open(collapsed_path, 'r') as f:
+                col2.download_button("Download collapsed stacks", f.read(), f"{capture_name}.collapsed", "text/plain")
+
+# --- Metrics panel (admin only) ---
+def metrics_panel():
+    with st.sidebar.expander("📈 Performance Metrics"):
+        snap = metrics.snapshot()
+        if not snap["timers"]:
+            st.caption("No timings recorded yet.")
+            return
+        st.table([{"Operation": name, "Calls": s["count"], "p50 (ms)": s["p50_ms"], "p99 (ms)": s["p99_ms"]}
+                  for name, s in snap["timers"].items()])
+        if snap["counters"]:
+            st.table([{"Counter": name, "Value": value} for name, value in snap["counters"].items()])
+        st.download_button("Download metrics JSON", metrics.to_json(), "metrics.json", "application/json")
+
+# --- Navigation ---
+ADMIN_OPTIONS = [
+    "Dashboard",
+    "Menu Management",
+    "Order Management",
+    "Sales Analytics",
+    "Table Management",
+    "QR Code Generator",
+    "Settings",
+    "Logout"
+]
+STAFF_OPTIONS = [
+    "Dashboard",
+    "Order Management",
+    "Table Management",
+    "QR Code Generator",
+    "Logout"
+]
+
 # --- Main driver function ---
 def main():
     st.set_page_config(page_title="Cafe Management System", page_icon="☕", layout="wide")
@@ -604,64 +980,49 @@ def main():
     user = st.session_state['user']
     st.sidebar.title(f"Logged in as: {user['username']} ({user['role']})")
 
-    # Define menu options for each role
-    admin_options = [
-        "Dashboard",
-        "Menu Management",
-        "Order Management",
-        "Sales Analytics",
-        "Table Management",
-        "QR Code Generator",
-        "Settings",
-        "Logout"
-    ]
-    staff_options = [
-        "Dashboard",
-        "Order Management",
-        "Table Management",
-        "QR Code Generator",
-        "Logout"
-    ]
-
     # Display correct sidebar
     if user["role"] == "admin":
-        menu_options = admin_options
+        menu_options = ADMIN_OPTIONS
     elif user["role"] == "staff":
-        menu_options = staff_options
+        menu_options = STAFF_OPTIONS
     else:
         menu_options = ["Logout"]
 
     choice = st.sidebar.selectbox("Navigation", menu_options)
+    if user["role"] == "admin":
+        metrics_panel()
 
     # Route to correct page
-    if choice == "Logout":
-        st.session_state['logged_in'] = False
-        st.session_state['user'] = None
-        st.session_state['cart'] = []
-        st.experimental_rerun()
-    elif choice == "Dashboard":
-        dashboard_page()
-    elif choice == "Menu Management":
-        if user['role'] == 'admin':
-            menu_management_page()
-        else:
-            st.warning("Only admin can access menu management.")
-    elif choice == "Order Management":
-        order_management_page()
-    elif choice == "Sales Analytics":
-        if user['role'] == 'admin':
-            sales_analytics_page()
-        else:
-            st.warning("Only admin can access sales analytics.")
-    elif choice == "Table Management":
-        table_management_page()
-    elif choice == "QR Code Generator":
-        qr_generator_page()
-    elif choice == "Settings":
-        if user['role'] == 'admin':
-            settings_page()
-        else:
-            st.warning("Only admin can access settings.")
+    page_profile = profiler.capture(choice) if profiler.is_armed(choice) else nullcontext()
+    with metrics.timer(f"page.{choice}"), page_profile:
+        if choice == "Logout":
+            st.session_state['logged_in'] = False
+            st.session_state['user'] = None
+            st.session_state['cart'] = []
+            st.experimental_rerun()
+        elif choice == "Dashboard":
+            dashboard_page()
+        elif choice == "Menu Management":
+            if user['role'] == 'admin':
+                menu_management_page()
+            else:
+                st.warning("Only admin can access menu management.")
+        elif choice == "Order Management":
+            order_management_page()
+        elif choice == "Sales Analytics":
+            if user['role'] == 'admin':
+                sales_analytics_page()
+            else:
+                st.warning("Only admin can access sales analytics.")
+        elif choice == "Table Management":
+            table_management_page()
+        elif choice == "QR Code Generator":
+            qr_generator_page()
+        elif choice == "Settings":
+            if user['role'] == 'admin':
+                settings_page()
+            else:
+                st.warning("Only admin can access settings.")
 
 if __name__ == '__main__':
     if 'cart' not in st.session_state:
@@ -3,13 +3,13 @@ from datetime import datetime
 
 DB_FILE = "cafe.db"
 
-def get_connection():
-    conn = sqlite3.connect(DB_FILE)
+def get_connection(db_file=DB_FILE):
+    conn = sqlite3.connect(db_file)
     conn.row_factory = sqlite3.Row
     return conn
 
-def init_db():
-    conn = get_connection()
+def init_db(table_count=10, db_file=DB_FILE):
+    conn = get_connection(db_file)
     cur = conn.cursor()
 
     # Create tables
@@ -83,14 +83,13 @@ def init_db():
             "tax_rate": "0.1",
             "service_charge": "0.05"
         }
-        for k, v in default_settings.items():
-            cur.execute("INSERT INTO settings (key, value) VALUES (?,?)", (k, v))
+        cur.executemany("INSERT INTO settings (key, value) VALUES (?,?)", list(default_settings.items()))
 
-    # Insert default tables if empty (example tables 1-10)
+    # Insert default tables if empty (tables 1..table_count)
     cur.execute("SELECT COUNT(*) FROM tables")
     if cur.fetchone()[0] == 0:
-        for tn in range(1, 11):
-            cur.execute("INSERT INTO tables (table_number) VALUES (?)", (str(tn),))
+        cur.executemany("INSERT INTO tables (table_number) VALUES (?)",
+                        [(str(tn),) for tn in range(1, table_count + 1)])
 
     conn.commit()
     conn.close()
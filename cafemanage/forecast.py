@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Demand forecast and low-stock watchlist.
+
+Order lines from the last HISTORY_DAYS days are folded into an item x day
+demand matrix. A blend of the 7- and 28-day rolling means, scaled by each
+item's day-of-week profile, projects demand over the next HORIZON_DAYS, and
+the projection is compared with the menu's `inventory` to estimate when each
+item runs out. Items that run out within the horizon go on a heap-backed
+watchlist that is updated item by item as stock changes. Stocked items with
+no sales in the history are projected at zero demand, so they only appear
+once they are out of stock.
+
+Usage:
+    python forecast.py --data-dir . --top 10
+"""
+
+import argparse
+import heapq
+import math
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+import metrics
+from storage import load_json
+
+HISTORY_DAYS = 56
+HORIZON_DAYS = 14
+WATCHLIST_SIZE = 10
+
+
+# --- Demand matrix ---
+
+def demand_matrix(orders_data, end_date, days=HISTORY_DAYS):
+    """(item_ids, matrix): matrix[i, d] is units of item i sold on day d,
+    with the last column being `end_date`. Cancelled orders are skipped."""
+    start = str(end_date - timedelta(days=days - 1))
+    end = str(end_date)
+    item_index = {}
+    rows, cols, qtys = [], [], []
+    first = end_date - timedelta(days=days - 1)
+    day_index = {}
+    for o in orders_data:
+        d = o.get('date', '')
+        if not (start <= d <= end) or o.get('status') == 'Cancelled':
+            continue
+        col = day_index.get(d)
+        if col is None:
+            col = day_index[d] = (date.fromisoformat(d) - first).days
+        for itm in o.get('items', []):
+            rows.append(item_index.setdefault(itm['id'], len(item_index)))
+            cols.append(col)
+            qtys.append(itm['quantity'])
+    matrix = np.zeros((len(item_index), days))
+    if qtys:
+        np.add.at(matrix, (np.array(rows), np.array(cols)), np.array(qtys, dtype=float))
+    return list(item_index), matrix
+
+
+def forecast_demand(matrix, end_date, horizon=HORIZON_DAYS):
+    """items x horizon projected daily demand, starting the day after `end_date`.
+
+    The level is the mean of the 7- and 28-day rolling averages; each weekday
+    is scaled by how that weekday compares with the item's average day.
+    """
+    n_items, days = matrix.shape
+    if n_items == 0:
+        return np.zeros((0, horizon))
+    cumulative = np.cumsum(matrix, axis=1)
+    def rolling_mean(window):
+        window = min(window, days)
+        before = cumulative[:, -window - 1] if window < days else 0.0
+        return (cumulative[:, -1] - before) / window
+    level = (rolling_mean(7) + rolling_mean(28)) / 2
+
+    # Day-of-week seasonality over the whole history.
+    weekdays = (np.arange(days) + (end_date - timedelta(days=days - 1)).weekday()) % 7
+    by_weekday = np.stack([matrix[:, weekdays == w].mean(axis=1) for w in range(7)], axis=1)
+    overall = matrix.mean(axis=1, keepdims=True)
+    seasonality = np.divide(by_weekday, overall, out=np.ones_like(by_weekday), where=overall > 0)
+
+    future_weekdays = (np.arange(1, horizon + 1) + end_date.weekday()) % 7
+    return level[:, None] * seasonality[:, future_weekdays]
+
+
+def stockout_days(forecast, inventory):
+    """Fractional days until projected demand exhausts `inventory` (inf past the horizon)."""
+    if forecast.shape[0] == 0:
+        return np.zeros(0)
+    cumulative = np.cumsum(forecast, axis=1)
+    runs_out = cumulative >= inventory[:, None]
+    first = np.argmax(runs_out, axis=1)
+    before = np.where(first > 0, cumulative[np.arange(len(first)), first - 1], 0.0)
+    on_day = forecast[np.arange(len(first)), first]
+    fraction = np.divide(inventory - before, on_day, out=np.zeros_like(before), where=on_day > 0)
+    days = np.where(runs_out.any(axis=1), first + fraction, np.inf)
+    return np.where(inventory <= 0, 0.0, days)
+
+
+# --- Watchlist ---
+
+class Watchlist:
+    """Items projected to run out within the horizon, soonest first.
+
+    Stock changes re-project only the affected items and push fresh heap
+    entries (stale ones are skipped lazily), then the top entries are
+    re-materialised so readers get a ready-made list.
+    """
+
+    def __init__(self, item_ids, forecast, inventory, names, size=WATCHLIST_SIZE, menu_version=None):
+        self.size = size
+        self.menu_version = menu_version
+        self._lock = threading.Lock()
+        self._row = {item_id: i for i, item_id in enumerate(item_ids)}
+        self._names = names
+        self._forecast = forecast
+        self._inventory = dict(zip(item_ids, inventory.tolist()))
+        days = stockout_days(forecast, inventory)
+        self._days = dict(zip(item_ids, days.tolist()))
+        self._heap = [(d, item_id) for item_id, d in self._days.items() if math.isfinite(d)]
+        heapq.heapify(self._heap)
+        self._top = []
+        self._materialise()
+
+    def _project(self, item_id, inventory):
+        row = self._row[item_id]
+        return float(stockout_days(self._forecast[row:row + 1], np.array([float(inventory)]))[0])
+
+    def _materialise(self):
+        # Drop stale heap tops, then read the first `size` live entries.
+        live, seen = [], set()
+        while self._heap and len(live) < self.size:
+            d, item_id = heapq.heappop(self._heap)
+            if item_id in seen or self._days.get(item_id) != d:
+                continue
+            seen.add(item_id)
+            live.append((d, item_id))
+        for entry in live:
+            heapq.heappush(self._heap, entry)
+        if len(self._heap) > 4 * max(len(self._days), 1):
+            self._heap = [(d, i) for i, d in self._days.items() if math.isfinite(d)]
+            heapq.heapify(self._heap)
+        self._top = [self._entry(item_id) for _, item_id in live]
+
+    def _entry(self, item_id):
+        row = self._row[item_id]
+        return {
+            "id": item_id,
+            "name": self._names.get(item_id, item_id),
+            "inventory": int(self._inventory[item_id]),
+            "daily_demand": round(float(self._forecast[row, 0]), 2),
+            "days_left": round(self._days[item_id], 1)
+        }
+
+    def update_inventory(self, inventory, menu_version=None, previous_version=None):
+        """Re-project the given {item_id: inventory} and refresh the top of the list.
+
+        `menu_version` is recorded only if the watchlist was in step with
+        `previous_version`, so changes made elsewhere still trigger a resync.
+        """
+        with self._lock:
+            for item_id, stock in inventory.items():
+                if item_id not in self._row or stock is None:
+                    continue
+                self._inventory[item_id] = stock
+                d = self._project(item_id, stock)
+                self._days[item_id] = d
+                if math.isfinite(d):
+                    heapq.heappush(self._heap, (d, item_id))
+            if menu_version is not None and (previous_version is None or self.menu_version == previous_version):
+                self.menu_version = menu_version
+            self._materialise()
+
+    def top(self):
+        """The current watchlist; precomputed, so reading it costs nothing."""
+        return self._top
+
+
+def menu_inventory(menu_data):
+    """{item_id: inventory} for items that track stock."""
+    return {itm['id']: itm['inventory'] for items in menu_data.values() for itm in items
+            if itm.get('inventory') is not None}
+
+
+@metrics.timed("forecast.build")
+def build_watchlist(menu_data, orders_data, today=None, size=WATCHLIST_SIZE, menu_version=None):
+    """Run the forecast over the history up to yesterday and seed a Watchlist."""
+    today = today or date.today()
+    end_date = today - timedelta(days=1)
+    stock = menu_inventory(menu_data)
+    names = {itm['id']: itm['name'] for items in menu_data.values() for itm in items}
+    sold_ids, matrix = demand_matrix(orders_data, end_date)
+    forecast = forecast_demand(matrix, end_date)
+    # Every stocked item gets a row, so unsold ones that hit zero are listed too.
+    item_ids = list(stock)
+    sold_row = {item_id: i for i, item_id in enumerate(sold_ids)}
+    sold = [i for i, item_id in enumerate(item_ids) if item_id in sold_row]
+    projected = np.zeros((len(item_ids), forecast.shape[1]))
+    projected[sold] = forecast[[sold_row[item_ids[i]] for i in sold]]
+    inventory = np.array([float(stock[item_id]) for item_id in item_ids])
+    return Watchlist(item_ids, projected, inventory, names, size, menu_version)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Forecast demand and list items about to run out")
+    parser.add_argument("--data-dir", default=".")
+    parser.add_argument("--top", type=int, default=WATCHLIST_SIZE)
+    args = parser.parse_args()
+    menu_data = load_json(os.path.join(args.data_dir, "menu_data.json")) or {}
+    orders_data = load_json(os.path.join(args.data_dir, "orders_data.json")) or []
+    start = time.perf_counter()
+    watchlist = build_watchlist(menu_data, orders_data, size=args.top)
+    elapsed = (time.perf_counter() - start) * 1000
+    for entry in watchlist.top():
+        print(f"{entry['id']:<10} {entry['name']:<28} stock {entry['inventory']:>6} "
+              f"~{entry['daily_demand']:>6.1f}/day  out in {entry['days_left']:>5.1f} days")
+    print(f"Forecast over {len(orders_data)} orders in {elapsed:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# invalidation.py
+import atexit
+import glob
+import os
+import socket
+import threading
+import time
+
+import metrics
+import storage
+
+# --- Cross-worker invalidation ---
+# In multi-worker mode (see workers.py) every process binds a Unix datagram
+# socket in a shared directory. A write to a data file is announced to every
+# socket there, so each worker drops its cached copy straight away. Cache keys
+# add the file's generation to its (mtime, size), which on its own misses two
+# same-size writes within one timestamp tick. Without a bus directory, writes
+# still bump the generation inside the writing process.
+
+BUS_DIR_ENV = "CAFE_BUS_DIR"
+MAX_MESSAGE = 4096
+
+_lock = threading.Lock()
+_generations = {}
+_invalidated_at = {}
+_subscribers = []
+_bus = None
+_listening = False
+
+
+def topic_for(path):
+    return os.path.abspath(path)
+
+
+def generation(path):
+    """How many invalidations this process has seen for a data file."""
+    return _generations.get(topic_for(path), 0)
+
+
+def invalidated_at(path):
+    """time.time() of the latest invalidation seen for a data file (0 if none)."""
+    return _invalidated_at.get(topic_for(path), 0.0)
+
+
+def subscribe(fn):
+    """Call fn(topic) on every invalidation, local or from another worker."""
+    _subscribers.append(fn)
+
+
+def _deliver(topic):
+    with _lock:
+        _generations[topic] = _generations.get(topic, 0) + 1
+        _invalidated_at[topic] = time.time()
+    for fn in list(_subscribers):
+        try:
+            fn(topic)
+        except Exception:
+            metrics.incr("invalidation_subscriber_errors")
+
+
+class InvalidationBus:
+    """One process's endpoint: a bound socket, a listener thread and a sender."""
+
+    def __init__(self, bus_dir):
+        os.makedirs(bus_dir, exist_ok=True)
+        self.bus_dir = bus_dir
+        self.path = os.path.join(bus_dir, f"{os.getpid()}.sock")
+        if os.path.exists(self.path):
+            os.remove(self.path)   # left by an earlier process with the same pid
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(self.path)
+        self._out = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._out.setblocking(False)
+        self.delays = []   # seconds from publish to delivery, for the scaling benchmark
+        self._thread = threading.Thread(target=self._listen, name="invalidation-bus", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def peers(self):
+        return [p for p in glob.glob(os.path.join(self.bus_dir, "*.sock")) if p != self.path]
+
+    def publish(self, topic):
+        _deliver(topic)
+        message = f"{time.time():.6f} {topic}".encode("utf-8")
+        for peer in self.peers():
+            try:
+                self._out.sendto(message, peer)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # A worker that exited without removing its socket.
+                try:
+                    os.remove(peer)
+                except OSError:
+                    pass
+            except BlockingIOError:
+                # The peer is not keeping up; its (mtime, size) checks still catch most changes.
+                metrics.incr("invalidations_dropped")
+            else:
+                metrics.incr("invalidations_sent")
+
+    def _listen(self):
+        while True:
+            try:
+                data = self._sock.recv(MAX_MESSAGE)
+            except OSError:
+                return   # closed
+            try:
+                sent, _, topic = data.decode("utf-8").partition(" ")
+                delay = max(0.0, time.time() - float(sent))
+                if not topic:
+                    raise ValueError("no topic")
+            except ValueError:   # includes UnicodeDecodeError
+                # Not from a peer (a stray or truncated datagram): drop it, keep listening.
+                metrics.incr("invalidations_malformed")
+                continue
+            if len(self.delays) < 100000:
+                self.delays.append(delay)
+            metrics.observe("invalidation.delay", delay)
+            _deliver(topic)
+
+    def close(self):
+        self._sock.close()
+        self._out.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def _on_write(path):
+    if _bus is not None:
+        _bus.publish(topic_for(path))
+    else:
+        _deliver(topic_for(path))
+
+
+def start(bus_dir=None):
+    """Hook data file writes into the invalidation bus once per process.
+
+    `bus_dir` (default: $CAFE_BUS_DIR) enables cross-worker delivery;
+    without it only this process's caches are invalidated.
+    """
+    global _bus, _listening
+    bus_dir = bus_dir or os.getenv(BUS_DIR_ENV)
+    with _lock:
+        if not _listening:
+            storage.add_write_listener(_on_write)
+            _listening = True
+        if bus_dir and _bus is None:
+            _bus = InvalidationBus(bus_dir)
+    return _bus
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Session-replay load test for the Streamlit app.
+
+Each simulated cashier is a separate process driving cafe.py through
+Streamlit's AppTest API: log in, find an item, add it to the cart, place an
+order, mark it completed in Order History, then open the Dashboard and Sales
+Analytics. All sessions share one synthetic data directory, so file locking
+and caches are exercised the way concurrent terminals exercise them.
+
+Every rerun is timed per interaction. Afterwards the data files are checked
+for lost orders, duplicate order IDs, lost status updates and inventory drift.
+Results use the benchmark.py format and can be compared against a baseline.
+
+Usage:
+    python loadtest.py --sessions 8 --orders-per-session 3
+    python loadtest.py --sessions 8 --save-baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+import synthetic_data
+from benchmark import DEFAULT_RESULTS_DIR, compare
+from storage import load_json, save_json
+
+DEFAULT_BASELINE = os.path.join(HERE, "loadtest_baseline.json")
+FONT_DIR = "dejavu-fonts-ttf-2.37"
+STOCK = 10 ** 6
+RUN_TIMEOUT = 120
+
+
+def prepare_data(data_dir, n_orders, seed=0):
+    """Synthetic data with stock high enough that no order is refused."""
+    paths = synthetic_data.write_dataset(data_dir, n_orders=n_orders, days=60, seed=seed)
+    menu = load_json(paths["menu_data.json"])
+    for items in menu.values():
+        for itm in items:
+            itm["inventory"] = STOCK
+            itm["available"] = True
+    save_json(paths["menu_data.json"], menu)
+    # bill_mail loads its font relative to the working directory.
+    font_src = os.path.join(os.path.dirname(HERE), FONT_DIR)
+    if os.path.isdir(font_src):
+        os.symlink(font_src, os.path.join(data_dir, FONT_DIR))
+    return menu
+
+
+# --- One session ---
+
+class Session:
+    def __init__(self, session_id):
+        from streamlit.testing.v1 import AppTest
+        self.id = session_id
+        self.at = AppTest.from_file(os.path.join(HERE, "cafe.py"), default_timeout=RUN_TIMEOUT)
+        self.latencies = []
+        self.errors = []
+
+    def run(self, step):
+        start = time.perf_counter()
+        self.at.run()
+        self.latencies.append((step, (time.perf_counter() - start) * 1000))
+        self.errors.extend(f"{step}: {e.message}" for e in self.at.exception)
+
+    def widget(self, kind, label=None, key=None):
+        for w in getattr(self.at, kind):
+            if (label is None or w.label == label) and (key is None or w.key == key):
+                return w
+        raise LookupError(f"session {self.id}: no {kind} {label or key}")
+
+    def goto(self, page, step):
+        self.at.sidebar.selectbox[0].select(page)
+        self.run(step)
+
+
+def run_session(session_id, data_dir, orders_per_session, seed):
+    """Replay one cashier's session; returns latencies, placed orders and errors."""
+    os.environ["SUPABASE_URL"] = ""       # never replicate to a real project
+    os.environ.pop("CAFE_METRICS_PORT", None)
+    os.chdir(data_dir)
+    rng = random.Random(seed * 1000 + session_id)
+    menu = load_json("menu_data.json")
+    items = [itm for t_items in menu.values() for itm in t_items]
+    s = Session(session_id)
+    placed = []
+
+    s.run("open_app")
+    s.widget("text_input", "Username").input("admin")
+    s.widget("text_input", "Password").input("admin123")
+    s.widget("button", "Login").click()
+    s.run("login")
+
+    for n in range(orders_per_session):
+        customer = f"Load{session_id:03d}x{n:03d}"
+        item = rng.choice(items)
+        qty = rng.randint(1, 3)
+        s.goto("Order Management", "open_orders")
+        s.widget("text_input", "Search menu").input(item["name"])
+        s.run("search_menu")
+        s.widget("number_input", key=f"qty_{item['id']}").set_value(qty)
+        s.run("set_quantity")
+        s.widget("button", key=f"add_{item['id']}").click()
+        s.run("add_to_cart")
+        s.widget("text_input", "Customer Name").input(customer)
+        s.run("enter_customer")
+        s.widget("button", "Place Order").click()
+        s.run("place_order")
+        placed.append({"customer": customer, "item": item["id"], "quantity": qty})
+        s.widget("text_input", "Search menu").input("")
+        s.run("clear_search")
+
+        s.widget("text_input", "Search orders").input(customer.lower())
+        s.run("search_history")
+        status_boxes = [w for w in s.at.selectbox if (w.key or "").startswith("status_")]
+        if len(status_boxes) != 1:
+            s.errors.append(f"search_history: {customer} matched {len(status_boxes)} orders")
+        else:
+            order_id = status_boxes[0].key[len("status_"):]
+            status_boxes[0].select("Completed")
+            s.run("select_status")
+            s.widget("button", key=f"update_{order_id}").click()
+            s.run("update_status")
+        s.widget("text_input", "Search orders").input("")
+        s.run("clear_history_search")
+
+    s.goto("Dashboard", "open_dashboard")
+    s.goto("Sales Analytics", "open_analytics")
+    return {"session": session_id, "latencies": s.latencies, "placed": placed, "errors": s.errors}
+
+
+# --- Integrity checks ---
+
+def check_integrity(data_dir, sessions):
+    """Compare the data files with what the sessions did."""
+    orders = load_json(os.path.join(data_dir, "orders_data.json")) or []
+    menu = load_json(os.path.join(data_dir, "menu_data.json")) or {}
+    ids = [o["id"] for o in orders]
+    by_customer = {}
+    for o in orders:
+        by_customer.setdefault(o["customer_name"], []).append(o)
+
+    lost_orders, duplicated, lost_updates = [], [], []
+    expected_stock = {}
+    for result in sessions:
+        for p in result["placed"]:
+            found = by_customer.get(p["customer"], [])
+            if not found:
+                lost_orders.append(p["customer"])
+                continue
+            if len(found) > 1:
+                duplicated.append(p["customer"])
+            if found[0].get("status") != "Completed":
+                lost_updates.append(found[0]["id"])
+            expected_stock[p["item"]] = expected_stock.get(p["item"], STOCK) - p["quantity"]
+    stock = {itm["id"]: itm.get("inventory") for t_items in menu.values() for itm in t_items}
+    inventory_drift = {i: stock.get(i, 0) - want for i, want in expected_stock.items() if stock.get(i) != want}
+    return {
+        "orders_placed": sum(len(r["placed"]) for r in sessions),
+        "lost_orders": lost_orders,
+        "orders_placed_twice": duplicated,
+        "duplicate_ids": sorted(i for i, n in Counter(ids).items() if n > 1),
+        "lost_status_updates": lost_updates,
+        "inventory_drift": inventory_drift,
+        "session_errors": [e for r in sessions for e in r["errors"]]
+    }
+
+
+def integrity_ok(report):
+    return not any(report[k] for k in ("lost_orders", "orders_placed_twice", "duplicate_ids",
+                                       "lost_status_updates", "inventory_drift", "session_errors"))
+
+
+def latency_stats(sessions, tag):
+    by_step = {}
+    for result in sessions:
+        for step, ms in result["latencies"]:
+            by_step.setdefault(step, []).append(ms)
+    stats = {}
+    for step, runs in by_step.items():
+        runs.sort()
+        stats[f"loadtest.{step}@{tag}"] = {
+            "min_ms": round(runs[0], 3),
+            "median_ms": round(statistics.median(runs), 3),
+            "p95_ms": round(runs[min(len(runs) - 1, int(len(runs) * 0.95))], 3),
+            "max_ms": round(runs[-1], 3),
+            "mean_ms": round(statistics.fmean(runs), 3),
+            "repeat": len(runs)
+        }
+    return stats
+
+
+def run_load(n_sessions, orders_per_session, history, seed=0, keep=False):
+    data_dir = tempfile.mkdtemp(prefix=f"cafe_load_{n_sessions}_")
+    try:
+        print(f"Generating {history} orders in {data_dir}...")
+        prepare_data(data_dir, history, seed)
+        print(f"Running {n_sessions} sessions x {orders_per_session} orders...")
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=n_sessions) as pool:
+            futures = [pool.submit(run_session, i, data_dir, orders_per_session, seed) for i in range(n_sessions)]
+            sessions = [f.result() for f in futures]
+        wall = time.perf_counter() - start
+        integrity = check_integrity(data_dir, sessions)
+    finally:
+        if keep:
+            print(f"Data kept in {data_dir}")
+        else:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    return latency_stats(sessions, f"{n_sessions}x{history}"), integrity, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay concurrent cashier sessions against cafe.py")
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--orders-per-session", type=int, default=3)
+    parser.add_argument("--history", type=int, default=5000, help="orders already in the history")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep-data", action="store_true", help="keep the data directory for inspection")
+    parser.add_argument("--output", help="results file (default: bench_results/loadtest-<timestamp>.json)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.20,
+                        help="allowed slowdown against the baseline (0.20 = 20%%)")
+    args = parser.parse_args()
+
+    results, integrity, wall = run_load(args.sessions, args.orders_per_session, args.history,
+                                        args.seed, args.keep_data)
+    for key, stats in sorted(results.items()):
+        print(f"  {key:<44} median {stats['median_ms']:>9.1f} ms  p95 {stats['p95_ms']:>9.1f} ms  (n={stats['repeat']})")
+    print(f"Wall time {wall:.1f}s for {integrity['orders_placed']} orders")
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sessions": args.sessions,
+            "orders_per_session": args.orders_per_session,
+            "history": args.history,
+            "wall_seconds": round(wall, 3)
+        },
+        "results": results,
+        "integrity": integrity
+    }
+    output = args.output or os.path.join(DEFAULT_RESULTS_DIR, "loadtest-" + time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    failed = False
+    if integrity_ok(integrity):
+        print("✅ No lost orders, duplicate IDs, lost status updates or inventory drift")
+    else:
+        print("❌ Integrity check failed:")
+        print(json.dumps({k: v for k, v in integrity.items() if v and k != "orders_placed"}, indent=2))
+        failed = True
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    else:
+        baseline = load_json(args.baseline)
+        if not baseline:
+            print("No baseline found; run with --save-baseline to create one.")
+        else:
+            print(f"Comparing against {args.baseline} (threshold {args.threshold:.0%}):")
+            regressions = compare(results, baseline, args.threshold)
+            if regressions:
+                print(f"❌ {len(regressions)} regression(s) detected")
+                failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# menu_import.py
+import io
+import json
+
+import pandas as pd
+
+from config import MENU_CATEGORIES
+from storage import file_lock, load_json, save_json
+
+ID_PREFIXES = {"beverages": "BEV", "food": "FOOD"}
+IMPORT_COLUMNS = ["id", "item_type", "name", "price", "category", "description", "inventory", "available"]
+TRUTHY = {"true", "1", "yes", "y", "available"}
+FALSY = {"false", "0", "no", "n", "unavailable"}
+
+
+def template_csv():
+    rows = [
+        {"id": "", "item_type": "beverages", "name": "Iced Latte", "price": 4.5, "category": "Coffee",
+         "description": "Chilled latte over ice", "inventory": 40, "available": True},
+        {"id": "", "item_type": "", "name": "Paneer Sandwich", "price": 6.0, "category": "Sandwich",
+         "description": "Grilled paneer with mint chutney", "inventory": 25, "available": True}
+    ]
+    return pd.DataFrame(rows, columns=IMPORT_COLUMNS).to_csv(index=False)
+
+
+def read_upload(data, filename):
+    """Parse an uploaded CSV or JSON file (a list of items or a menu_data.json-shaped dict)."""
+    if filename.lower().endswith(".json"):
+        payload = json.loads(data)
+        if isinstance(payload, dict):
+            payload = [{**itm, "item_type": t} for t, items in payload.items() for itm in items]
+        df = pd.DataFrame(payload)
+    else:
+        df = pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False)
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    for col in IMPORT_COLUMNS:
+        if col not in df.columns:
+            df[col] = ""
+    return df[IMPORT_COLUMNS].fillna("").reset_index(drop=True)
+
+
+def _category_types():
+    return {c.lower(): t for t, cats in MENU_CATEGORIES.items() for c in cats}
+
+
+def validate(df, menu_data):
+    """Validate every row at once.
+
+    Returns (rows, errors): `rows` is the normalised frame of valid rows with
+    an `action` of insert or update; `errors` lists (row, field, message) with
+    row numbers matching the uploaded file (header = line 1).
+    """
+    df = df.copy()
+    line = pd.Series(df.index + 2, index=df.index)
+    checks = []
+
+    df["name"] = df["name"].astype(str).str.strip()
+    checks.append(("name", df["name"].eq(""), "Name is required"))
+
+    df["price"] = pd.to_numeric(df["price"], errors="coerce")
+    checks.append(("price", df["price"].isna(), "Price must be a number"))
+    checks.append(("price", df["price"].le(0), "Price must be greater than 0"))
+
+    inventory = df["inventory"].replace("", "0")
+    df["inventory"] = pd.to_numeric(inventory, errors="coerce")
+    checks.append(("inventory", df["inventory"].isna() | df["inventory"].lt(0) | (df["inventory"] % 1).ne(0),
+                   "Inventory must be a whole number ≥ 0"))
+
+    available = df["available"].astype(str).str.strip().str.lower()
+    checks.append(("available", ~available.isin(TRUTHY | FALSY | {""}), "Available must be true/false"))
+    df["available"] = ~available.isin(FALSY)
+
+    df["category"] = df["category"].astype(str).str.strip()
+    checks.append(("category", df["category"].eq(""), "Category is required"))
+    item_type = df["item_type"].astype(str).str.strip().str.lower()
+    item_type = item_type.where(item_type.ne(""), df["category"].str.lower().map(_category_types()))
+    checks.append(("item_type", ~item_type.isin(list(ID_PREFIXES)),
+                   "Item type must be beverages or food (or use a known category)"))
+    df["item_type"] = item_type
+
+    name_key = df["name"].str.lower()
+    checks.append(("name", name_key.ne("") & name_key.duplicated(keep=False), "Duplicate name in file"))
+
+    df["id"] = df["id"].astype(str).str.strip()
+    checks.append(("id", df["id"].ne("") & df["id"].duplicated(keep=False), "Duplicate id in file"))
+
+    # A name may only match the menu item it updates.
+    ids_by_name = {itm["name"].strip().lower(): itm["id"] for items in menu_data.values() for itm in items}
+    owner = name_key.map(ids_by_name)
+    checks.append(("name", df["id"].ne("") & owner.notna() & owner.ne(df["id"]),
+                   "Name already used by another menu item"))
+
+    df["description"] = df["description"].astype(str)
+
+    errors = pd.concat(
+        [pd.DataFrame({"row": line[mask], "field": field, "message": message}) for field, mask, message in checks],
+        ignore_index=True).sort_values(["row", "field"], kind="stable").reset_index(drop=True)
+
+    rows = df[~df.index.isin(errors["row"] - 2)].copy()
+    rows["inventory"] = rows["inventory"].astype(int)
+
+    # Upsert: match existing items by id, then by name; everything else is new.
+    existing_ids = {itm["id"] for items in menu_data.values() for itm in items}
+    by_name = rows["name"].str.lower().map(ids_by_name)
+    rows["id"] = rows["id"].where(rows["id"].ne(""), by_name.fillna(""))
+    rows["action"] = rows["id"].isin(existing_ids).map({True: "update", False: "insert"})
+    return rows, errors
+
+
+def allocate_ids(rows, menu_data):
+    """Assign IDs to new rows without one, in a single pass per item type."""
+    rows = rows.copy()
+    for item_type, prefix in ID_PREFIXES.items():
+        max_id = 0
+        for itm in menu_data.get(item_type, []):
+            suffix = str(itm["id"])[len(prefix):]
+            if str(itm["id"]).startswith(prefix) and suffix.isdigit():
+                max_id = max(max_id, int(suffix))
+        needs_id = rows["item_type"].eq(item_type) & rows["id"].eq("")
+        rows.loc[needs_id, "id"] = [f"{prefix}{n:03d}" for n in range(max_id + 1, max_id + 1 + int(needs_id.sum()))]
+    return rows
+
+
+def _items(rows):
+    return [{
+        "id": r.id, "name": r.name, "price": float(r.price), "category": r.category,
+        "available": bool(r.available), "description": r.description, "inventory": int(r.inventory)
+    } for r in rows.itertuples(index=False)]
+
+
+def upsert_menu_file(rows, menu_file):
+    """Apply validated rows to menu_data.json in one locked write.
+
+    Returns (inserted, updated, items_by_type).
+    """
+    with file_lock(menu_file):
+        menu_data = load_json(menu_file) or {"beverages": [], "food": []}
+        rows = allocate_ids(rows, menu_data)
+        position = {itm["id"]: (t, i) for t, items in menu_data.items() for i, itm in enumerate(items)}
+        inserted = updated = 0
+        changed = {}
+        for item_type, item in zip(rows["item_type"], _items(rows)):
+            if item["id"] in position:
+                t, i = position[item["id"]]
+                menu_data[t][i].update(item)
+                updated += 1
+            else:
+                menu_data.setdefault(item_type, []).append(item)
+                position[item["id"]] = (item_type, len(menu_data[item_type]) - 1)
+                inserted += 1
+            changed.setdefault(item_type, []).append(item)
+        save_json(menu_file, menu_data)
+    return inserted, updated, changed
+
+
+def upsert_sqlite(items_by_type, conn):
+    """Upsert items into menu_items with one executemany in one transaction."""
+    params = [(itm["id"], itm["name"], itm["price"], itm["category"], int(itm["available"]),
+               itm["description"], itm["inventory"])
+              for items in items_by_type.values() for itm in items]
+    with conn:
+        conn.executemany("""
+        INSERT INTO menu_items (item_id, name, price, category, available, description, inventory)
+        VALUES (?,?,?,?,?,?,?)
+        ON CONFLICT(item_id) DO UPDATE SET
+            name = excluded.name, price = excluded.price, category = excluded.category,
+            available = excluded.available, description = excluded.description,
+            inventory = excluded.inventory""", params)
+    return len(params)
@@ -0,0 +1,15 @@
+# menu_qr.py
+import io
+import qrcode
+
+# --- QR Code generation ---
+
+def generate_menu_qr(cafe_url):
+    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(cafe_url)
+    qr.make(fit=True)
+    qr_img = qr.make_image(fill_color="black", back_color="white")
+    img_buffer = io.BytesIO()
+    qr_img.save(img_buffer, format='PNG')
+    img_buffer.seek(0)
+    return img_buffer
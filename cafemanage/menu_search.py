@@ -0,0 +1,82 @@
+# menu_search.py
+import bisect
+import difflib
+import re
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(str(text or "").lower())
+
+
+class MenuIndex:
+    """Prefix and fuzzy search over available menu items.
+
+    Built once per menu version; every lookup after that is a binary search
+    over a sorted token list instead of a scan of the menu.
+    """
+
+    def __init__(self, menu_data):
+        self.items = {}
+        self.sections = {}
+        self.by_category = {}
+        postings = {}
+        for section, items in menu_data.items():
+            for itm in items:
+                if not itm.get('available', True):
+                    continue
+                self.items[itm["id"]] = itm
+                self.sections[itm["id"]] = section
+                self.by_category.setdefault(itm["category"], []).append(itm)
+                for field, weight in (("name", 2), ("description", 1)):
+                    for token in tokenize(itm.get(field)):
+                        ids = postings.setdefault(token, {})
+                        ids[itm["id"]] = max(ids.get(itm["id"], 0), weight)
+        for items in self.by_category.values():
+            items.sort(key=lambda itm: itm["name"].lower())
+        self.vocab = sorted(postings)
+        self.postings = postings
+
+    def categories(self):
+        return sorted(self.by_category)
+
+    def in_category(self, category):
+        return self.by_category.get(category, [])
+
+    def _prefix_matches(self, prefix):
+        """{item_id: weight} for every token starting with `prefix`."""
+        matches = {}
+        i = bisect.bisect_left(self.vocab, prefix)
+        while i < len(self.vocab) and self.vocab[i].startswith(prefix):
+            for item_id, weight in self.postings[self.vocab[i]].items():
+                matches[item_id] = max(matches.get(item_id, 0), weight)
+            i += 1
+        return matches
+
+    def _fuzzy_matches(self, token):
+        matches = {}
+        for close in difflib.get_close_matches(token, self.vocab, n=5, cutoff=0.75):
+            for item_id, weight in self.postings[close].items():
+                matches[item_id] = max(matches.get(item_id, 0), weight)
+        return matches
+
+    def search(self, query, limit=25):
+        """Items matching every query token by prefix, falling back to fuzzy matches.
+
+        Name hits rank above description hits; ties sort by name.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        scores = None
+        for token in tokens:
+            matches = self._prefix_matches(token) or self._fuzzy_matches(token)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {item_id: scores[item_id] + w for item_id, w in matches.items() if item_id in scores}
+            if not scores:
+                return []
+        ranked = sorted(scores, key=lambda item_id: (-scores[item_id], self.items[item_id]["name"].lower()))
+        return [self.items[item_id] for item_id in ranked[:limit]]
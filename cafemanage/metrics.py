@@ -0,0 +1,164 @@
+# metrics.py
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency percentiles are computed over the most recent samples only.
+SAMPLE_WINDOW = 1024
+
+_lock = threading.Lock()
+_timers = {}
+_counters = {}
+_server = None
+
+
+class _Timer:
+    __slots__ = ("count", "total", "max", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=SAMPLE_WINDOW)
+
+
+# --- Recording ---
+
+def observe(name, seconds):
+    with _lock:
+        t = _timers.get(name)
+        if t is None:
+            t = _timers[name] = _Timer()
+        t.count += 1
+        t.total += seconds
+        t.max = max(t.max, seconds)
+        t.samples.append(seconds)
+
+def incr(name, n=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+@contextmanager
+def timer(name):
+    """Time the enclosed block; exceptions are counted as `<name>_errors`."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        incr(f"{name}_errors")
+        raise
+    finally:
+        observe(name, time.perf_counter() - start)
+
+def timed(name):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def reset():
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+# --- Reporting ---
+
+def _percentile(sorted_samples, q):
+    if not sorted_samples:
+        return 0.0
+    idx = min(len(sorted_samples) - 1, int(round(q * (len(sorted_samples) - 1))))
+    return sorted_samples[idx]
+
+def snapshot():
+    """Return {"timers": {name: stats_ms}, "counters": {name: value}}."""
+    with _lock:
+        timers = {name: (t.count, t.total, t.max, sorted(t.samples)) for name, t in _timers.items()}
+        counters = dict(_counters)
+    stats = {}
+    for name, (count, total, max_s, samples) in sorted(timers.items()):
+        stats[name] = {
+            "count": count,
+            "total_ms": round(total * 1000, 3),
+            "p50_ms": round(_percentile(samples, 0.50) * 1000, 3),
+            "p99_ms": round(_percentile(samples, 0.99) * 1000, 3),
+            "max_ms": round(max_s * 1000, 3)
+        }
+    return {"timers": stats, "counters": dict(sorted(counters.items()))}
+
+def to_json():
+    return json.dumps(snapshot(), indent=2)
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+def to_prometheus():
+    """Render the snapshot in the Prometheus text exposition format."""
+    snap = snapshot()
+    lines = [
+        "# HELP cafe_latency_seconds Latency of instrumented operations.",
+        "# TYPE cafe_latency_seconds summary"
+    ]
+    for name, s in snap["timers"].items():
+        op = _label(name)
+        lines.append(f'cafe_latency_seconds{{op="{op}",quantile="0.5"}} {s["p50_ms"] / 1000}')
+        lines.append(f'cafe_latency_seconds{{op="{op}",quantile="0.99"}} {s["p99_ms"] / 1000}')
+        lines.append(f'cafe_latency_seconds_sum{{op="{op}"}} {s["total_ms"] / 1000}')
+        lines.append(f'cafe_latency_seconds_count{{op="{op}"}} {s["count"]}')
+    lines.append("# HELP cafe_events_total Counters for instrumented events.")
+    lines.append("# TYPE cafe_events_total counter")
+    for name, value in snap["counters"].items():
+        lines.append(f'cafe_events_total{{name="{_label(name)}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+# --- Scrape endpoint ---
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, ctype = to_json(), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, ctype = to_prometheus(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        payload = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_http_server(port, host="127.0.0.1"):
+    """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread.
+
+    Safe to call on every Streamlit rerun; only the first call binds.
+    """
+    global _server
+    with _lock:
+        if _server is not None:
+            return _server
+        _server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+    threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    return _server
+
+def serve_from_env():
+    """Start the endpoint when CAFE_METRICS_PORT is set (CAFE_METRICS_HOST defaults to 127.0.0.1)."""
+    global _server
+    port = os.getenv("CAFE_METRICS_PORT")
+    if port and _server is None:
+        try:
+            start_http_server(port, os.getenv("CAFE_METRICS_HOST", "127.0.0.1"))
+        except OSError:
+            # Another process on this host already serves the port; don't retry every rerun.
+            _server = False
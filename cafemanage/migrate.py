@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Resumable migration of the JSON data files into cafe.db.
+
+Menu, tables, users and settings are upserted in one transaction each. The
+order history is streamed record by record (orders_data.json keeps one order
+per line, see order_store.py) and written in chunked executemany
+transactions into `orders` and `order_items`. Each chunk commits together
+with its checkpoint, so an interrupted run resumes where it stopped without
+duplicating rows, and a later run picks up the orders appended since. The
+run ends with a second streaming pass over the source that checks the
+migrated keys, item counts, totals and statuses in cafe.db. A status or
+payment change is written in place and does not move the checkpoint, so
+before the check the orders that changed since they were migrated are found
+by one more streaming pass and migrated again. The file is read a chunk at
+a time under the order store's lock, so no line is read half-written.
+
+Usage:
+    python migrate.py
+    python migrate.py --data-dir /path/to/branch --db /path/to/cafe.db --chunk-size 10000
+    python migrate.py --restart        # forget checkpoints and migrate again
+"""
+
+import argparse
+import json
+import math
+import os
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+
+from database import DB_FILE, init_db
+from menu_import import upsert_sqlite
+from order_store import FOOTER, HEADER
+from storage import decode, file_lock, journal_pending, load_json, replay_journal
+
+CHUNK_SIZE = 5000
+
+ORDER_COLUMNS = ["order_id", "customer_name", "table_number", "subtotal", "tax", "service_charge",
+                 "discount", "total", "date", "time", "status", "payment_status"]
+
+
+# --- Checkpoints ---
+
+def _init_state(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS migration_state (
+        source TEXT PRIMARY KEY,
+        position INTEGER NOT NULL DEFAULT 0,   -- records migrated
+        byte_offset INTEGER,                   -- where the next record starts (line layout)
+        file_id TEXT                           -- inode the offset refers to
+    )""")
+    # A re-migrated order replaces its item rows.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items (order_id)")
+    conn.commit()
+
+def load_state(conn, source):
+    row = conn.execute("SELECT position, byte_offset, file_id FROM migration_state WHERE source = ?",
+                       (source,)).fetchone()
+    keys = ["position", "byte_offset", "file_id"]
+    return dict(zip(keys, row)) if row else {"position": 0, "byte_offset": None, "file_id": None}
+
+def save_state(conn, source, state):
+    conn.execute("""
+    INSERT OR REPLACE INTO migration_state (source, position, byte_offset, file_id)
+    VALUES (?,?,?,?)""", (source, state["position"], state["byte_offset"], state["file_id"]))
+
+
+# --- Streaming the order history ---
+
+def _file_id(path):
+    return str(os.stat(path).st_ino)
+
+def _decodes(raw):
+    try:
+        decode(raw)
+        return True
+    except Exception:
+        return False
+
+@contextmanager
+def _settled(path):
+    """Hold the order store's shared lock with no in-place write pending. A
+    journal left by a crash is replayed first, as OrderStore.ensure does."""
+    while True:
+        with file_lock(path, shared=True):
+            if not journal_pending(path):
+                yield
+                return
+        with file_lock(path):
+            replay_journal(path)
+
+def _read_lines(path, position, offset, file_id, limit):
+    """Up to `limit` order lines, from `offset` while the file is still
+    `file_id`, else after the first `position` ones.
+
+    Returns ([(line, next_offset)], file_id).
+    """
+    with _settled(path), open(path, 'rb') as f:
+        current = _file_id(path)
+        if offset and file_id == current:
+            f.seek(offset)
+            skip = 0
+        else:
+            f.seek(len(HEADER))
+            skip = position
+        offset = f.tell()
+        lines = []
+        for line in f:
+            offset += len(line)
+            if line == FOOTER or not line.strip():
+                break
+            if skip:
+                skip -= 1
+                continue
+            lines.append((line, offset))
+            if len(lines) >= limit:
+                break
+    return lines, current
+
+def iter_orders(path, state, chunk_size=CHUNK_SIZE):
+    """Yield (order, next_offset, file_id) for orders not yet migrated.
+
+    Files in the order store's line layout are read `chunk_size` lines at a
+    time under its lock and resume by seeking to the checkpointed byte offset;
+    any other format is loaded whole and resumes by skipping the migrated
+    records.
+    """
+    with _settled(path), open(path, 'rb') as f:
+        first = f.readline() + f.readline()
+    line_layout = first == HEADER + FOOTER or first.startswith(HEADER + b" {") and _decodes(first[len(HEADER) + 1:])
+    if line_layout:
+        position, offset, file_id = state["position"], state["byte_offset"], state["file_id"]
+        while True:
+            lines, file_id = _read_lines(path, position, offset, file_id, chunk_size)
+            for line, offset in lines:
+                position += 1
+                yield decode(line[1:]), offset, file_id
+            if len(lines) < chunk_size:
+                return
+    with _settled(path):
+        orders = load_json(path) or []
+    for order in orders[state["position"]:]:
+        yield order, None, None
+
+def _order_rows(orders):
+    order_rows, item_rows = [], []
+    for o in orders:
+        order_rows.append((o["id"], o.get("customer_name"), o.get("table_number"), o.get("subtotal"),
+                           o.get("tax"), o.get("service_charge"), o.get("discount", 0), o.get("total"),
+                           o.get("date"), o.get("time"), o.get("status"), o.get("payment_status", "Unpaid")))
+        item_rows.extend((o["id"], itm["id"], itm["quantity"], itm["subtotal"]) for itm in o.get("items", []))
+    return order_rows, item_rows
+
+UPSERT_ORDER = (f"INSERT INTO orders ({', '.join(ORDER_COLUMNS)}) VALUES ({', '.join('?' * len(ORDER_COLUMNS))}) "
+                "ON CONFLICT(order_id) DO UPDATE SET " +
+                ", ".join(f"{c} = excluded.{c}" for c in ORDER_COLUMNS[1:]))
+
+def _write_orders(conn, orders, state=None):
+    """Upsert `orders` and replace their item rows in one transaction, with the checkpoint if given."""
+    order_rows, item_rows = _order_rows(orders)
+    with conn:
+        conn.executemany(UPSERT_ORDER, order_rows)
+        conn.executemany("DELETE FROM order_items WHERE order_id = ?", [(r[0],) for r in order_rows])
+        conn.executemany("INSERT INTO order_items (order_id, item_id, quantity, subtotal) VALUES (?,?,?,?)",
+                         item_rows)
+        if state is not None:
+            save_state(conn, "orders", state)   # same transaction: a chunk is applied exactly once
+
+def migrate_orders(conn, path, chunk_size=CHUNK_SIZE, progress=print):
+    """Migrate the orders after the checkpoint: the rest of an interrupted run,
+    or the orders appended since the last one."""
+    state = load_state(conn, "orders")
+    start = time.perf_counter()
+    batch = []
+
+    def flush(next_offset, file_id):
+        state["position"] += len(batch)
+        state["byte_offset"] = next_offset
+        state["file_id"] = file_id
+        _write_orders(conn, batch, state)
+        elapsed = time.perf_counter() - start
+        progress(f"orders: {state['position']} migrated ({state['position'] / max(elapsed, 1e-9):,.0f}/s)")
+        batch.clear()
+
+    position = state["position"]
+    for order, next_offset, file_id in iter_orders(path, dict(state), chunk_size):
+        batch.append(order)
+        if len(batch) >= chunk_size:
+            flush(next_offset, file_id)
+    if batch:
+        flush(next_offset, file_id)
+    if state["position"] == position:
+        progress(f"orders: up to date ({position} orders)")
+    return state
+
+def _changed(conn, orders):
+    """The orders whose status or payment in cafe.db differs from the source."""
+    by_id = {str(o["id"]): o for o in orders}
+    stored = {r[0]: (r[1], r[2]) for r in conn.execute(
+        f"SELECT order_id, status, payment_status FROM orders WHERE order_id IN ({', '.join('?' * len(by_id))})",
+        list(by_id))}
+    return [o for oid, o in by_id.items() if oid in stored
+            and stored[oid] != (o.get("status"), o.get("payment_status", "Unpaid"))]
+
+def refresh_orders(conn, path, progress=print):
+    """Migrate again the orders whose status or payment changed in place since
+    they were migrated. Returns how many were."""
+    n = 0
+    chunk = []
+    fresh = {"position": 0, "byte_offset": None, "file_id": None}
+    for order, _, _ in iter_orders(path, fresh):
+        chunk.append(order)
+        if len(chunk) >= 500:
+            changed = _changed(conn, chunk)
+            _write_orders(conn, changed)
+            n += len(changed)
+            chunk = []
+    if chunk:
+        changed = _changed(conn, chunk)
+        _write_orders(conn, changed)
+        n += len(changed)
+    if n:
+        progress(f"orders: {n} changed since migrated, migrated again")
+    return n
+
+
+# --- Small files ---
+
+def migrate_small_files(conn, data_dir, progress=print):
+    """Upsert menu, tables, users and settings (each one transaction)."""
+    menu = load_json(os.path.join(data_dir, "menu_data.json")) or {}
+    n = upsert_sqlite({t: [{**itm, "inventory": itm.get("inventory", 0), "description": itm.get("description", "")}
+                           for itm in items] for t, items in menu.items()}, conn)
+    progress(f"menu_items: {n}")
+
+    tables = load_json(os.path.join(data_dir, "tables_data.json")) or []
+    with conn:
+        conn.executemany("INSERT INTO tables (table_number, status) VALUES (?,?) "
+                         "ON CONFLICT(table_number) DO UPDATE SET status = excluded.status",
+                         [(t["table_number"], t.get("status", "Available")) for t in tables])
+    progress(f"tables: {len(tables)}")
+
+    users = load_json(os.path.join(data_dir, "users_data.json")) or []
+    with conn:
+        conn.executemany("INSERT INTO users (username, password, role) VALUES (?,?,?) "
+                         "ON CONFLICT(username) DO UPDATE SET password = excluded.password, role = excluded.role",
+                         [(u["username"], u["password"], u["role"]) for u in users])
+    progress(f"users: {len(users)}")
+
+    settings = load_json(os.path.join(data_dir, "settings.json")) or {}
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO settings (key, value) VALUES (?,?)",
+                         [(k, v if isinstance(v, str) else json.dumps(v)) for k, v in settings.items()])
+    progress(f"settings: {len(settings)}")
+    return {
+        ("menu_items", "item_id"): [itm["id"] for items in menu.values() for itm in items],
+        ("tables", "table_number"): [t["table_number"] for t in tables],
+        ("users", "username"): [u["username"] for u in users],
+        ("settings", "key"): list(settings)
+    }
+
+
+# --- Verification ---
+
+def _in_chunks(keys, size=500):
+    return (keys[i:i + size] for i in range(0, len(keys), size))
+
+def order_totals(conn, path):
+    """Recount the order history from the source file in one streaming pass,
+    alongside the same totals in cafe.db for those order ids only.
+
+    Returns {name: (source, db)}. The database may hold orders the file does
+    not (an earlier branch, test rows), so nothing is compared by table size.
+    """
+    totals = dict.fromkeys(["orders", "order_items", "item quantity", "revenue", "status"], (0, 0))
+
+    def count(orders):
+        by_id = {str(o["id"]): o for o in orders}   # the last copy of an id is the one migrated
+        marks = ", ".join("?" * len(by_id))
+        db_orders, db_revenue = conn.execute(f"SELECT COUNT(*), COALESCE(SUM(total), 0) FROM orders "
+                                             f"WHERE order_id IN ({marks})", list(by_id)).fetchone()
+        db_items, db_quantity = conn.execute(f"SELECT COUNT(*), COALESCE(SUM(quantity), 0) FROM order_items "
+                                             f"WHERE order_id IN ({marks})", list(by_id)).fetchone()
+        statuses = {r[0]: (r[1], r[2]) for r in conn.execute(f"SELECT order_id, status, payment_status FROM orders "
+                                                              f"WHERE order_id IN ({marks})", list(by_id))}
+        same_status = sum(statuses.get(oid) == (o.get("status"), o.get("payment_status", "Unpaid"))
+                          for oid, o in by_id.items())
+        items = [itm for o in by_id.values() for itm in o.get("items", [])]
+        for name, source, db in [("orders", len(by_id), db_orders),
+                                 ("order_items", len(items), db_items),
+                                 ("item quantity", sum(itm["quantity"] for itm in items), db_quantity),
+                                 ("revenue", sum(o.get("total") or 0 for o in by_id.values()), db_revenue),
+                                 ("status", len(by_id), same_status)]:
+            totals[name] = (totals[name][0] + source, totals[name][1] + db)
+
+    chunk = []
+    fresh = {"position": 0, "byte_offset": None, "file_id": None}
+    for order, _, _ in iter_orders(path, fresh):
+        chunk.append(order)
+        if len(chunk) >= 500:
+            count(chunk)
+            chunk = []
+    if chunk:
+        count(chunk)
+    return totals
+
+def verify(conn, orders_path, small_keys):
+    """Compare cafe.db with an independent recount of the sources; returns a
+    list of mismatches."""
+    checks = []
+    for name, (source, db) in order_totals(conn, orders_path).items():
+        if name == "revenue":
+            source, db = round(source, 2), round(db, 2)
+        checks.append((name, source, db))
+    # The target may hold rows the JSON files do not (seeded tables, settings), so
+    # small files are checked by key rather than by table size.
+    for (table, key), ids in small_keys.items():
+        found = sum(conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {key} IN ({', '.join('?' * len(chunk))})",
+                                 chunk).fetchone()[0]
+                    for chunk in _in_chunks(ids))
+        checks.append((table, len(set(ids)), found))
+    mismatches = []
+    for name, expected, actual in checks:
+        ok = math.isclose(expected, actual, rel_tol=1e-9, abs_tol=0.01)
+        print(f"  {'✅' if ok else '❌'} {name:<14} source {expected:>14} db {actual:>14}")
+        if not ok:
+            mismatches.append(name)
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate the JSON data files into cafe.db")
+    parser.add_argument("--data-dir", default=".")
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--restart", action="store_true",
+                        help="forget checkpoints and migrated order items, then migrate again")
+    args = parser.parse_args()
+
+    init_db(table_count=0, db_file=args.db)
+    conn = sqlite3.connect(args.db)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    _init_state(conn)
+    if args.restart:
+        with conn:
+            conn.execute("DELETE FROM migration_state")
+            conn.execute("DELETE FROM order_items")   # derived from the orders; orders themselves are upserted
+
+    start = time.perf_counter()
+    small_keys = migrate_small_files(conn, args.data_dir)
+    orders_path = os.path.join(args.data_dir, "orders_data.json")
+    migrate_orders(conn, orders_path, args.chunk_size)
+    refresh_orders(conn, orders_path)
+    print(f"Migrated in {time.perf_counter() - start:.1f}s. Verifying:")
+    mismatches = verify(conn, orders_path, small_keys)
+    conn.close()
+    if mismatches:
+        sys.exit(f"Verification failed: {', '.join(mismatches)}")
+    print("✅ cafe.db matches the JSON sources")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# order_actions.py
+import hashlib
+import json
+import os
+import time
+
+import metrics
+from orders import bulk_changes, deduct_inventory, restock_inventory
+from storage import atomic_write, encode, decode, file_lock, load_json, save_json
+
+# --- Status changes that move stock ---
+# Cancelling an order restocks its items and reopening one deducts them again,
+# so one status change writes two files: the order store and the menu. Before
+# either is touched, the order changes and the menu as it must end up are
+# written to <orders file>.pending together with a digest of the menu they
+# were computed from. The marker is removed once both writes are done, and
+# settle_pending() finishes an interrupted change:
+#
+#   menu still matches the digest  -> write the order changes and the menu
+#   menu already matches the marker -> write the order changes (idempotent)
+#   anything else                  -> the menu was edited since; the marker is
+#                                     set aside as <file>.pending.<ts>.unresolved
+
+
+class OutOfStock(ValueError):
+    """Reopening a cancelled order needs more stock than the menu holds."""
+
+    def __init__(self, item_name):
+        super().__init__(f"Not enough inventory for {item_name}")
+        self.item_name = item_name
+
+
+def pending_path(orders_path):
+    return orders_path + ".pending"
+
+
+def _digest(menu_data):
+    return hashlib.sha256(json.dumps(menu_data, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+def _read_pending(path):
+    try:
+        with open(path, 'rb') as f:
+            return decode(f.read())
+    except FileNotFoundError:
+        return None
+
+
+def settle_pending(store, menu_path):
+    """Finish a status change interrupted between its two writes.
+
+    Returns (orders updated, menu written or None); ([], None) when there was
+    nothing to finish.
+    """
+    path = pending_path(store.path)
+    if not os.path.exists(path):
+        return [], None
+    with file_lock(store.path), file_lock(menu_path):
+        marker = _read_pending(path)
+        if marker is None:
+            return [], None
+        menu_data = load_json(menu_path)
+        current = _digest(menu_data) if menu_data is not None else None
+        if current not in (marker["menu_before"], _digest(marker["menu"])):
+            os.replace(path, f"{path}.{int(time.time())}.unresolved")
+            metrics.incr("pending_stock_unresolved")
+            return [], None
+        updated = store.update_many(marker["orders"])
+        written = None
+        if current == marker["menu_before"]:
+            save_json(menu_path, marker["menu"])
+            written = marker["menu"]
+        os.remove(path)
+        metrics.incr("pending_stock_replays")
+    return updated, written
+
+
+def change_orders(store, menu_path, order_ids, status=None, payment_status=None, cancel=False):
+    """Apply a status or payment change to the selected orders and the matching
+    stock movement, all or nothing.
+
+    Returns (orders updated, menu written or None, ids of the items whose stock
+    moved, units restocked). Raises OutOfStock, before anything is written,
+    when reopening an order needs more stock than is left.
+    """
+    with file_lock(store.path), file_lock(menu_path):
+        settle_pending(store, menu_path)
+        # Decide against the latest records so an order cancelled elsewhere is not restocked twice.
+        latest = [o for o in (store.get(oid) for oid in order_ids) if o]
+        changes, restock, deduct = bulk_changes(latest, status, payment_status, cancel)
+        if not restock and not deduct:
+            return store.update_many(changes), None, set(), 0
+
+        menu_data = load_json(menu_path) or {"beverages": [], "food": []}
+        before = _digest(menu_data)
+        short_item = deduct_inventory(menu_data, deduct)
+        if short_item:
+            raise OutOfStock(short_item)
+        restocked = restock_inventory(menu_data, restock)
+        path = pending_path(store.path)
+        atomic_write(path, encode({"orders": changes, "menu_before": before, "menu": menu_data}), notify=False)
+        updated = store.update_many(changes)
+        save_json(menu_path, menu_data)
+        os.remove(path)
+    return updated, menu_data, {itm["id"] for itm in restock + deduct}, restocked
@@ -0,0 +1,71 @@
+# order_ids.py
+import json
+import os
+import threading
+
+from storage import atomic_write, file_lock, load_json
+
+ORDER_SEQ_FILE = "order_seq.json"
+DEFAULT_PREFIX = "ORD"
+DEFAULT_BLOCK_SIZE = 20
+
+
+def max_id_number(order_ids, prefix):
+    """Highest numeric suffix among `order_ids` with this prefix (0 if none)."""
+    highest = 0
+    for oid in order_ids:
+        if oid.startswith(prefix) and oid[len(prefix):].isdigit():
+            highest = max(highest, int(oid[len(prefix):]))
+    return highest
+
+
+class OrderIdAllocator:
+    """Hands out monotonic order IDs from a shared counter file.
+
+    Each process reserves a block of `block_size` numbers under a file lock and
+    then allocates from it in memory, so terminals don't contend per order.
+    IDs from different terminals interleave and a restart leaves a gap, but an
+    ID is never handed out twice, even after orders are deleted.
+    """
+
+    def __init__(self, counter_path=ORDER_SEQ_FILE, prefix=DEFAULT_PREFIX,
+                 block_size=DEFAULT_BLOCK_SIZE, seed=None):
+        self.counter_path = counter_path
+        self.prefix = prefix
+        self.block_size = max(1, int(block_size))
+        self.seed = seed  # seed(prefix) -> highest number already in use
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+
+    def _reserve_block(self):
+        with file_lock(self.counter_path):
+            counters = load_json(self.counter_path) or {}
+            start = counters.get(self.prefix)
+            if start is None:
+                start = (self.seed(self.prefix) if self.seed else 0) + 1
+            counters[self.prefix] = start + self.block_size
+            atomic_write(self.counter_path, json.dumps(counters).encode("utf-8"))
+        self._next, self._end = start, start + self.block_size
+
+    def next_id(self):
+        with self._lock:
+            if self._next >= self._end:
+                self._reserve_block()
+            number = self._next
+            self._next += 1
+        return f"{self.prefix}{number:05d}"
+
+
+_allocators = {}
+_allocators_lock = threading.Lock()
+
+def get_allocator(prefix=None, counter_path=ORDER_SEQ_FILE, seed=None):
+    """Process-wide allocator per prefix; CAFE_OUTLET_PREFIX and CAFE_ORDER_ID_BLOCK override the defaults."""
+    prefix = prefix or os.getenv("CAFE_OUTLET_PREFIX") or DEFAULT_PREFIX
+    with _allocators_lock:
+        allocator = _allocators.get((prefix, counter_path))
+        if allocator is None:
+            block_size = int(os.getenv("CAFE_ORDER_ID_BLOCK", DEFAULT_BLOCK_SIZE))
+            allocator = _allocators[(prefix, counter_path)] = OrderIdAllocator(counter_path, prefix, block_size, seed)
+        return allocator
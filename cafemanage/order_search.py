@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Inverted index for Order History search.
+
+Every order is split into tokens (customer name, order id, table number and
+item names) stored as (token, order_id, weight) postings in a SQLite file next
+to the order store. New orders are indexed as they are placed, so a search is
+a handful of index range scans instead of a pass over the order history.
+Each order's status and date are kept beside it, so the Order History
+filters are part of the query and browsing without a search needs no pass
+over the history either.
+
+Usage:
+    python order_search.py rebuild orders_data.json
+    python order_search.py search orders_data.json "priya latte"
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import metrics
+from menu_search import tokenize
+from storage import file_version, load_json
+
+# Weights rank a hit on the order id above the customer, table and items.
+FIELD_WEIGHTS = {"id": 4, "customer": 3, "table": 2, "item": 1}
+MAX_RESULTS = 500
+# A query whose rarest term has more postings than this is answered from the
+# newest SEARCH_WINDOW orders only, which keeps broad queries ("5") fast.
+MAX_CANDIDATES = 20000
+SEARCH_WINDOW = 50000
+BATCH_SIZE = 5000
+
+
+def index_path(orders_path):
+    """orders_data.json -> orders_data_search.db"""
+    return os.path.splitext(orders_path)[0] + "_search.db"
+
+
+def order_tokens(order):
+    """{token: weight} for one order."""
+    tokens = {}
+
+    def add(text, weight):
+        for token in tokenize(text):
+            tokens[token] = max(tokens.get(token, 0), weight)
+
+    oid = str(order.get("id", ""))
+    add(oid, FIELD_WEIGHTS["id"])
+    digits = oid[len(oid.rstrip("0123456789")):]
+    if digits:
+        add(str(int(digits)), FIELD_WEIGHTS["id"])   # "ORD00042" is also found by "42"
+    add(order.get("customer_name"), FIELD_WEIGHTS["customer"])
+    add(order.get("table_number"), FIELD_WEIGHTS["table"])
+    for item in order.get("items", []):
+        add(item.get("name"), FIELD_WEIGHTS["item"])
+    return tokens
+
+
+def _term(token):
+    """SQL condition and parameters for one query token.
+
+    Tokens match by prefix ("lat" finds Latte); single characters must match
+    exactly so "5" finds table 5 rather than every order with a 5 in it.
+    """
+    if len(token) == 1:
+        return "token = ?", [token]
+    return "token >= ? AND token < ?", [token, token[:-1] + chr(ord(token[-1]) + 1)]
+
+
+def _filters(status, date):
+    """SQL appended to a WHERE on `orders o` for the Order History filters."""
+    cond, params = "", []
+    if status:
+        cond += " AND o.status = ?"
+        params.append(status)
+    if date:
+        cond += " AND o.date = ?"
+        params.append(str(date))
+    return cond, params
+
+
+class OrderSearchIndex:
+    """Token -> orders postings in SQLite, safe to share between sessions.
+
+    Orders get an integer `doc` in insertion order, so postings stay small
+    and "newest orders" is a range on the primary key.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+        CREATE TABLE IF NOT EXISTS orders (
+            doc INTEGER PRIMARY KEY,
+            order_id TEXT NOT NULL UNIQUE,
+            ts TEXT NOT NULL,
+            tokens TEXT NOT NULL,          -- space separated, for re-indexing
+            status TEXT,
+            date TEXT
+        );
+        CREATE TABLE IF NOT EXISTS postings (
+            token TEXT NOT NULL,
+            doc INTEGER NOT NULL,
+            weight INTEGER NOT NULL,
+            PRIMARY KEY (token, doc)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        """)
+        columns = {r[1] for r in self.conn.execute("PRAGMA table_info(orders)")}
+        if "status" not in columns:
+            # Index built before the filter columns: empty it so catch_up() rebuilds it once.
+            with self.conn:
+                self.conn.execute("ALTER TABLE orders ADD COLUMN status TEXT")
+                self.conn.execute("ALTER TABLE orders ADD COLUMN date TEXT")
+                self.conn.execute("DELETE FROM postings")
+                self.conn.execute("DELETE FROM orders")
+                self.conn.execute("DELETE FROM meta")
+        self.conn.executescript("""
+        CREATE INDEX IF NOT EXISTS orders_status ON orders (status, doc);
+        CREATE INDEX IF NOT EXISTS orders_date ON orders (date, doc);
+        """)
+
+    def close(self):
+        self.conn.close()
+
+    def count(self, status=None, date=None):
+        cond, params = _filters(status, date)
+        with self._lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM orders o WHERE 1 = 1{cond}", params).fetchone()[0]
+
+    def _source_version(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'source_version'").fetchone()
+        return row[0] if row else None
+
+    def _index_one(self, order):
+        order_id = str(order["id"])
+        tokens = order_tokens(order)
+        fields = (order.get("timestamp", ""), " ".join(tokens), order.get("status", "Pending"), order.get("date"))
+        row = self.conn.execute("SELECT doc, tokens FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+        if row:
+            doc = row[0]
+            self.conn.executemany("DELETE FROM postings WHERE token = ? AND doc = ?",
+                                  [(t, doc) for t in row[1].split()])
+            self.conn.execute("UPDATE orders SET ts = ?, tokens = ?, status = ?, date = ? WHERE doc = ?",
+                              fields + (doc,))
+        else:
+            doc = self.conn.execute("INSERT INTO orders (order_id, ts, tokens, status, date) VALUES (?, ?, ?, ?, ?)",
+                                    (order_id,) + fields).lastrowid
+        return [(token, doc, weight) for token, weight in tokens.items()]
+
+    def add(self, orders, source_version=None, previous_version=None):
+        """Index (or re-index) orders in one transaction.
+
+        `source_version` is the order file version these orders bring the
+        index up to; catch_up() uses it to skip work when nothing changed.
+        With `previous_version`, it is only recorded if the index was current
+        as of that version, so an incremental add never hides missed orders.
+        """
+        with metrics.timer("order_search.add"), self._lock, self.conn:
+            # Take the write lock before reading: another process may be indexing the same orders.
+            self.conn.execute("BEGIN IMMEDIATE")
+            self._index_many(orders)
+            self._advance(source_version, previous_version)
+        return len(orders)
+
+    def _index_many(self, orders):
+        for start in range(0, len(orders), BATCH_SIZE):
+            postings = []
+            for order in orders[start:start + BATCH_SIZE]:
+                postings.extend(self._index_one(order))
+            self.conn.executemany("INSERT INTO postings (token, doc, weight) VALUES (?, ?, ?)", postings)
+
+    def _remove(self, order_ids):
+        for order_id in order_ids:
+            row = self.conn.execute("SELECT doc, tokens FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+            if row:
+                self.conn.executemany("DELETE FROM postings WHERE token = ? AND doc = ?",
+                                      [(t, row[0]) for t in row[1].split()])
+                self.conn.execute("DELETE FROM orders WHERE doc = ?", (row[0],))
+
+    def _advance(self, source_version, previous_version):
+        if source_version is not None and (previous_version is None or
+                                           self._source_version() == repr(tuple(previous_version))):
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('source_version', ?)",
+                              (repr(tuple(source_version)),))
+
+    def advance(self, source_version, previous_version):
+        """Record an order file change that touched no indexed field (a payment update)."""
+        with self._lock, self.conn:
+            self._advance(source_version, previous_version)
+
+    def is_current(self, source_version):
+        """True when the index has seen the order file at `source_version`."""
+        with self._lock:
+            return source_version is not None and self._source_version() == repr(tuple(source_version))
+
+    def catch_up(self, orders, source_version):
+        """Bring the index in line with the whole order history after writes
+        that skipped add() (other tools, a crash mid-write, a checkpoint
+        restore): new or changed orders are (re-)indexed, vanished ones removed.
+
+        A no-op when the order file has not changed since the last add().
+        Returns the number of orders indexed or removed.
+        """
+        with self._lock:
+            if source_version is not None and self._source_version() == repr(tuple(source_version)):
+                return 0
+            indexed = {r[0]: r[1:] for r in self.conn.execute("SELECT order_id, ts, tokens, status, date FROM orders")}
+        changed = []
+        for order in orders:
+            fields = (order.get("timestamp", ""), " ".join(order_tokens(order)), order.get("status", "Pending"),
+                      order.get("date"))
+            if indexed.pop(str(order.get("id")), None) != fields:
+                changed.append(order)
+        vanished = list(indexed)
+        with metrics.timer("order_search.catch_up"), self._lock, self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self._remove(vanished)
+            self._index_many(changed)
+            self._advance(source_version, None)
+        return len(changed) + len(vanished)
+
+    def browse(self, status=None, date=None, limit=-1, offset=0):
+        """Order ids newest first, optionally with one status and/or date."""
+        cond, params = _filters(status, date)
+        with metrics.timer("order_search.browse"), self._lock:
+            rows = self.conn.execute(f"SELECT order_id FROM orders o WHERE 1 = 1{cond} ORDER BY doc DESC LIMIT ? OFFSET ?",
+                                     params + [limit, offset]).fetchall()
+        return [r[0] for r in rows]
+
+    def search(self, query, limit=MAX_RESULTS, status=None, date=None):
+        """Orders matching every query token, best first.
+
+        Returns (order_ids, total, windowed). Ties are broken newest first.
+        `status` and `date` filter inside the query, before the limit.
+        `windowed` is True when the query was too broad and only the newest
+        SEARCH_WINDOW orders were searched.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return [], 0, False
+        terms = [_term(token) for token in tokens]
+        with metrics.timer("order_search.search"), self._lock:
+            # Postings counts are index range scans; the rarest term bounds the work.
+            rarest = min(self.conn.execute(f"SELECT COUNT(*) FROM postings WHERE {cond}", params).fetchone()[0]
+                         for cond, params in terms)
+            if rarest == 0:
+                return [], 0, False
+            min_doc = 0
+            if rarest > MAX_CANDIDATES:
+                max_doc = self.conn.execute("SELECT MAX(doc) FROM orders").fetchone()[0] or 0
+                min_doc = max_doc - SEARCH_WINDOW
+            union = " UNION ALL ".join(
+                f"SELECT doc, MAX(weight) AS w FROM postings WHERE {cond} AND doc > ? GROUP BY doc"
+                for cond, _ in terms)
+            params = [p for _, term_params in terms for p in term_params + [min_doc]]
+            cond, filter_params = _filters(status, date)
+            rows = self.conn.execute(f"""
+            SELECT o.order_id, COUNT(*) OVER ()
+            FROM ({union}) AS h
+            JOIN orders o ON o.doc = h.doc
+            WHERE 1 = 1{cond}
+            GROUP BY h.doc
+            HAVING COUNT(*) = ?
+            ORDER BY SUM(h.w) DESC, o.ts DESC
+            LIMIT ?""", params + filter_params + [len(terms), limit]).fetchall()
+        return [r[0] for r in rows], (rows[0][1] if rows else 0), min_doc > 0
+
+
+def rebuild(orders_path, db_path=None):
+    """Drop and rebuild the index for an order file."""
+    db_path = db_path or index_path(orders_path)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    index = OrderSearchIndex(db_path)
+    try:
+        return index.add(load_json(orders_path) or [], file_version(orders_path))
+    finally:
+        index.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Order search index tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rb = sub.add_parser("rebuild", help="rebuild the index from the order file")
+    rb.add_argument("orders_file")
+    sr = sub.add_parser("search", help="run a query and print the matching order ids")
+    sr.add_argument("orders_file")
+    sr.add_argument("query")
+    sr.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        start = time.perf_counter()
+        n = rebuild(args.orders_file)
+        print(f"Indexed {n} orders in {time.perf_counter() - start:.1f}s -> {index_path(args.orders_file)}")
+        return
+
+    if not os.path.exists(index_path(args.orders_file)):
+        sys.exit(f"No index for {args.orders_file}; run `rebuild` first")
+    index = OrderSearchIndex(index_path(args.orders_file))
+    start = time.perf_counter()
+    ids, total, windowed = index.search(args.query, args.limit)
+    elapsed = (time.perf_counter() - start) * 1000
+    print("\n".join(ids))
+    scope = f" among the newest {SEARCH_WINDOW} orders" if windowed else ""
+    print(f"{total} matches{scope} in {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+# order_store.py
+import json
+import mmap
+import os
+import sqlite3
+import threading
+
+import metrics
+import storage
+from storage import (atomic_write, decode, file_lock, load_json, maybe_checkpoint_file, notify_write,
+                     journal_pending, replay_journal, write_in_place)
+
+# --- Line layout ---
+# orders_data.json stays a plain JSON array, written one order per line:
+#
+#     [
+#      {"id":"ORD00001",...}        <- padded slot
+#     ,{"id":"ORD00002",...}
+#     ]
+#
+# Each line is padded with SLACK spaces so a status or payment change can be
+# written back in place. An append overwrites only the closing bracket. A side
+# index maps order id -> (offset, length) so one order is read with a single
+# slice of a memory-mapped file, whatever the size of the history.
+# Appends and slot rewrites go through storage.write_in_place, which journals
+# them first, so each one is all or nothing like an atomic_write.
+
+HEADER = b"[\n"
+FOOTER = b"]\n"
+SLACK = 32
+
+
+def offsets_path(orders_path):
+    """orders_data.json -> orders_data_offsets.db"""
+    return os.path.splitext(orders_path)[0] + "_offsets.db"
+
+
+def _encode(order):
+    if storage.orjson is not None:
+        return storage.orjson.dumps(order)
+    return json.dumps(order, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _line(record, lead, length=None):
+    body = lead + record
+    length = length or len(body) + SLACK + 1
+    return body + b" " * (length - len(body) - 1) + b"\n"
+
+
+def _scan(raw):
+    """Parse a file in the line layout.
+
+    Returns ([(order_id, offset, length)], end) where `end` is where the
+    footer belongs; a torn final line from an interrupted append is left out.
+    Returns None when the file is not in the line layout.
+    """
+    if not raw.startswith(HEADER):
+        return None
+    entries = []
+    pos = len(HEADER)
+    bad_at = None
+    while pos < len(raw):
+        nl = raw.find(b"\n", pos)
+        if nl < 0:
+            bad_at = pos if bad_at is None else bad_at   # unterminated: torn append
+            break
+        line = raw[pos:nl]
+        if line == b"]" and nl + 1 == len(raw):
+            break
+        try:
+            if line[:1] != (b"," if entries else b" "):
+                raise ValueError("bad separator")
+            order_id = str(decode(line[1:])["id"])
+        except Exception:
+            if bad_at is not None:
+                return None   # more than one damaged line: an indented file, not a torn append
+            bad_at = pos
+        else:
+            if bad_at is not None:
+                return None   # damage before a valid record is not a torn tail
+            entries.append((order_id, pos, nl + 1 - pos))
+        pos = nl + 1
+    return entries, (bad_at if bad_at is not None else pos)
+
+
+class _Stale(Exception):
+    """The index no longer matches the file (another writer replaced it)."""
+
+
+class OrderStore:
+    """Order history with O(1) lookup, in-place updates and appends.
+
+    The index lives in SQLite next to the order file and records the file's
+    (inode, size) it describes, so a replace by another tool is detected with
+    one stat() and the index is rebuilt.
+    """
+
+    def __init__(self, path, index_path=None):
+        self.path = path
+        self._lock = threading.RLock()
+        self._map = None
+        self._map_key = None
+        self.conn = sqlite3.connect(index_path or offsets_path(path), timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+        CREATE TABLE IF NOT EXISTS slots (
+            order_id TEXT PRIMARY KEY,
+            offset INTEGER NOT NULL,
+            length INTEGER NOT NULL
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        """)
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self.conn.close()
+
+    # --- Index bookkeeping ---
+
+    def _file_key(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return f"{st.st_ino}:{st.st_size}"
+
+    def _indexed_key(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'file'").fetchone()
+        return row[0] if row else None
+
+    def _set_indexed_key(self):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('file', ?)", (self._file_key(),))
+
+    def _replace_index(self, entries):
+        with self.conn:
+            self.conn.execute("DELETE FROM slots")
+            self.conn.executemany("INSERT OR REPLACE INTO slots (order_id, offset, length) VALUES (?, ?, ?)", entries)
+            self._set_indexed_key()
+
+    def _write_all(self, orders):
+        """Rewrite the whole file in the line layout (new file, legacy layout or a grown record)."""
+        parts = [HEADER]
+        entries = []
+        offset = len(HEADER)
+        for i, order in enumerate(orders):
+            line = _line(_encode(order), b"," if i else b" ")
+            entries.append((str(order["id"]), offset, len(line)))
+            parts.append(line)
+            offset += len(line)
+        parts.append(FOOTER)
+        atomic_write(self.path, b"".join(parts))
+        self._replace_index(entries)
+
+    def _reindex(self):
+        """Bring file and index back in step. Caller holds the file lock."""
+        with metrics.timer("order_store.reindex"):
+            try:
+                with open(self.path, 'rb') as f:
+                    raw = f.read()
+            except FileNotFoundError:
+                self._write_all([])
+                return
+            scanned = _scan(raw)
+            if scanned is None:
+                # Legacy (indented) file or mid-file damage: load_json recovers
+                # from a checkpoint if it has to.
+                self._write_all(load_json(self.path) or [])
+                return
+            entries, end = scanned
+            if end + len(FOOTER) != len(raw) or raw[end:] != FOOTER:
+                with open(self.path, 'r+b') as f:
+                    f.truncate(end)
+                    f.seek(end)
+                    f.write(FOOTER)
+                    f.flush()
+                    os.fsync(f.fileno())
+                metrics.incr("order_store_tail_repairs")
+            self._replace_index(entries)
+
+    def _tail_ok(self):
+        with open(self.path, 'rb') as f:
+            f.seek(-len(FOOTER), os.SEEK_END)
+            return f.read() == FOOTER
+
+    def ensure(self):
+        """Finish an interrupted write, repair a torn tail, convert a legacy file
+        and refresh the index if needed."""
+        with file_lock(self.path), self._lock:
+            replay_journal(self.path)
+            if self._indexed_key() is None or self._indexed_key() != self._file_key() or not self._tail_ok():
+                self._reindex()
+
+    # --- Reads ---
+
+    def _mapping(self, key):
+        if self._map_key != key:
+            if self._map is not None:
+                self._map.close()
+            with open(self.path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._map_key = key
+        return self._map
+
+    def _read(self, order_id):
+        key = self._file_key()
+        if key is None or key != self._indexed_key():
+            raise _Stale()
+        row = self.conn.execute("SELECT offset, length FROM slots WHERE order_id = ?", (order_id,)).fetchone()
+        if row is None:
+            return None
+        offset, length = row
+        line = self._mapping(key)[offset:offset + length]
+        try:
+            order = decode(line[1:])
+        except Exception:
+            raise _Stale()   # caught mid-write by another process
+        if str(order.get("id")) != order_id or journal_pending(self.path):
+            raise _Stale()   # a torn slot may still decode: settle the write under the lock
+        return order
+
+    def get(self, order_id):
+        """Fetch one order: an index lookup and one slice of the mapped file."""
+        order_id = str(order_id)
+        with metrics.timer("order_store.get"), self._lock:
+            try:
+                return self._read(order_id)
+            except _Stale:
+                pass
+        with file_lock(self.path), self._lock:
+            self.ensure()
+            try:
+                return self._read(order_id)
+            except _Stale:
+                self._reindex()
+                return self._read(order_id)
+
+    def ids(self, prefix=""):
+        """Order ids starting with `prefix`, read from the index alone."""
+        with file_lock(self.path), self._lock:
+            self.ensure()
+            rows = self.conn.execute("SELECT order_id FROM slots WHERE order_id >= ? AND order_id < ?",
+                                     (prefix, prefix + "\U0010ffff")).fetchall()
+        return [r[0] for r in rows]
+
+    def load_all(self):
+        with file_lock(self.path), self._lock:
+            self.ensure()
+            return load_json(self.path) or []
+
+    # --- Writes ---
+
+    def append(self, order):
+        """Add an order by rewriting only the closing bracket."""
+        record = _encode(order)
+        with metrics.timer("order_store.append"), file_lock(self.path), self._lock:
+            self.ensure()
+            end = os.path.getsize(self.path) - len(FOOTER)
+            line = _line(record, b"," if end > len(HEADER) else b" ")
+            write_in_place(self.path, [(end, line + FOOTER)])
+            with self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO slots (order_id, offset, length) VALUES (?, ?, ?)",
+                                  (str(order["id"]), end, len(line)))
+                self._set_indexed_key()
+            notify_write(self.path)
+            maybe_checkpoint_file(self.path)
+        return order
+
+    def update(self, order_id, changes):
+        """Apply `changes` to one order and write it back in its slot.
+
+        Returns the updated order, or None if the id is unknown.
+        """
+        updated = self.update_many({order_id: changes})
+        return updated[0] if updated else None
+
+    def update_many(self, changes):
+        """Apply {order_id: changes} as one journaled write: all or nothing.
+
+        Returns the updated orders; unknown ids are skipped. When a record
+        outgrows its slot, the whole batch becomes one rewrite of the file.
+        """
+        with metrics.timer("order_store.update"), file_lock(self.path), self._lock:
+            self.ensure()
+            slots = []
+            for order_id, change in changes.items():
+                row = self.conn.execute("SELECT offset, length FROM slots WHERE order_id = ?",
+                                        (str(order_id),)).fetchone()
+                if row:
+                    slots.append((row[0], row[1], str(order_id), change))
+            updated, patches, grown = [], [], False
+            with open(self.path, 'rb') as f:
+                for offset, length, order_id, change in sorted(slots):
+                    f.seek(offset)
+                    old = f.read(length)
+                    order = decode(old[1:])
+                    order.update(change)
+                    record = _encode(order)
+                    grown = grown or len(record) + 2 > length
+                    patches.append((offset, _line(record, old[:1], length) if len(record) + 2 <= length else None))
+                    updated.append(order)
+            if grown:
+                by_id = {str(o["id"]): o for o in updated}
+                self._write_all([by_id.get(str(o.get("id")), o) for o in load_json(self.path) or []])
+                metrics.incr("order_store_rewrites")
+            elif patches:
+                write_in_place(self.path, patches)
+            if updated:
+                notify_write(self.path)
+                maybe_checkpoint_file(self.path)
+        return updated
@@ -0,0 +1,89 @@
+# orders.py
+from datetime import datetime
+
+ORDER_STATUSES = ["Pending", "Preparing", "Ready", "Completed", "Cancelled"]
+PAYMENT_STATUSES = ["Unpaid", "Paid", "Partial"]
+
+def deduct_inventory(menu_data, cart):
+    """Subtract cart quantities from menu inventory.
+
+    Returns the name of the first item without enough stock, or None when
+    every line was deducted.
+    """
+    for order_item in cart:
+        for t in ["beverages", "food"]:
+            for menu_item in menu_data.get(t, []):
+                if menu_item["id"] == order_item["id"]:
+                    if menu_item.get("inventory", 0) < order_item["quantity"]:
+                        return menu_item["name"]
+                    menu_item["inventory"] -= order_item["quantity"]
+    return None
+
+def restock_inventory(menu_data, items):
+    """Put order item quantities back into menu inventory (cancellations).
+
+    Items no longer on the menu are skipped. Returns the number of units restocked.
+    """
+    quantities = {}
+    for itm in items:
+        quantities[itm["id"]] = quantities.get(itm["id"], 0) + itm["quantity"]
+    restocked = 0
+    for t in ["beverages", "food"]:
+        for menu_item in menu_data.get(t, []):
+            qty = quantities.get(menu_item["id"])
+            if qty:
+                menu_item["inventory"] = menu_item.get("inventory", 0) + qty
+                restocked += qty
+    return restocked
+
+def bulk_changes(orders_data, status=None, payment_status=None, cancel=False):
+    """Per-order changes for an Order History status or payment update.
+
+    Returns ({order_id: changes}, items_to_restock, items_to_deduct). An order
+    moving into Cancelled restocks its items and one moving out of Cancelled
+    takes them from stock again; unchanged orders are left out.
+    """
+    changes, restock, deduct = {}, [], []
+    for o in orders_data:
+        change = {}
+        if cancel:
+            change['status'] = 'Cancelled'
+        elif status:
+            change['status'] = status
+        if payment_status:
+            change['payment_status'] = payment_status
+        change = {k: v for k, v in change.items() if o.get(k) != v}
+        was_cancelled = o.get('status') == 'Cancelled'
+        if change.get('status') == 'Cancelled' and not was_cancelled:
+            restock.extend(o.get('items', []))
+        elif 'status' in change and was_cancelled:
+            deduct.extend(o.get('items', []))
+        if change:
+            changes[o['id']] = change
+    return changes, restock, deduct
+
+def new_order(order_id, customer_name, table_number, cart, quote, payment_status, now=None):
+    """Build an order record in the orders_data.json shape from a pricing quote
+    (see pricing.CartQuote); bill, e-mail and analytics read the amounts back."""
+    now = now or datetime.now()
+    order = {
+        "id": order_id,
+        "customer_name": customer_name,
+        "table_number": table_number,
+        "items": list(cart),
+        "subtotal": quote["subtotal"],
+        "discount": quote["discount"],
+        "tax": quote["tax"],
+        "tax_lines": quote["tax_lines"],
+        "service_charge": quote["service_charge"],
+        "total": quote["total"],
+        "date": str(now.date()),
+        "time": now.strftime("%H:%M:%S"),
+        "timestamp": now.isoformat(),
+        "status": "Pending",
+        "payment_status": payment_status
+    }
+    if quote.get("combo_savings"):
+        order["combo_savings"] = quote["combo_savings"]
+        order["combos"] = quote["combos"]
+    return order
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+In-memory PostgREST-compatible stand-in for testing replication offline.
+Implements the subset replication.py uses: upsert (POST with on_conflict),
+DELETE with `in.(...)` and GET with `gt.` filters, ordering and limits.
+Every upserted row gets a server-side updated_at, like a Supabase trigger.
+Like PostgREST, a bulk upsert whose objects have different keys is rejected
+with 400.
+
+Usage:
+    python postgrest_standin.py --port 3000 --fail-rate 0.1
+    CAFE_REPLICATION=1 SUPABASE_URL=http://127.0.0.1:3000 streamlit run cafe.py
+"""
+
+import argparse
+import json
+import random
+import threading
+import urllib.parse
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "/rest/v1/"
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, fail_rate=0.0):
+        super().__init__(address, _Handler)
+        self.tables = {}          # table -> {key: row}
+        self.fail_rate = fail_rate
+        self.lock = threading.Lock()
+        self.requests = 0
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _parse_in(value):
+    inner = value[len("in.("):-1]
+    return [v.strip('"') for v in inner.split(",")] if inner else []
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def _route(self):
+        url = urllib.parse.urlsplit(self.path)
+        if not url.path.startswith(PREFIX):
+            self.send_error(404)
+            return None, None
+        return url.path[len(PREFIX):], urllib.parse.parse_qs(url.query)
+
+    def _maybe_fail(self):
+        self.server.requests += 1
+        if self.server.fail_rate and random.random() < self.server.fail_rate:
+            self.send_error(503, "Simulated outage")
+            return True
+        return False
+
+    def _reply(self, status, body=None):
+        payload = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        table, query = self._route()
+        if table is None or self._maybe_fail():
+            return
+        rows = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"[]")
+        if isinstance(rows, dict):
+            rows = [rows]
+        if len({frozenset(row) for row in rows}) > 1:
+            self._reply(400, {"code": "PGRST102", "message": "All object keys must match"})
+            return
+        key = query.get("on_conflict", ["id"])[0]
+        with self.server.lock:
+            store = self.server.tables.setdefault(table, {})
+            for row in rows:
+                merged = {**store.get(row[key], {}), **row, "updated_at": _now()}
+                store[row[key]] = merged
+        self._reply(201)
+
+    def do_DELETE(self):
+        table, query = self._route()
+        if table is None or self._maybe_fail():
+            return
+        with self.server.lock:
+            store = self.server.tables.setdefault(table, {})
+            for column, values in query.items():
+                if values[0].startswith("in."):
+                    for key in _parse_in(values[0]):
+                        store.pop(key, None)
+        self._reply(204)
+
+    def do_GET(self):
+        table, query = self._route()
+        if table is None or self._maybe_fail():
+            return
+        order = query.pop("order", [None])[0]
+        limit = int(query.pop("limit", [0])[0]) or None
+        query.pop("select", None)
+        with self.server.lock:
+            rows = list(self.server.tables.get(table, {}).values())
+        for column, values in query.items():
+            op, _, value = values[0].partition(".")
+            if op == "gt":
+                rows = [r for r in rows if str(r.get(column, "")) > value]
+            elif op == "eq":
+                rows = [r for r in rows if str(r.get(column, "")) == value]
+        if order:
+            column, _, direction = order.partition(".")
+            rows.sort(key=lambda r: str(r.get(column, "")), reverse=direction == "desc")
+        self._reply(200, rows[:limit])
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=3000, host="127.0.0.1", fail_rate=0.0):
+    """Start the stand-in on a daemon thread and return the server."""
+    server = StandinServer((host, port), fail_rate)
+    threading.Thread(target=server.serve_forever, name="postgrest-standin", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local PostgREST stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    args = parser.parse_args()
+    server = StandinServer((args.host, args.port), args.fail_rate)
+    print(f"PostgREST stand-in on http://{args.host}:{args.port}{PREFIX}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
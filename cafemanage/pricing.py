@@ -0,0 +1,220 @@
+# pricing.py
+import json
+
+DEFAULT_TAX_RATE = 0.10
+DEFAULT_SERVICE_CHARGE = 0.05
+
+# --- Price book ---
+# Settings are compiled once per settings.json version into integer lookup
+# tables: tax rates in basis points keyed by menu section ("beverages",
+# "food") or item category ("Coffee"), and combos indexed by the items they
+# contain. All money is handled in integer cents, so a quote adds up to the
+# cent however the cart was built.
+#
+# settings.json:
+#     "tax_rate": 0.10,                                  # default rate
+#     "category_tax_rates": {"beverages": 0.05, "food": 0.12, "Juice": 0.0},
+#     "combos": [{"name": "Breakfast", "items": {"BEV003": 1, "FOOD001": 1}, "price": 5.5}]
+#
+# A category rate wins over its section's rate. Combos are applied in the
+# order listed, each as many times as the cart allows.
+
+
+def to_cents(amount):
+    return int(round(float(amount or 0) * 100))
+
+
+def _bp(rate):
+    """Rate (0.05) -> basis points (500)."""
+    return int(round(float(rate) * 10000))
+
+
+def _share(amount, rate_bp):
+    """Round-half-up amount * rate for non-negative integer cents."""
+    return (2 * amount * rate_bp + 10000) // 20000
+
+
+def _allocate(amount, weights):
+    """Split `amount` cents in proportion to {key: weight}, exactly (largest remainder)."""
+    total = sum(weights.values())
+    if not total or not amount:
+        return {}
+    parts = {k: amount * w // total for k, w in weights.items()}
+    rest = amount - sum(parts.values())
+    for k in sorted(weights, key=lambda k: (amount * weights[k]) % total, reverse=True)[:rest]:
+        parts[k] += 1
+    return parts
+
+
+def tax_label(rate_bp):
+    return f"Tax {rate_bp / 100:g}%"
+
+
+def _combo_errors(combo, known=None):
+    if not isinstance(combo, dict) or not combo.get("name"):
+        return ["needs a name"]
+    items = combo.get("items")
+    if not isinstance(items, dict) or not items:
+        return ["items must map item IDs to quantities"]
+    errors = []
+    unknown = [i for i in items if known is not None and i not in known]
+    if unknown:
+        errors.append(f"unknown items {', '.join(unknown)}")
+    if any(not isinstance(q, int) or q < 1 for q in items.values()):
+        errors.append("quantities must be whole numbers of at least 1")
+    if not isinstance(combo.get("price"), (int, float)) or combo["price"] < 0:
+        errors.append("price must be a non-negative number")
+    return errors
+
+
+def validate_combos(combos, menu_data):
+    """Error messages for combo definitions, empty when they are usable."""
+    if not isinstance(combos, list):
+        return ["Combos must be a list"]
+    known = {itm["id"] for items in menu_data.values() for itm in items}
+    return [f"{(c.get('name') if isinstance(c, dict) else None) or f'Combo {n}'}: {e}"
+            for n, c in enumerate(combos, 1) for e in _combo_errors(c, known)]
+
+
+class PriceBook:
+    """Tax, service charge and combo rules compiled from settings."""
+
+    def __init__(self, settings, version=None):
+        self.version = version
+        self.default_bp = _bp(settings.get("tax_rate", DEFAULT_TAX_RATE))
+        self.service_bp = _bp(settings.get("service_charge", DEFAULT_SERVICE_CHARGE))
+        self._rates = {key: _bp(rate) for key, rate in (settings.get("category_tax_rates") or {}).items()}
+        self._line_bp = {}
+        self.combos = []
+        self.combos_by_item = {}
+        for combo in settings.get("combos") or []:
+            if _combo_errors(combo):
+                continue   # rejected by the Settings page; ignore hand edits that do not parse
+            self.combos.append((combo["name"], dict(combo["items"]), to_cents(combo["price"])))
+            for item_id in combo["items"]:
+                self.combos_by_item.setdefault(item_id, []).append(len(self.combos) - 1)
+
+    def tax_bp(self, line):
+        """Tax rate in basis points for a cart line (memoised per section/category)."""
+        key = (line.get("section"), line.get("category"))
+        bp = self._line_bp.get(key)
+        if bp is None:
+            bp = self._rates.get(key[1], self._rates.get(key[0], self.default_bp))
+            self._line_bp[key] = bp
+        return bp
+
+    def rate_for(self, section=None, category=None):
+        return self.tax_bp({"section": section, "category": category}) / 10000
+
+    def cart(self, lines=()):
+        quote = CartQuote(self)
+        for line in lines:
+            quote.add(line)
+        return quote
+
+
+# --- Cart quotes ---
+
+class CartQuote:
+    """Running totals for one cart.
+
+    Adding or removing a line updates per-rate sums in O(1); combos are
+    re-matched only when the line's item is part of one. quote() is
+    memoised until the cart or the discount changes.
+    """
+
+    def __init__(self, book):
+        self.book = book
+        self.lines = 0
+        self.revision = 0
+        self._units = {}       # item_id -> quantity in the cart
+        self._unit_cents = {}  # item_id -> latest unit price
+        self._item_bp = {}     # item_id -> tax rate
+        self._gross = {}       # rate -> cents before combos and discount
+        self._combo_saving = {}
+        self._combos = []
+        self._cached = None
+
+    def _change(self, line, sign):
+        book = self.book
+        item_id = line["id"]
+        bp = book.tax_bp(line)
+        self._gross[bp] = self._gross.get(bp, 0) + sign * to_cents(line["subtotal"])
+        self._units[item_id] = self._units.get(item_id, 0) + sign * line["quantity"]
+        if self._units[item_id] <= 0:
+            del self._units[item_id]
+        if sign > 0:
+            self._unit_cents[item_id] = to_cents(line["price"])
+            self._item_bp[item_id] = bp
+        self.lines += sign
+        self.revision += 1
+        if item_id in book.combos_by_item:
+            self._match_combos()
+
+    def add(self, line):
+        self._change(line, 1)
+
+    def remove(self, line):
+        self._change(line, -1)
+
+    def _match_combos(self):
+        left = dict(self._units)
+        saving_by_rate, applied = {}, []
+        for name, items, price in self.book.combos:
+            count = min(left.get(i, 0) // q for i, q in items.items())
+            if count <= 0:
+                continue
+            value = {i: self._unit_cents[i] * q for i, q in items.items()}
+            saving = sum(value.values()) - price
+            if saving <= 0:
+                continue
+            for i, q in items.items():
+                left[i] -= q * count
+            # Spread the saving over the combo's items so each is taxed at its own rate.
+            for i, part in _allocate(saving * count, value).items():
+                bp = self._item_bp[i]
+                saving_by_rate[bp] = saving_by_rate.get(bp, 0) + part
+            applied.append({"name": name, "count": count, "saving": saving * count / 100})
+        self._combo_saving, self._combos = saving_by_rate, applied
+
+    def quote(self, discount=0.0):
+        """Totals for the cart with a flat `discount`, in the order record's shape."""
+        discount_cents = to_cents(discount)
+        if self._cached and self._cached[0] == (self.revision, discount_cents):
+            return self._cached[1]
+        net = {bp: cents - self._combo_saving.get(bp, 0) for bp, cents in self._gross.items()}
+        net = {bp: cents for bp, cents in net.items() if cents > 0}
+        discount_cents = min(discount_cents, sum(net.values()))
+        for bp, part in _allocate(discount_cents, net).items():
+            net[bp] -= part
+        tax_lines = [{"label": tax_label(bp), "rate": bp / 10000, "amount": _share(cents, bp) / 100}
+                     for bp, cents in sorted(net.items()) if bp]
+        subtotal = sum(self._gross.values())
+        combo_savings = sum(self._combo_saving.values())
+        taxable = sum(net.values())
+        tax = sum(_share(cents, bp) for bp, cents in net.items())
+        service = _share(taxable, self.book.service_bp)
+        quote = {
+            "subtotal": subtotal / 100,
+            "combo_savings": combo_savings / 100,
+            "combos": list(self._combos),
+            "discount": discount_cents / 100,
+            "tax": tax / 100,
+            "tax_lines": tax_lines,
+            "service_charge": service / 100,
+            "service_rate": self.book.service_bp / 10000,
+            "total": (taxable + tax + service) / 100
+        }
+        self._cached = ((self.revision, discount_cents), quote)
+        return quote
+
+
+def parse_combos(text):
+    """Combos from the Settings text area (a JSON list); raises ValueError."""
+    text = (text or "").strip()
+    if not text:
+        return []
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Combos are not valid JSON: {e}")
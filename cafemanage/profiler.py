@@ -0,0 +1,150 @@
+# profiler.py
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILE_DIR = "profiles"
+SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+
+_lock = threading.Lock()
+_capture_lock = threading.Lock()
+_armed = {}  # page name -> remaining reruns to profile
+
+
+# --- Arming ---
+
+def arm(page, runs):
+    with _lock:
+        _armed[page] = int(runs)
+
+def disarm(page=None):
+    with _lock:
+        if page is None:
+            _armed.clear()
+        else:
+            _armed.pop(page, None)
+
+def armed_pages():
+    with _lock:
+        return dict(_armed)
+
+def is_armed(page):
+    # A plain dict lookup: this is all a rerun pays when profiling is off.
+    return page in _armed
+
+def _take_run(page):
+    with _lock:
+        remaining = _armed.get(page, 0)
+        if remaining <= 0:
+            return False
+        if remaining == 1:
+            del _armed[page]
+        else:
+            _armed[page] = remaining - 1
+        return True
+
+
+# --- Stack sampler ---
+
+class StackSampler:
+    """Samples one thread's stack from a background thread.
+
+    Produces collapsed stacks ("outer;inner count" lines) suitable for
+    flamegraph.pl or speedscope.
+    """
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+
+# --- Capture ---
+
+def _capture_name(page):
+    slug = "".join(ch if ch.isalnum() else "_" for ch in page.lower())
+    return f"{time.strftime('%Y%m%d-%H%M%S')}_{int(time.time() * 1000) % 1000:03d}_{slug}"
+
+@contextmanager
+def capture(page):
+    """Profile the enclosed rerun if `page` is armed and no other capture is running."""
+    if not _capture_lock.acquire(blocking=False):
+        yield None
+        return
+    try:
+        if not _take_run(page):
+            yield None
+            return
+        profile = cProfile.Profile()
+        sampler = StackSampler(threading.get_ident())
+        sampler.start()
+        profile.enable()
+        try:
+            yield profile
+        finally:
+            profile.disable()
+            sampler.stop()
+            _save(page, profile, sampler)
+    finally:
+        _capture_lock.release()
+
+def _save(page, profile, sampler):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, _capture_name(page))
+    profile.dump_stats(base + ".pstats")
+    with open(base + ".collapsed", 'w') as f:
+        f.write(sampler.collapsed())
+
+
+# --- Reading captures ---
+
+def list_captures():
+    """Return capture base names (newest first)."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    names = {os.path.splitext(f)[0] for f in os.listdir(PROFILE_DIR) if f.endswith(".pstats")}
+    return sorted(names, reverse=True)
+
+def capture_paths(name):
+    base = os.path.join(PROFILE_DIR, name)
+    return base + ".pstats", base + ".collapsed"
+
+def top_functions(pstats_path, limit=20, sort="cumulative"):
+    """Return the top functions of a capture as a list of dicts."""
+    stats = pstats.Stats(pstats_path)
+    key = 3 if sort == "cumulative" else 2  # (cc, nc, tt, ct, callers)
+    rows = sorted(stats.stats.items(), key=lambda kv: kv[1][key], reverse=True)[:limit]
+    return [{
+        "Function": f"{os.path.basename(filename)}:{line}({func})",
+        "Calls": nc,
+        "Self (ms)": round(tt * 1000, 3),
+        "Cumulative (ms)": round(ct * 1000, 3)
+    } for (filename, line, func), (cc, nc, tt, ct, callers) in rows]
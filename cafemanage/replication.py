@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+"""
+Offline-first replication of orders and menu changes to Supabase.
+
+Local writes are queued durably in replication_queue.db and pushed in batched
+upserts by a background worker, with exponential backoff while the head office
+is unreachable. Menu updates are pulled incrementally using an updated_at
+watermark. The till never waits on the network: enqueueing is a local SQLite
+write. A batch the server rejects as invalid (a 4xx other than auth, a
+missing table or throttling) is moved to a dead-letter table so it cannot
+block the rest of the outbox.
+
+The app replicates only when CAFE_REPLICATION=1 is set as well as
+SUPABASE_URL, so a checkout whose .env points at a project does not write to
+it by accident.
+
+Usage:
+    python replication.py status
+    python replication.py push
+    python replication.py bench --rows 20000
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import metrics
+from storage import file_lock, load_json, save_json
+
+QUEUE_DB = "replication_queue.db"
+BATCH_SIZE = 500
+PULL_INTERVAL = 30.0     # seconds between menu pulls
+IDLE_INTERVAL = 2.0      # seconds between pushes when the queue is empty
+MAX_BACKOFF = 60.0
+REQUEST_TIMEOUT = 10.0
+
+# Remote table name -> primary key column
+REMOTE_KEYS = {"orders": "id", "menu_items": "id"}
+# Client errors that a retry may fix (credentials, a table not created yet,
+# throttling); any other 4xx dead-letters the batch.
+RETRY_STATUSES = {401, 403, 404, 408, 429}
+ENABLE_ENV = "CAFE_REPLICATION"
+
+
+def _load_env():
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    return os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY")
+
+
+# --- Durable queue ---
+
+def _connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS outbox (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        row_key TEXT NOT NULL,
+        op TEXT NOT NULL,              -- upsert, delete
+        payload TEXT,
+        enqueued_at REAL NOT NULL,
+        UNIQUE(table_name, row_key)
+    )""")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS dead_letter (
+        seq INTEGER PRIMARY KEY,
+        table_name TEXT NOT NULL,
+        row_key TEXT NOT NULL,
+        op TEXT NOT NULL,
+        payload TEXT,
+        enqueued_at REAL NOT NULL,
+        error TEXT,
+        failed_at REAL NOT NULL
+    )""")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )""")
+    return conn
+
+
+class ReplicationQueue:
+    """Outbox of pending changes; a newer change to the same row replaces the older one."""
+
+    def __init__(self, db_path=QUEUE_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.conn = _connect(db_path)
+
+    def enqueue(self, table_name, rows, op="upsert"):
+        key = REMOTE_KEYS[table_name]
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO outbox (table_name, row_key, op, payload, enqueued_at) VALUES (?,?,?,?,?)",
+                [(table_name, str(row[key]), op, json.dumps(row), now) for row in rows])
+
+    def peek(self, limit=BATCH_SIZE):
+        """Oldest pending changes for the table at the head of the queue."""
+        with self._lock:
+            head = self.conn.execute("SELECT table_name, op FROM outbox ORDER BY seq LIMIT 1").fetchone()
+            if head is None:
+                return None, None, []
+            rows = self.conn.execute(
+                "SELECT seq, row_key, payload, enqueued_at FROM outbox WHERE table_name = ? AND op = ? ORDER BY seq LIMIT ?",
+                (head[0], head[1], limit)).fetchall()
+        return head[0], head[1], rows
+
+    def ack(self, seqs):
+        with self._lock, self.conn:
+            self.conn.executemany("DELETE FROM outbox WHERE seq = ?", [(s,) for s in seqs])
+
+    def dead_letter(self, seqs, error):
+        """Move rejected changes out of the outbox, keeping them for inspection."""
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO dead_letter (seq, table_name, row_key, op, payload, enqueued_at, error, failed_at) "
+                "SELECT seq, table_name, row_key, op, payload, enqueued_at, ?, ? FROM outbox WHERE seq = ?",
+                [(error, now, s) for s in seqs])
+            self.conn.executemany("DELETE FROM outbox WHERE seq = ?", [(s,) for s in seqs])
+
+    def dead_letters(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM dead_letter").fetchone()[0]
+
+    def pending_keys(self, table_name):
+        with self._lock:
+            return {r[0] for r in self.conn.execute("SELECT row_key FROM outbox WHERE table_name = ?", (table_name,))}
+
+    def depth(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def lag(self):
+        """Age in seconds of the oldest unpushed change (0 when drained)."""
+        with self._lock:
+            oldest = self.conn.execute("SELECT MIN(enqueued_at) FROM outbox").fetchone()[0]
+        return time.time() - oldest if oldest else 0.0
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?,?)", (key, value))
+
+
+# --- Row mapping ---
+
+def order_row(order):
+    return dict(order)
+
+def menu_rows(menu_data):
+    rows = []
+    for item_type, items in menu_data.items():
+        for itm in items:
+            row = {k: v for k, v in itm.items() if k != "_type"}
+            row["item_type"] = item_type
+            row["deleted"] = False   # an id re-added after a delete comes back
+            rows.append(row)
+    return rows
+
+
+# --- PostgREST transport ---
+
+class PostgrestClient:
+    """Minimal PostgREST client using the Supabase /rest/v1 layout."""
+
+    def __init__(self, url, key=None, timeout=REQUEST_TIMEOUT):
+        self.base = url.rstrip("/") + "/rest/v1/"
+        self.headers = {"Content-Type": "application/json"}
+        if key:
+            self.headers.update({"apikey": key, "Authorization": f"Bearer {key}"})
+        self.timeout = timeout
+
+    def _request(self, method, path, body=None, headers=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        req = urllib.request.Request(self.base + path, data=data, method=method,
+                                     headers={**self.headers, **(headers or {})})
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            payload = resp.read()
+        return json.loads(payload) if payload else None
+
+    def upsert(self, table, rows, on_conflict):
+        self._request("POST", f"{table}?on_conflict={on_conflict}", rows,
+                      {"Prefer": "resolution=merge-duplicates,return=minimal"})
+
+    def delete(self, table, column, keys):
+        values = ",".join(urllib.parse.quote(f'"{k}"') for k in keys)
+        self._request("DELETE", f"{table}?{column}=in.({values})")
+
+    def select_since(self, table, column, watermark, limit):
+        query = f"{table}?order={column}.asc&limit={limit}"
+        if watermark:
+            query += f"&{column}=gt.{urllib.parse.quote(watermark)}"
+        return self._request("GET", query) or []
+
+
+# --- Worker ---
+
+class ReplicationWorker:
+    def __init__(self, client, queue, menu_file="menu_data.json",
+                 batch_size=BATCH_SIZE, pull_interval=PULL_INTERVAL):
+        self.client = client
+        self.queue = queue
+        self.menu_file = menu_file
+        self.batch_size = batch_size
+        self.pull_interval = pull_interval
+        self.backoff = 0.0
+        self.last_error = None
+        self.last_pull = 0.0
+        self.pushed = 0
+        self.pulled = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def push_once(self):
+        """Push one batch. Returns the number of rows taken off the queue
+        (pushed or dead-lettered; 0 when drained)."""
+        table_name, op, rows = self.queue.peek(self.batch_size)
+        if not rows:
+            return 0
+        key = REMOTE_KEYS[table_name]
+        if op == "delete":
+            groups = [rows]
+        else:
+            # PostgREST needs every object in a bulk upsert to have the same keys
+            # (a soft delete carries only id and deleted).
+            by_keys = {}
+            for r in rows:
+                by_keys.setdefault(frozenset(json.loads(r[2])), []).append(r)
+            groups = list(by_keys.values())
+        for group in groups:
+            try:
+                with metrics.timer("replication_push"):
+                    if op == "delete":
+                        self.client.delete(table_name, key, [r[1] for r in group])
+                    else:
+                        self.client.upsert(table_name, [json.loads(r[2]) for r in group], key)
+            except urllib.error.HTTPError as e:
+                if not 400 <= e.code < 500 or e.code in RETRY_STATUSES:
+                    raise
+                self.queue.dead_letter([r[0] for r in group], f"HTTP {e.code}: {e.reason}")
+                metrics.incr("replication_dead_letters", len(group))
+                continue
+            self.queue.ack([r[0] for r in group])
+            self.pushed += len(group)
+            metrics.incr("replication_rows_pushed", len(group))
+        return len(rows)
+
+    def pull_menu(self):
+        """Apply remote menu_items changed since the stored watermark to the local menu."""
+        watermark = self.queue.get_meta("menu_items_watermark", "")
+        changed = 0
+        while True:
+            remote = self.client.select_since("menu_items", "updated_at", watermark, self.batch_size)
+            if not remote:
+                break
+            # Under the menu lock, so a till edit made meanwhile is not overwritten.
+            with file_lock(self.menu_file):
+                menu_data = load_json(self.menu_file)
+                if menu_data is None:
+                    # Nothing to merge into: keep the watermark and pull again later.
+                    metrics.incr("replication_pull_skipped")
+                    break
+                self._apply_menu_rows(menu_data, remote)
+                save_json(self.menu_file, menu_data)
+            watermark = remote[-1]["updated_at"]
+            self.queue.set_meta("menu_items_watermark", watermark)
+            changed += len(remote)
+            if len(remote) < self.batch_size:
+                break
+        self.pulled += changed
+        return changed
+
+    def _apply_menu_rows(self, menu_data, remote):
+        # Local changes still waiting to be pushed win over the remote copy.
+        pending = self.queue.pending_keys("menu_items")
+        by_id = {itm["id"]: (t, i) for t, items in menu_data.items() for i, itm in enumerate(items)}
+        for row in remote:
+            if row["id"] in pending:
+                continue
+            item_type = row.get("item_type") or ("beverages" if row["id"].startswith("BEV") else "food")
+            item = {k: v for k, v in row.items() if k not in ("item_type", "updated_at", "deleted")}
+            if row.get("deleted"):
+                if row["id"] in by_id:
+                    t, i = by_id.pop(row["id"])
+                    menu_data[t][i] = None
+            elif row["id"] in by_id:
+                t, i = by_id[row["id"]]
+                menu_data[t][i].update(item)
+            else:
+                menu_data.setdefault(item_type, []).append(item)
+                by_id[row["id"]] = (item_type, len(menu_data[item_type]) - 1)
+        for t in menu_data:
+            menu_data[t] = [itm for itm in menu_data[t] if itm is not None]
+
+    def run_once(self):
+        """One worker tick: push a batch and pull the menu when due. Returns rows pushed."""
+        pushed = self.push_once()
+        if time.time() - self.last_pull >= self.pull_interval:
+            self.pull_menu()
+            self.last_pull = time.time()
+        return pushed
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                pushed = self.run_once()
+                self.backoff = 0.0
+                self.last_error = None
+                if not pushed:
+                    self._stop.wait(IDLE_INTERVAL)
+            except (urllib.error.URLError, OSError, ValueError, sqlite3.Error) as e:
+                # Offline, server error or a busy outbox: keep the queue and retry later.
+                self.last_error = str(e)
+                metrics.incr("replication_errors")
+                self.backoff = min(MAX_BACKOFF, max(1.0, self.backoff * 2))
+                self._stop.wait(self.backoff * random.uniform(0.5, 1.0))
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="replication", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def status(self):
+        return {
+            "queued": self.queue.depth(),
+            "lag_seconds": round(self.queue.lag(), 1),
+            "pushed": self.pushed,
+            "pulled": self.pulled,
+            "dead_letters": self.queue.dead_letters(),
+            "backoff_seconds": self.backoff,
+            "last_error": self.last_error
+        }
+
+
+# --- App integration ---
+
+_queue = None
+_worker = None
+_init_lock = threading.Lock()
+
+def get_queue():
+    global _queue
+    with _init_lock:
+        if _queue is None:
+            _queue = ReplicationQueue()
+        return _queue
+
+def start_worker(menu_file="menu_data.json"):
+    """Start the background worker once per process when replication is
+    switched on (CAFE_REPLICATION=1) and SUPABASE_URL is configured."""
+    global _worker
+    url, key = _load_env()
+    if not url or os.getenv(ENABLE_ENV) != "1":
+        return None
+    queue = get_queue()
+    with _init_lock:
+        if _worker is None:
+            _worker = ReplicationWorker(PostgrestClient(url, key), queue, menu_file)
+            _worker.start()
+    return _worker
+
+def _enabled():
+    return _worker is not None
+
+def worker_status():
+    return _worker.status() if _worker else None
+
+def record_order(order):
+    """Queue an order for replication; never raises into the till."""
+    if not _enabled():
+        return
+    try:
+        get_queue().enqueue("orders", [order_row(order)])
+    except sqlite3.Error:
+        metrics.incr("replication_enqueue_errors")
+
+def record_orders(orders):
+    if not _enabled():
+        return
+    try:
+        get_queue().enqueue("orders", [order_row(o) for o in orders])
+    except sqlite3.Error:
+        metrics.incr("replication_enqueue_errors")
+
+def record_menu(menu_data, deleted_ids=()):
+    """Queue changed menu items ({item_type: [items]}) and deletions.
+
+    Deletions are pushed as soft deletes (deleted = true) so other tills see
+    them in their incremental pull.
+    """
+    if not _enabled():
+        return
+    try:
+        queue = get_queue()
+        queue.enqueue("menu_items", menu_rows(menu_data))
+        if deleted_ids:
+            queue.enqueue("menu_items", [{"id": i, "deleted": True} for i in deleted_ids])
+    except sqlite3.Error:
+        metrics.incr("replication_enqueue_errors")
+
+
+# --- CLI ---
+
+def _bench(args):
+    """Replicate synthetic orders into a local PostgREST stand-in and report throughput and lag."""
+    import tempfile
+    import postgrest_standin
+    import synthetic_data
+
+    server = postgrest_standin.serve(port=0, fail_rate=args.fail_rate)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = ReplicationQueue(os.path.join(tmp, QUEUE_DB))
+        menu = synthetic_data.generate_menu()
+        orders = synthetic_data.generate_orders(args.rows, menu)
+
+        start = time.perf_counter()
+        for i in range(0, len(orders), 1000):
+            queue.enqueue("orders", [order_row(o) for o in orders[i:i + 1000]])
+        enqueue_s = time.perf_counter() - start
+
+        worker = ReplicationWorker(PostgrestClient(url), queue, os.path.join(tmp, "menu_data.json"),
+                                   batch_size=args.batch_size, pull_interval=float("inf"))
+        max_lag = 0.0
+        start = time.perf_counter()
+        while queue.depth():
+            max_lag = max(max_lag, queue.lag())
+            try:
+                worker.push_once()
+            except urllib.error.URLError:
+                metrics.incr("replication_errors")
+        push_s = time.perf_counter() - start
+        server.shutdown()
+        remote = len(server.tables.get("orders", {}))
+
+    print(f"Enqueued {len(orders)} orders in {enqueue_s:.2f}s ({len(orders) / enqueue_s:,.0f} rows/s)")
+    print(f"Pushed   {worker.pushed} rows in {push_s:.2f}s ({worker.pushed / push_s:,.0f} rows/s, batch {args.batch_size})")
+    print(f"Max lag  {max_lag:.2f}s, remote rows {remote}, errors {metrics.snapshot()['counters'].get('replication_errors', 0)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Supabase replication tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="show queue depth and lag")
+    sub.add_parser("push", help="push the queue once, then pull menu changes")
+    bench = sub.add_parser("bench", help="measure throughput against a local stand-in")
+    bench.add_argument("--rows", type=int, default=20000)
+    bench.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    bench.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        _bench(args)
+        return
+
+    queue = ReplicationQueue()
+    if args.command == "status":
+        print(json.dumps({"queued": queue.depth(), "lag_seconds": round(queue.lag(), 1),
+                          "dead_letters": queue.dead_letters(),
+                          "menu_watermark": queue.get_meta("menu_items_watermark")}, indent=2))
+        return
+
+    url, key = _load_env()
+    if not url:
+        sys.exit("SUPABASE_URL is not set")
+    worker = ReplicationWorker(PostgrestClient(url, key), queue)
+    while worker.push_once():
+        pass
+    worker.pull_menu()
+    print(json.dumps(worker.status(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# shared_cache.py
+import glob
+import hashlib
+import mmap
+import os
+import threading
+import time
+
+import invalidation
+import metrics
+from storage import file_version, load_json
+
+# --- Shared read-mostly cache ---
+# Rendered QR images are published as entry files in SHARED_CACHE_DIR and
+# read back through mmap, so only the first worker to see a new URL pays for
+# rendering it. The menu catalogue and settings are not: every worker has to
+# decode its own copy anyway, and decoding the data file costs the same as
+# decoding an entry. Each worker keeps the decoded document keyed by
+# data_version(), so a rerun that finds nothing changed costs one stat().
+# Returned documents are shared between sessions: treat them as read-only and
+# load_json() the file for a read-modify-write.
+#
+# Entry layout: MAGIC, 4-byte header length, header (repr of the key and the
+# build time), payload. Every settings change renders new QR images, so only
+# the newest MAX_BLOBS entries per blob name are kept on disk.
+
+SHARED_CACHE_DIR = os.getenv("CAFE_SHARED_CACHE_DIR", ".shared_cache")
+MAGIC = b"CAFESHM1"
+MAX_BLOBS = 32
+
+
+def data_version(path):
+    """Cache key for a data file: (mtime, size) plus its invalidation generation."""
+    return file_version(path), invalidation.generation(path)
+
+
+class SharedCache:
+    def __init__(self, cache_dir=SHARED_CACHE_DIR):
+        self.dir = cache_dir
+        self._lock = threading.Lock()
+        self._docs = {}
+        self._blobs = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_path(self, name):
+        return os.path.join(self.dir, name)
+
+    def _read_entry(self, name, key):
+        """Payload of a published entry built for `key`."""
+        try:
+            f = open(self._entry_path(name), 'rb')
+        except FileNotFoundError:
+            return None
+        with f:
+            if os.fstat(f.fileno()).st_size < len(MAGIC) + 4:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                if m[:len(MAGIC)] != MAGIC:
+                    return None
+                start = len(MAGIC) + 4
+                header_len = int.from_bytes(m[len(MAGIC):start], "big")
+                entry_key, _ = m[start:start + header_len].decode("utf-8").rsplit(" ", 1)
+                if entry_key != repr(key):
+                    return None
+                return m[start + header_len:]
+
+    def _publish(self, name, key, built, payload):
+        # No fsync: entries are rebuilt from the data files if lost.
+        header = f"{key!r} {built:.6f}".encode("utf-8")
+        path = self._entry_path(name)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(MAGIC + len(header).to_bytes(4, "big") + header + payload)
+        os.replace(tmp, path)
+
+    def document(self, path):
+        """Decoded contents of a read-mostly data file (menu, settings), or None."""
+        version = data_version(path)
+        if version[0] is None:
+            return None
+        hit = self._docs.get(path)
+        if hit is not None and hit[0] == version:
+            return hit[1]
+        data = load_json(path)
+        metrics.incr("shared_cache_loads")
+        self._docs[path] = (version, data)
+        return data
+
+    def blob(self, name, key, build):
+        """Bytes from build() for `key` (a rendered QR image), built once across workers."""
+        hit = self._blobs.get((name, key))
+        if hit is not None:
+            return hit
+        entry = f"{name}-{hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:16]}.bin"
+        payload = self._read_entry(entry, key)
+        if payload is None:
+            payload = build()
+            self._publish(entry, key, time.time(), payload)
+            self._evict(name)
+            metrics.incr("shared_cache_builds")
+        with self._lock:
+            if len(self._blobs) >= MAX_BLOBS:
+                self._blobs.pop(next(iter(self._blobs)))
+            self._blobs[(name, key)] = payload
+        return payload
+
+    def _evict(self, name):
+        """Remove all but the newest MAX_BLOBS entry files for a blob name."""
+        entries = []
+        for path in glob.glob(os.path.join(glob.escape(self.dir), glob.escape(name) + "-*.bin")):
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                pass   # evicted by another worker
+        for _, path in sorted(entries)[:-MAX_BLOBS]:
+            try:
+                os.remove(path)   # a worker reading it has already copied the payload out
+                metrics.incr("shared_cache_evictions")
+            except OSError:
+                pass
@@ -7,4 +7,11 @@ load_dotenv() # Loads SUPABASE_URL and SUPABASE_KEY from .env
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+_client = None
+
+def get_client() -> Client:
+    """Create the Supabase client on first use so importing this module works offline."""
+    global _client
+    if _client is None:
+        _client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return _client
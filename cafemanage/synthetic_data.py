@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generator for the Cafe Management System.
+Produces menus, tables, users and order histories in the same shape as the
+app's JSON data files, so benchmarks can run against realistic volumes.
+
+Usage:
+    python synthetic_data.py --out bench_data --orders 100000
+"""
+
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+BEVERAGE_CATEGORIES = ["Coffee", "Tea", "Juice", "Smoothie", "Soft Drink"]
+FOOD_CATEGORIES = ["Pastry", "Sandwich", "Salad", "Pizza", "Pasta", "Burger"]
+ADJECTIVES = ["Classic", "Iced", "Spiced", "Double", "House", "Vanilla", "Smoked",
+              "Fresh", "Honey", "Masala", "Caramel", "Garden", "Royal", "Mini"]
+CUSTOMER_NAMES = ["Aarav", "Priya", "Rohan", "Ananya", "Kabir", "Meera", "Arjun",
+                  "Isha", "Vikram", "Sara", "Dev", "Nisha", "Rahul", "Zoya", "manal"]
+STATUS_WEIGHTS = {"Completed": 70, "Pending": 8, "Preparing": 6, "Ready": 6, "Cancelled": 10}
+PAYMENT_WEIGHTS = {"Paid": 80, "Unpaid": 15, "Partial": 5}
+
+
+def generate_menu(n_items=40, seed=0):
+    """Menu dict keyed by 'beverages' and 'food', like menu_data.json."""
+    rng = random.Random(seed)
+    menu = {"beverages": [], "food": []}
+    for i in range(n_items):
+        item_type = "beverages" if i % 2 == 0 else "food"
+        prefix = "BEV" if item_type == "beverages" else "FOOD"
+        categories = BEVERAGE_CATEGORIES if item_type == "beverages" else FOOD_CATEGORIES
+        category = rng.choice(categories)
+        number = len(menu[item_type]) + 1
+        menu[item_type].append({
+            "id": f"{prefix}{number:03d}",
+            "name": f"{rng.choice(ADJECTIVES)} {category} {number}",
+            "price": round(rng.uniform(1.5, 15.0), 2),
+            "category": category,
+            "available": rng.random() > 0.05,
+            "description": f"{category} made the {rng.choice(ADJECTIVES).lower()} way",
+            "inventory": rng.randint(0, 500)
+        })
+    return menu
+
+
+def generate_tables(n_tables=10):
+    return [{"table_number": str(i), "status": "Available"} for i in range(1, n_tables + 1)]
+
+
+def generate_users(n_staff=1):
+    users = [{"username": "admin", "password": "admin123", "role": "admin"}]
+    users += [{"username": f"staff{i}" if i else "staff", "password": "staff123", "role": "staff"}
+              for i in range(n_staff)]
+    return users
+
+
+def generate_settings():
+    return {
+        "cafe_name": "My Cafe",
+        "barcode_url": "https://mycafe.com/menu",
+        "tax_rate": 0.1,
+        "service_charge": 0.05
+    }
+
+
+def _weighted(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def iter_orders(n_orders, menu, n_tables=10, days=365, end=None, seed=0,
+                tax_rate=0.1, service_charge=0.05):
+    """Yield n_orders order records spread over the last `days` days."""
+    rng = random.Random(seed)
+    items = [itm for t_items in menu.values() for itm in t_items]
+    end = end or datetime.now().replace(microsecond=0)
+    start = end - timedelta(days=days)
+    step = (end - start) / max(n_orders, 1)
+    for n in range(n_orders):
+        ts = start + step * n + timedelta(seconds=rng.randint(0, 59))
+        lines = []
+        for item in rng.sample(items, k=min(len(items), rng.randint(1, 4))):
+            qty = rng.randint(1, 3)
+            lines.append({
+                "id": item["id"],
+                "name": item["name"],
+                "price": item["price"],
+                "quantity": qty,
+                "subtotal": round(item["price"] * qty, 2)
+            })
+        subtotal = sum(line["subtotal"] for line in lines)
+        discount = round(subtotal * 0.1, 2) if rng.random() < 0.1 else 0.0
+        tax = (subtotal - discount) * tax_rate
+        service = (subtotal - discount) * service_charge
+        yield {
+            "id": f"ORD{n + 1:05d}",
+            "customer_name": rng.choice(CUSTOMER_NAMES),
+            "table_number": str(rng.randint(1, n_tables)) if rng.random() < 0.8 else "",
+            "items": lines,
+            "subtotal": subtotal,
+            "discount": discount,
+            "tax": tax,
+            "service_charge": service,
+            "total": subtotal - discount + tax + service,
+            "date": str(ts.date()),
+            "time": ts.strftime("%H:%M:%S"),
+            "timestamp": ts.isoformat(),
+            "status": _weighted(rng, STATUS_WEIGHTS),
+            "payment_status": _weighted(rng, PAYMENT_WEIGHTS)
+        }
+
+
+def generate_orders(n_orders, menu, **kwargs):
+    return list(iter_orders(n_orders, menu, **kwargs))
+
+
+def write_dataset(out_dir, n_orders=10000, n_items=40, n_tables=10, days=365, seed=0):
+    """Write a complete set of data files into out_dir and return their paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    menu = generate_menu(n_items, seed=seed)
+    files = {
+        "menu_data.json": menu,
+        "tables_data.json": generate_tables(n_tables),
+        "users_data.json": generate_users(),
+        "settings.json": generate_settings(),
+        "orders_data.json": generate_orders(n_orders, menu, n_tables=n_tables, days=days, seed=seed)
+    }
+    paths = {}
+    for name, data in files.items():
+        paths[name] = os.path.join(out_dir, name)
+        with open(paths[name], 'w') as f:
+            json.dump(data, f, indent=2)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic cafe data files")
+    parser.add_argument("--out", default="bench_data", help="output directory")
+    parser.add_argument("--orders", type=int, default=10000)
+    parser.add_argument("--items", type=int, default=40)
+    parser.add_argument("--tables", type=int, default=10)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = write_dataset(args.out, args.orders, args.items, args.tables, args.days, args.seed)
+    for name, path in paths.items():
+        print(f"✅ {path} ({os.path.getsize(path) / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
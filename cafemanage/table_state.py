@@ -0,0 +1,132 @@
+# table_state.py
+import json
+import os
+import time
+
+from storage import file_lock, load_json, save_json
+
+STATUS_OPTIONS = ["Available", "Occupied", "Reserved"]
+DEFAULT_TABLE_COUNT = 10
+TABLE_EVENTS_FILE = "table_events.jsonl"
+TABLE_STATS_FILE = "table_stats.json"
+
+
+def default_tables(count=DEFAULT_TABLE_COUNT):
+    return [{"table_number": str(i), "status": "Available"} for i in range(1, count + 1)]
+
+
+# --- Occupancy statistics ---
+# Stats are folded from the event log one event at a time, so a status change
+# costs O(changed tables) instead of a rescan of the history.
+
+def empty_stats(now=None):
+    return {"since": now or time.time(), "tables": {}}
+
+def apply_event(stats, event):
+    """Fold one {"ts", "table", "from", "to"} event into stats."""
+    t = stats["tables"].setdefault(event["table"], {"occupied_since": None, "occupied_seconds": 0.0, "turns": 0})
+    if event["to"] == "Occupied" and t["occupied_since"] is None:
+        t["occupied_since"] = event["ts"]
+    elif event["from"] == "Occupied" and event["to"] != "Occupied" and t["occupied_since"] is not None:
+        t["occupied_seconds"] += event["ts"] - t["occupied_since"]
+        t["occupied_since"] = None
+        t["turns"] += 1
+    return stats
+
+def rebuild_stats(events_path=TABLE_EVENTS_FILE, now=None):
+    """Recompute stats from the full event log (used when the stats file is missing)."""
+    stats = None
+    if os.path.exists(events_path):
+        with open(events_path, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if stats is None:
+                    stats = empty_stats(event["ts"])
+                apply_event(stats, event)
+    return stats or empty_stats(now)
+
+def load_stats(stats_path=TABLE_STATS_FILE, events_path=TABLE_EVENTS_FILE, now=None):
+    return load_json(stats_path) or rebuild_stats(events_path, now)
+
+def summarize_stats(stats, table_count, now=None):
+    """Average turn time, per-table utilisation and venue utilisation since tracking began."""
+    now = now or time.time()
+    elapsed = max(now - stats["since"], 1e-9)
+    per_table = {}
+    total_seconds = 0.0
+    total_turns = 0
+    for table, t in stats["tables"].items():
+        seconds = t["occupied_seconds"]
+        if t["occupied_since"] is not None:
+            seconds += now - t["occupied_since"]
+        per_table[table] = {
+            "turns": t["turns"],
+            "avg_turn_minutes": t["occupied_seconds"] / t["turns"] / 60 if t["turns"] else 0.0,
+            "utilisation": seconds / elapsed
+        }
+        total_seconds += seconds
+        total_turns += t["turns"]
+    closed_seconds = sum(t["occupied_seconds"] for t in stats["tables"].values())
+    return {
+        "turns": total_turns,
+        "avg_turn_minutes": closed_seconds / total_turns / 60 if total_turns else 0.0,
+        "utilisation": total_seconds / (elapsed * max(table_count, 1)),
+        "per_table": per_table
+    }
+
+
+# --- Batched updates ---
+
+def apply_status_updates(updates, tables_path, events_path=TABLE_EVENTS_FILE,
+                         stats_path=TABLE_STATS_FILE, now=None):
+    """Apply {table_number: status} in one write of each file.
+
+    Returns the number of tables whose status changed.
+    """
+    now = now or time.time()
+    with file_lock(tables_path):
+        tables = load_json(tables_path) or []
+        events = []
+        for table in tables:
+            new_status = updates.get(table["table_number"])
+            if new_status and new_status != table["status"]:
+                if new_status not in STATUS_OPTIONS:
+                    raise ValueError(f"Unknown table status: {new_status}")
+                events.append({"ts": now, "table": table["table_number"], "from": table["status"], "to": new_status})
+                table["status"] = new_status
+        if not events:
+            return 0
+        _save_with_events(tables, events, tables_path, events_path, stats_path, now)
+    return len(events)
+
+def _save_with_events(tables, events, tables_path, events_path, stats_path, now):
+    """Write the tables, append `events` to the log and fold them into the stats."""
+    save_json(tables_path, tables)
+    if events:
+        stats = load_stats(stats_path, events_path, now)
+        with open(events_path, 'a') as f:
+            f.write("".join(json.dumps(e, separators=(",", ":")) + "\n" for e in events))
+        for e in events:
+            apply_event(stats, e)
+        save_json(stats_path, stats)
+
+def resize_tables(count, tables_path, events_path=TABLE_EVENTS_FILE, stats_path=TABLE_STATS_FILE, now=None):
+    """Grow or shrink the venue to `count` tables, keeping existing statuses.
+
+    Removed tables that were not Available get a closing "Removed" event, so
+    an open occupancy stops counting towards utilisation.
+    """
+    now = now or time.time()
+    with file_lock(tables_path):
+        tables = load_json(tables_path) or []
+        by_number = {t["table_number"]: t for t in tables}
+        resized = [by_number.get(str(i), {"table_number": str(i), "status": "Available"}) for i in range(1, count + 1)]
+        extra = [t for t in tables if not t["table_number"].isdigit()]
+        kept = {t["table_number"] for t in resized}
+        events = [{"ts": now, "table": t["table_number"], "from": t["status"], "to": "Removed"}
+                  for t in tables if t["table_number"].isdigit() and t["table_number"] not in kept
+                  and t["status"] != "Available"]
+        _save_with_events(resized + extra, events, tables_path, events_path, stats_path, now)
+    return len(resized) + len(extra)
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# The app modules are flat scripts in cafemanage/, imported by name.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Never replicate to a real head office from the test suite.
+os.environ["SUPABASE_URL"] = ""
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Run the test inside an empty data directory."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
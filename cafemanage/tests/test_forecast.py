@@ -0,0 +1,61 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+from forecast import build_watchlist, demand_matrix, forecast_demand, stockout_days
+
+END = date(2026, 10, 18)   # a Sunday; a 28-day history starts on Monday 2026-09-21
+
+
+def order(day, items, status="Completed"):
+    return {"date": str(day), "status": status,
+            "items": [{"id": item_id, "quantity": qty} for item_id, qty in items.items()]}
+
+
+def test_demand_matrix_buckets_by_item_and_day():
+    orders = [
+        order(END, {"A": 2, "B": 1}),
+        order(END, {"A": 3}),
+        order(END - timedelta(days=3), {"B": 4}),
+        order(END - timedelta(days=3), {"A": 9}, status="Cancelled"),
+        order(END - timedelta(days=7), {"C": 5}),        # just outside a 7-day window
+        order(END + timedelta(days=1), {"C": 5}),
+    ]
+    item_ids, matrix = demand_matrix(orders, END, days=7)
+    assert item_ids == ["A", "B"] and matrix.shape == (2, 7)
+    assert matrix[:, -1].tolist() == [5, 1]
+    assert matrix[:, -4].tolist() == [0, 4]
+    assert matrix.sum() == 10
+    assert demand_matrix([], END)[1].shape == (0, 56)
+
+
+def test_forecast_follows_level_and_weekday_profile():
+    weekdays = [(END - timedelta(days=27 - d)).weekday() for d in range(28)]
+    weekly = [4.0 if w == 5 else 0.0 if w == 6 else 1.0 for w in weekdays]   # Sat 4, Sun 0, else 1
+    shifted = [1.0] * 21 + [3.0] * 7                                          # demand tripled last week
+    forecast = forecast_demand(np.array([weekly, shifted]), END, horizon=14)
+    # Level 9/7 in both windows, scaled by 7/9 (weekdays), 28/9 (Sat) and 0 (Sun).
+    assert np.allclose(forecast[0], [1, 1, 1, 1, 1, 4, 0] * 2)
+    # Level (3 + 42/28) / 2, with every weekday averaging the same 1.5.
+    assert np.allclose(forecast[1], [2.25] * 14)
+    assert forecast_demand(np.zeros((0, 28)), END).shape == (0, 14)
+
+
+def test_stockout_days_interpolates_within_the_day():
+    forecast = np.array([[1, 1, 1, 1, 1, 4, 0]] * 4, dtype=float)
+    days = stockout_days(forecast, np.array([6.5, 2.0, 0.0, 100.0]))
+    assert days[:3].tolist() == [5.375, 2.0, 0.0]
+    assert np.isinf(days[3])
+
+
+def test_watchlist_includes_unsold_items_once_out_of_stock():
+    menu = {"beverages": [{"id": "A", "name": "Latte", "inventory": 6},
+                          {"id": "B", "name": "Mocha", "inventory": 0},
+                          {"id": "C", "name": "Chai", "inventory": 5},
+                          {"id": "D", "name": "Water"}]}
+    orders = [order(END - timedelta(days=d), {"A": 2, "D": 1}) for d in range(28)]
+    watch = build_watchlist(menu, orders, today=END + timedelta(days=1))
+    assert [(e["id"], e["days_left"]) for e in watch.top()] == [("B", 0.0), ("A", 3.0)]
+    assert watch.top()[0]["daily_demand"] == 0.0
+    watch.update_inventory({"B": 10, "C": 0})
+    assert [e["id"] for e in watch.top()] == ["C", "A"]
@@ -0,0 +1,58 @@
+import os
+import socket
+import time
+
+import pytest
+
+import invalidation
+
+
+@pytest.fixture
+def bus(tmp_path):
+    b = invalidation.InvalidationBus(str(tmp_path / "bus"))
+    yield b
+    b.close()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def send(bus, data):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as s:
+        s.sendto(data, bus.path)
+
+
+def test_publish_reaches_peers(bus, tmp_path):
+    topic = str(tmp_path / "menu_data.json")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as peer:
+        peer.bind(os.path.join(bus.bus_dir, "peer.sock"))
+        peer.settimeout(5)
+        bus.publish(topic)
+        sent, _, received = peer.recv(invalidation.MAX_MESSAGE).decode("utf-8").partition(" ")
+    assert received == topic and float(sent) <= time.time()
+    assert invalidation.generation(topic) == 1
+
+
+def test_listener_survives_malformed_messages(bus, tmp_path):
+    topic = str(tmp_path / "settings.json")
+    for junk in [b"\xff\xfe\xfd", b"not-a-timestamp " + topic.encode(), b"", b"12.5"]:
+        send(bus, junk)
+    send(bus, f"{time.time():.6f} {topic}".encode("utf-8"))
+    assert wait_for(lambda: invalidation.generation(topic) == 1)
+    assert bus._thread.is_alive()
+    assert invalidation.invalidated_at(topic) > 0
+
+
+def test_publish_removes_dead_peer_sockets(bus):
+    dead = os.path.join(bus.bus_dir, "dead.sock")
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    s.bind(dead)
+    s.close()   # the socket file stays behind, as after a crash
+    bus.publish("/nowhere/menu_data.json")
+    assert not os.path.exists(dead)
@@ -0,0 +1,24 @@
+import pandas as pd
+
+from menu_import import validate
+
+MENU = {"beverages": [{"id": "BEV001", "name": "Espresso", "price": 2.5, "category": "Coffee"}], "food": []}
+
+
+def upload(*rows):
+    return pd.DataFrame([{"id": "", "item_type": "beverages", "name": "", "price": "3", "category": "Coffee",
+                          "description": "", "inventory": "5", "available": "true", **r} for r in rows])
+
+
+def test_new_id_with_an_existing_name_is_rejected():
+    rows, errors = validate(upload({"id": "BEV999", "name": "espresso"}), MENU)
+    assert rows.empty
+    assert errors.to_dict("records") == [{"row": 2, "field": "name",
+                                          "message": "Name already used by another menu item"}]
+
+
+def test_rows_matching_an_existing_item_update_it():
+    for renamed in ({"id": "BEV001", "name": "Espresso"}, {"name": "Espresso "}):
+        rows, errors = validate(upload(renamed, {"name": "Mocha"}), MENU)
+        assert errors.empty
+        assert list(zip(rows["id"], rows["action"])) == [("BEV001", "update"), ("", "insert")]
@@ -0,0 +1,104 @@
+import sqlite3
+
+import pytest
+
+import storage
+from database import init_db
+from migrate import _init_state, iter_orders, load_state, migrate_orders, refresh_orders, verify
+from order_store import OrderStore
+
+
+def order(n):
+    return {"id": f"ORD{n:05d}", "customer_name": "Priya", "total": 5.0, "status": "Pending",
+            "items": [{"id": "BEV001", "quantity": 2, "subtotal": 5.0}]}
+
+
+class Stop(Exception):
+    pass
+
+
+@pytest.fixture
+def conn(data_dir):
+    init_db(table_count=0, db_file="cafe.db")
+    c = sqlite3.connect("cafe.db")
+    _init_state(c)
+    yield c
+    c.close()
+
+
+@pytest.fixture
+def store(data_dir):
+    s = OrderStore("orders_data.json")
+    for n in range(1, 8):
+        s.append(order(n))
+    yield s
+    s.close()
+
+
+def quiet(message):
+    pass
+
+
+def item_rows(conn):
+    return conn.execute("SELECT COUNT(*) FROM order_items").fetchone()[0]
+
+
+def test_interrupted_run_resumes_without_duplicates(conn, store):
+    def stop_after_first_chunk(message):
+        raise Stop()
+    with pytest.raises(Stop):
+        migrate_orders(conn, store.path, chunk_size=3, progress=stop_after_first_chunk)
+    assert load_state(conn, "orders")["position"] == 3
+    migrate_orders(conn, store.path, chunk_size=3, progress=quiet)
+    assert conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0] == 7
+    assert item_rows(conn) == 7
+    assert verify(conn, store.path, {}) == []
+
+
+def test_orders_appended_after_a_finished_run_are_migrated(conn, store):
+    migrate_orders(conn, store.path, chunk_size=3, progress=quiet)
+    assert load_state(conn, "orders")["position"] == 7
+    store.append(order(8))
+    store.append(order(9))
+    migrate_orders(conn, store.path, chunk_size=3, progress=quiet)
+    assert load_state(conn, "orders")["position"] == 9
+    assert item_rows(conn) == 9
+    assert verify(conn, store.path, {}) == []
+
+
+def test_verify_recounts_the_source(conn, store):
+    with conn:
+        conn.execute("INSERT INTO orders (order_id, total) VALUES ('OLD00001', 99.0)")
+    migrate_orders(conn, store.path, progress=quiet)
+    assert verify(conn, store.path, {}) == []   # rows from before the migration are not counted
+    with conn:
+        conn.execute("DELETE FROM order_items WHERE order_id = 'ORD00004'")
+        conn.execute("DELETE FROM orders WHERE order_id = 'ORD00004'")
+    assert verify(conn, store.path, {}) == ["orders", "order_items", "item quantity", "revenue", "status"]
+
+
+def test_status_changed_after_migration_is_detected_and_migrated_again(conn, store):
+    migrate_orders(conn, store.path, progress=quiet)
+    store.update_many({"ORD00002": {"status": "Completed"}, "ORD00006": {"payment_status": "Paid"}})
+    migrate_orders(conn, store.path, progress=quiet)   # nothing appended: the checkpoint does not move
+    assert verify(conn, store.path, {}) == ["status"]
+    assert refresh_orders(conn, store.path, progress=quiet) == 2
+    assert conn.execute("SELECT status FROM orders WHERE order_id = 'ORD00002'").fetchone()[0] == "Completed"
+    assert item_rows(conn) == 7
+    assert verify(conn, store.path, {}) == []
+
+
+def test_stream_replays_an_interrupted_write_first(store, monkeypatch):
+    def torn(filepath, patches):
+        offset, data = patches[0]
+        with open(filepath, 'r+b') as f:
+            f.seek(offset)
+            f.write(data[:len(data) // 2])
+        raise Stop()
+    with monkeypatch.context() as m:
+        m.setattr(storage, "_apply_patches", torn)
+        with pytest.raises(Stop):
+            store.update("ORD00003", {"status": "Cancelled"})
+    fresh = {"position": 0, "byte_offset": None, "file_id": None}
+    assert [o["status"] for o, _, _ in iter_orders(store.path, fresh, chunk_size=2)][2] == "Cancelled"
+    assert not storage.journal_pending(store.path)
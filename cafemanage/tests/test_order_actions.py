@@ -0,0 +1,94 @@
+import glob
+import os
+
+import pytest
+
+import order_actions
+from order_actions import OutOfStock, change_orders, pending_path, settle_pending
+from order_store import OrderStore
+from storage import load_json, save_json
+
+MENU = "menu.json"
+
+
+def order(n, status="Pending", qty=2):
+    return {"id": f"ORD{n:05d}", "customer_name": "Priya", "status": status, "payment_status": "Unpaid",
+            "items": [{"id": "BEV001", "name": "Espresso", "quantity": qty}]}
+
+
+def stock():
+    return load_json(MENU)["beverages"][0]["inventory"]
+
+
+@pytest.fixture
+def store(data_dir):
+    save_json(MENU, {"beverages": [{"id": "BEV001", "name": "Espresso", "inventory": 10}], "food": []})
+    s = OrderStore("orders.json")
+    yield s
+    s.close()
+
+
+class Crash(Exception):
+    pass
+
+
+def crash(*args):
+    raise Crash()
+
+
+def test_cancel_restocks_and_reopen_deducts(store):
+    store.append(order(1))
+    store.append(order(2, status="Cancelled"))
+    updated, _, ids, restocked = change_orders(store, MENU, ["ORD00001"], status="Cancelled")
+    assert [o["status"] for o in updated] == ["Cancelled"] and ids == {"BEV001"} and restocked == 2
+    assert stock() == 12
+    change_orders(store, MENU, ["ORD00002"], status="Ready")
+    assert stock() == 10
+    # Already cancelled: no second restock.
+    assert change_orders(store, MENU, ["ORD00001"], cancel=True)[3] == 0
+    assert stock() == 10
+
+
+def test_reopen_without_stock_writes_nothing(store):
+    store.append(order(1, status="Cancelled", qty=11))
+    with pytest.raises(OutOfStock):
+        change_orders(store, MENU, ["ORD00001"], status="Pending")
+    assert store.get("ORD00001")["status"] == "Cancelled"
+    assert stock() == 10
+    assert not os.path.exists(pending_path(store.path))
+
+
+def test_crash_between_writes_is_settled(store, monkeypatch):
+    store.append(order(1))
+    with monkeypatch.context() as m:
+        m.setattr(order_actions, "save_json", crash)
+        with pytest.raises(Crash):
+            change_orders(store, MENU, ["ORD00001"], cancel=True)
+    assert store.get("ORD00001")["status"] == "Cancelled" and stock() == 10
+    updated, menu = settle_pending(store, MENU)
+    assert [o["id"] for o in updated] == ["ORD00001"] and menu is not None
+    assert stock() == 12
+    assert settle_pending(store, MENU) == ([], None)
+
+
+def test_crash_before_order_write_is_settled(store, monkeypatch):
+    store.append(order(1))
+    with monkeypatch.context() as m:
+        m.setattr(store, "update_many", crash)
+        with pytest.raises(Crash):
+            change_orders(store, MENU, ["ORD00001"], cancel=True)
+    settle_pending(store, MENU)
+    assert store.get("ORD00001")["status"] == "Cancelled" and stock() == 12
+
+
+def test_menu_edited_after_crash_is_set_aside(store, monkeypatch):
+    store.append(order(1))
+    with monkeypatch.context() as m:
+        m.setattr(order_actions, "save_json", crash)
+        with pytest.raises(Crash):
+            change_orders(store, MENU, ["ORD00001"], cancel=True)
+    save_json(MENU, {"beverages": [{"id": "BEV001", "name": "Espresso", "inventory": 3}], "food": []})
+    assert settle_pending(store, MENU) == ([], None)
+    assert stock() == 3
+    assert not os.path.exists(pending_path(store.path))
+    assert len(glob.glob(pending_path(store.path) + ".*.unresolved")) == 1
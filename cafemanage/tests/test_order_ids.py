@@ -0,0 +1,19 @@
+from order_ids import OrderIdAllocator, max_id_number
+from order_store import OrderStore
+
+
+def test_allocator_seeds_from_the_store_index(data_dir):
+    store = OrderStore("orders.json")
+    for oid in ["ORD00007", "ORD00012", "BLR00040"]:
+        store.append({"id": oid, "items": []})
+    allocator = OrderIdAllocator("seq.json", prefix="ORD", block_size=5,
+                                 seed=lambda prefix: max_id_number(store.ids(prefix), prefix))
+    assert [allocator.next_id() for _ in range(6)] == [f"ORD{n:05d}" for n in range(13, 19)]
+    assert store.ids("BLR") == ["BLR00040"]
+
+
+def test_ids_are_never_reused_across_allocators(data_dir):
+    first = OrderIdAllocator("seq.json", block_size=3)
+    second = OrderIdAllocator("seq.json", block_size=3)
+    ids = [first.next_id(), second.next_id(), first.next_id(), second.next_id()]
+    assert len(set(ids)) == 4
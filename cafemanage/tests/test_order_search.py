@@ -0,0 +1,54 @@
+from order_search import OrderSearchIndex
+
+
+def orders(n):
+    return [{"id": f"ORD{i:05d}", "customer_name": "Priya", "status": "Completed" if i == 1 else "Pending",
+             "date": "2026-01-02" if i == 2 else "2026-01-01", "timestamp": f"2026-01-01T00:{i:05d}",
+             "items": [{"name": "Latte"}]} for i in range(1, n + 1)]
+
+
+def test_filters_apply_before_the_limit(tmp_path):
+    index = OrderSearchIndex(str(tmp_path / "search.db"))
+    index.add(orders(50), (1, 1))
+    ids, total, windowed = index.search("priya latte", limit=10, status="Completed")
+    assert (ids, total, windowed) == (["ORD00001"], 1, False)
+    assert index.search("priya", limit=10, date="2026-01-02")[0] == ["ORD00002"]
+
+
+def test_browse_pages_newest_first_and_tracks_status_changes(tmp_path):
+    index = OrderSearchIndex(str(tmp_path / "search.db"))
+    data = orders(30)
+    index.add(data, (1, 1))
+    assert index.browse(limit=3) == ["ORD00030", "ORD00029", "ORD00028"]
+    assert index.browse("Pending", limit=2, offset=28) == ["ORD00002"]
+    assert index.count("Pending") == 29
+
+    data[4]["status"] = "Cancelled"
+    index.add([data[4]], (2, 1), previous_version=(1, 1))
+    assert index.browse("Cancelled") == ["ORD00005"]
+    assert index.is_current((2, 1)) and not index.is_current((1, 1))
+
+
+def test_catch_up_reindexes_orders_changed_outside_add(tmp_path):
+    index = OrderSearchIndex(str(tmp_path / "search.db"))
+    data = orders(10)
+    index.add(data, (1, 1))
+    data[2]["status"] = "Cancelled"          # e.g. settled by another worker at startup
+    data[3]["customer_name"] = "Arjun"
+    assert index.catch_up(data, (2, 1)) == 2
+    assert index.browse("Cancelled") == ["ORD00003"]
+    assert index.search("arjun")[0] == ["ORD00004"]
+    assert "ORD00004" not in index.search("priya")[0]
+    assert index.is_current((2, 1))
+
+
+def test_catch_up_drops_vanished_orders(tmp_path):
+    index = OrderSearchIndex(str(tmp_path / "search.db"))
+    data = orders(10)
+    index.add(data, (1, 1))
+    restored = data[:7]                      # a checkpoint restore lost the newest three
+    assert index.catch_up(restored, (2, 1)) == 3
+    assert index.count() == 7 and index.browse(limit=1) == ["ORD00007"]
+    assert index.search("ord00009")[0] == []
+    assert index.conn.execute("SELECT COUNT(*) FROM postings p LEFT JOIN orders o ON o.doc = p.doc "
+                              "WHERE o.doc IS NULL").fetchone()[0] == 0
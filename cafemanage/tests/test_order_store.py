@@ -0,0 +1,115 @@
+import json
+import os
+import threading
+
+import pytest
+
+import storage
+from order_store import OrderStore
+from storage import load_json
+
+
+def order(n, **extra):
+    return {"id": f"ORD{n:05d}", "customer_name": "Priya", "status": "Pending", "total": 7.5, **extra}
+
+
+@pytest.fixture
+def store(data_dir):
+    s = OrderStore("orders.json")
+    yield s
+    s.close()
+
+
+class Crash(Exception):
+    pass
+
+
+def crash_mid_patch(monkeypatch):
+    """Make the next in-place write stop halfway through its first patch."""
+    def torn(filepath, patches):
+        offset, data = patches[0]
+        with open(filepath, 'r+b') as f:
+            f.seek(offset)
+            f.write(data[:len(data) // 2])
+        raise Crash()
+    monkeypatch.setattr(storage, "_apply_patches", torn)
+
+
+def test_file_stays_a_json_array(store):
+    for n in range(1, 4):
+        store.append(order(n))
+    store.update("ORD00002", {"status": "Completed"})
+    assert [o["status"] for o in json.loads(open("orders.json", "rb").read())] == ["Pending", "Completed", "Pending"]
+    assert store.get("ORD00002")["status"] == "Completed"
+    assert store.get("ORD09999") is None
+
+
+def test_grown_record_rewrites_the_whole_batch(store):
+    store.append(order(1))
+    store.append(order(2))
+    updated = store.update_many({"ORD00001": {"note": "x" * 200}, "ORD00002": {"status": "Ready"}})
+    assert [o["id"] for o in updated] == ["ORD00001", "ORD00002"]
+    assert [o.get("note", o["status"]) for o in load_json("orders.json")] == ["x" * 200, "Ready"]
+    assert store.get("ORD00001")["note"] == "x" * 200
+
+
+def test_interrupted_update_is_finished_from_the_journal(store, data_dir, monkeypatch):
+    for n in range(1, 4):
+        store.append(order(n))
+    with monkeypatch.context() as m:
+        crash_mid_patch(m)
+        with pytest.raises(Crash):
+            store.update_many({"ORD00001": {"status": "Cancelled"}, "ORD00003": {"status": "Ready"}})
+
+    # No checkpoint is involved: any reader finishes the write.
+    assert [o["status"] for o in load_json("orders.json")] == ["Cancelled", "Pending", "Ready"]
+    assert not list(data_dir.glob("orders.json.corrupt-*"))
+    assert store.get("ORD00003")["status"] == "Ready"
+
+
+def test_interrupted_append_is_finished_by_the_next_writer(store, monkeypatch):
+    store.append(order(1))
+    with monkeypatch.context() as m:
+        crash_mid_patch(m)
+        with pytest.raises(Crash):
+            store.append(order(2))
+
+    reopened = OrderStore("orders.json", index_path="reopened.db")
+    reopened.append(order(3))
+    assert [o["id"] for o in reopened.load_all()] == ["ORD00001", "ORD00002", "ORD00003"]
+    reopened.close()
+
+
+def test_torn_journal_is_discarded(store):
+    store.append(order(1))
+    before = open("orders.json", "rb").read()
+    with open("orders.json.journal", "wb") as f:
+        f.write(storage.JOURNAL_MAGIC + b" 1 abc 999\n12 4\nJUNK")
+    assert storage.replay_journal("orders.json") is False
+    assert open("orders.json", "rb").read() == before
+    assert store.get("ORD00001")["status"] == "Pending"
+
+
+def test_checkpoint_is_taken_off_the_request_path(store, monkeypatch):
+    monkeypatch.setattr(storage, "_last_checkpoint", {})
+    monkeypatch.setattr(storage, "CHECKPOINT_INTERVAL", 0.0)
+    taken = []
+    real = storage.checkpoint_file
+    monkeypatch.setattr(storage, "checkpoint_file", lambda path: taken.append(threading.current_thread().name)
+                        or real(path))
+    store.append(order(1))
+    assert storage.wait_for_checkpoints(timeout=10)
+    assert taken == ["checkpointer"]
+    newest = storage.list_checkpoints(os.path.abspath("orders.json"))[0]
+    assert storage.read_checkpoint(newest) == open("orders.json", "rb").read()
+
+
+def test_checkpoint_waits_for_a_pending_journal(store, monkeypatch):
+    store.append(order(1))
+    with monkeypatch.context() as m:
+        crash_mid_patch(m)
+        with pytest.raises(Crash):
+            store.update("ORD00001", {"status": "Cancelled"})
+    assert storage.checkpoint_file("orders.json") is None   # would capture a half-applied patch
+    storage.replay_journal("orders.json")
+    assert storage.read_checkpoint(storage.checkpoint_file("orders.json")) == open("orders.json", "rb").read()
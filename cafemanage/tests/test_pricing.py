@@ -0,0 +1,84 @@
+import random
+
+from pricing import PriceBook, _allocate, _share, to_cents, validate_combos
+
+SETTINGS = {
+    "tax_rate": 0.10,
+    "service_charge": 0.05,
+    "category_tax_rates": {"beverages": 0.05, "food": 0.12, "Juice": 0.0},
+    "combos": [{"name": "Breakfast", "items": {"BEV003": 1, "FOOD001": 1}, "price": 5.5}]
+}
+
+
+def line(item_id, price, quantity=1, section="beverages", category="Coffee"):
+    return {"id": item_id, "price": price, "quantity": quantity, "subtotal": round(price * quantity, 2),
+            "section": section, "category": category}
+
+
+LATTE = line("BEV003", 4.00)
+CROISSANT = line("FOOD001", 2.50, section="food", category="Pastry")
+JUICE = line("BEV005", 3.00, category="Juice")
+
+
+def test_allocate_is_exact_and_proportional():
+    assert _allocate(100, {"a": 1, "b": 1, "c": 1}) == {"a": 34, "b": 33, "c": 33}
+    assert _allocate(7, {"a": 3, "b": 1}) == {"a": 5, "b": 2}
+    assert _allocate(0, {"a": 1}) == {} and _allocate(5, {"a": 0}) == {}
+    rng = random.Random(7)
+    for _ in range(200):
+        weights = {k: rng.randint(0, 1000) for k in "abcde"}
+        amount = rng.randint(0, 100000)
+        parts = _allocate(amount, weights)
+        if sum(weights.values()):
+            assert sum(parts.values()) == amount
+            assert all(abs(parts[k] - amount * w / sum(weights.values())) < 1 for k, w in weights.items())
+
+
+def test_share_rounds_half_up():
+    assert _share(250, 500) == 13   # 12.5 cents
+    assert _share(249, 500) == 12
+
+
+def test_category_rate_wins_over_section():
+    book = PriceBook(SETTINGS)
+    assert book.rate_for("beverages", "Coffee") == 0.05
+    assert book.rate_for("beverages", "Juice") == 0.0
+    assert book.rate_for("food", "Pastry") == 0.12
+    assert book.rate_for("other", "Other") == 0.10
+
+
+def test_combo_saving_is_taxed_at_each_items_rate():
+    quote = PriceBook(SETTINGS).cart([LATTE, CROISSANT]).quote()
+    # 6.50 of items for 5.50: the 1.00 saving splits 4:2.5 -> 0.62 beverages, 0.38 food.
+    assert quote["combo_savings"] == 1.0
+    assert quote["combos"] == [{"name": "Breakfast", "count": 1, "saving": 1.0}]
+    assert [(t["rate"], t["amount"]) for t in quote["tax_lines"]] == [(0.05, 0.17), (0.12, 0.25)]
+    assert quote["total"] == round(5.50 + 0.17 + 0.25 + 0.28, 2)
+
+
+def test_quote_adds_up_to_the_cent():
+    book = PriceBook(SETTINGS)
+    rng = random.Random(3)
+    for _ in range(100):
+        lines = [rng.choice([LATTE, CROISSANT, JUICE]) for _ in range(rng.randint(1, 6))]
+        quote = book.cart(lines).quote(discount=rng.choice([0, 0.99, 3.33, 100]))
+        cents = {k: to_cents(quote[k]) for k in ("subtotal", "combo_savings", "discount", "tax",
+                                                 "service_charge", "total")}
+        assert sum(to_cents(t["amount"]) for t in quote["tax_lines"]) == cents["tax"]
+        assert cents["total"] == (cents["subtotal"] - cents["combo_savings"] - cents["discount"]
+                                  + cents["tax"] + cents["service_charge"])
+        assert cents["total"] >= 0
+
+
+def test_removing_a_line_matches_a_fresh_cart():
+    book = PriceBook(SETTINGS)
+    quote = book.cart([LATTE, CROISSANT, JUICE])
+    quote.remove(CROISSANT)
+    assert quote.quote(0.5) == book.cart([LATTE, JUICE]).quote(0.5)
+
+
+def test_validate_combos():
+    menu = {"beverages": [{"id": "BEV003"}], "food": [{"id": "FOOD001"}]}
+    assert validate_combos(SETTINGS["combos"], menu) == []
+    errors = validate_combos([{"name": "Bad", "items": {"NOPE": 0}, "price": -1}], menu)
+    assert len(errors) == 3 and all(e.startswith("Bad: ") for e in errors)
@@ -0,0 +1,129 @@
+import sqlite3
+import urllib.error
+
+import pytest
+
+import postgrest_standin
+import replication
+from storage import load_json, save_json
+
+
+def make_worker(tmp_path, server, menu):
+    menu_file = str(tmp_path / "menu_data.json")
+    save_json(menu_file, menu)
+    queue = replication.ReplicationQueue(str(tmp_path / "queue.db"))
+    client = replication.PostgrestClient(f"http://127.0.0.1:{server.server_address[1]}")
+    return replication.ReplicationWorker(client, queue, menu_file), menu_file
+
+
+def test_deleted_item_reaches_other_tills(tmp_path, monkeypatch):
+    server = postgrest_standin.serve(port=0)
+    try:
+        menu = {"beverages": [{"id": "BEV001", "name": "Espresso", "price": 2.5}], "food": []}
+        (tmp_path / "a").mkdir()
+        (tmp_path / "b").mkdir()
+        till_a, _ = make_worker(tmp_path / "a", server, menu)
+        till_b, menu_b = make_worker(tmp_path / "b", server, menu)
+
+        monkeypatch.setattr(replication, "_worker", till_a)
+        monkeypatch.setattr(replication, "_queue", till_a.queue)
+        replication.record_menu(menu)
+        while till_a.push_once():
+            pass
+        till_b.pull_menu()
+        assert [i["id"] for i in load_json(menu_b)["beverages"]] == ["BEV001"]
+
+        replication.record_menu({}, deleted_ids=["BEV001"])
+        while till_a.push_once():
+            pass
+        till_b.pull_menu()
+        assert load_json(menu_b)["beverages"] == []
+    finally:
+        server.shutdown()
+
+
+def test_pull_skips_missing_menu_and_keeps_watermark(tmp_path):
+    server = postgrest_standin.serve(port=0)
+    try:
+        server.tables["menu_items"] = {"BEV001": {"id": "BEV001", "name": "Espresso", "updated_at": "1"}}
+        worker, menu_file = make_worker(tmp_path, server, {})
+        (tmp_path / "menu_data.json").unlink()
+        assert worker.pull_menu() == 0
+        assert worker.queue.get_meta("menu_items_watermark", "") == ""
+        assert load_json(menu_file) is None
+    finally:
+        server.shutdown()
+
+
+def test_outbox_errors_do_not_stop_the_worker(tmp_path, monkeypatch):
+    queue = replication.ReplicationQueue(str(tmp_path / "queue.db"))
+    worker = replication.ReplicationWorker(replication.PostgrestClient("http://127.0.0.1:9"), queue)
+    seen = []
+
+    def tick():
+        if not seen:
+            seen.append(None)
+            raise sqlite3.OperationalError("database is locked")
+        seen.append(worker.status()["last_error"])
+        worker._stop.set()
+        return 0
+
+    monkeypatch.setattr(worker, "run_once", tick)
+    monkeypatch.setattr(replication.random, "uniform", lambda a, b: 0.0)
+    worker._run()
+    assert seen == [None, "database is locked"]
+
+
+def test_soft_delete_and_upsert_in_one_batch_drain(tmp_path, monkeypatch):
+    server = postgrest_standin.serve(port=0)
+    try:
+        worker, _ = make_worker(tmp_path, server, {})
+        monkeypatch.setattr(replication, "_worker", worker)
+        monkeypatch.setattr(replication, "_queue", worker.queue)
+        replication.record_menu({"beverages": [{"id": "BEV002", "name": "Latte", "price": 4.0}]},
+                                deleted_ids=["BEV001"])
+        while worker.push_once():
+            pass
+        assert worker.queue.depth() == 0 and worker.queue.dead_letters() == 0
+        assert server.tables["menu_items"]["BEV001"]["deleted"] is True
+        assert server.tables["menu_items"]["BEV002"]["name"] == "Latte"
+    finally:
+        server.shutdown()
+
+
+class RejectingClient:
+    def __init__(self, code):
+        self.code = code
+        self.upserted = []
+
+    def upsert(self, table, rows, on_conflict):
+        if any(r.get("bad") for r in rows):
+            raise urllib.error.HTTPError("http://head-office", self.code, "Rejected", {}, None)
+        self.upserted.extend(rows)
+
+
+def test_rejected_batch_is_dead_lettered_and_the_queue_moves_on(tmp_path):
+    queue = replication.ReplicationQueue(str(tmp_path / "queue.db"))
+    worker = replication.ReplicationWorker(RejectingClient(422), queue)
+    queue.enqueue("orders", [{"id": "ORD00001", "bad": True}])
+    queue.enqueue("orders", [{"id": "ORD00002"}])
+    while worker.push_once():
+        pass
+    assert queue.depth() == 0 and queue.dead_letters() == 1
+    assert worker.client.upserted == [{"id": "ORD00002"}]
+
+
+def test_auth_errors_are_retried_not_dead_lettered(tmp_path):
+    queue = replication.ReplicationQueue(str(tmp_path / "queue.db"))
+    worker = replication.ReplicationWorker(RejectingClient(401), queue)
+    queue.enqueue("orders", [{"id": "ORD00001", "bad": True}])
+    with pytest.raises(urllib.error.HTTPError):
+        worker.push_once()
+    assert queue.depth() == 1 and queue.dead_letters() == 0
+
+
+def test_worker_needs_the_explicit_flag(monkeypatch):
+    monkeypatch.setenv("SUPABASE_URL", "http://127.0.0.1:9")
+    monkeypatch.delenv(replication.ENABLE_ENV, raising=False)
+    monkeypatch.setattr(replication, "_worker", None)
+    assert replication.start_worker() is None
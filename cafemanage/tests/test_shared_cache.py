@@ -0,0 +1,30 @@
+import glob
+import os
+
+import shared_cache
+from shared_cache import SharedCache
+from storage import save_json
+
+
+def test_blob_entries_are_evicted_from_disk(data_dir, monkeypatch):
+    monkeypatch.setattr(shared_cache, "MAX_BLOBS", 3)
+    cache = SharedCache("cache")
+    for n in range(6):
+        before = set(glob.glob("cache/menu_qr-*.bin"))
+        url = f"https://cafe.example/menu?v={n}"
+        assert cache.blob("menu_qr", url, lambda: url.encode("utf-8")) == url.encode("utf-8")
+        for path in set(glob.glob("cache/menu_qr-*.bin")) - before:
+            os.utime(path, (1000 + n, 1000 + n))   # distinct mtimes, whatever the clock resolution
+    assert len(glob.glob("cache/menu_qr-*.bin")) == 3
+    fresh = SharedCache("cache")   # another worker: reads what is left, rebuilds what was evicted
+    built = []
+    assert fresh.blob("menu_qr", "https://cafe.example/menu?v=5", lambda: built.append(5) or b"x") != b"x"
+    assert fresh.blob("menu_qr", "https://cafe.example/menu?v=0", lambda: built.append(0) or b"x") == b"x"
+    assert built == [0]
+
+
+def test_document_is_shared_and_follows_writes(data_dir):
+    save_json("settings.json", {"cafe_name": "A"})
+    assert SharedCache("cache").document("settings.json") == {"cafe_name": "A"}
+    save_json("settings.json", {"cafe_name": "B"})
+    assert SharedCache("cache").document("settings.json") == {"cafe_name": "B"}
@@ -0,0 +1,63 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import storage
+from storage import CorruptDataError, load_json, locked_json, recover_data_files, save_json
+
+
+@pytest.fixture(autouse=True)
+def checkpoint_every_write(monkeypatch):
+    monkeypatch.setattr(storage, "_last_checkpoint", {})
+    monkeypatch.setattr(storage, "CHECKPOINT_INTERVAL", 0.0)
+
+
+def test_round_trip_and_missing_file(data_dir):
+    assert load_json("menu.json") is None
+    save_json("menu.json", {"food": [{"id": "FOOD001", "price": 2.5}]})
+    assert load_json("menu.json") == {"food": [{"id": "FOOD001", "price": 2.5}]}
+
+
+def test_corrupt_file_is_restored_from_newest_checkpoint(data_dir):
+    save_json("orders.json", [{"id": "ORD00001"}])
+    save_json("orders.json", [{"id": "ORD00001"}, {"id": "ORD00002"}])
+    (data_dir / "orders.json").write_bytes(b'[{"id":"ORD0')
+
+    assert load_json("orders.json") == [{"id": "ORD00001"}, {"id": "ORD00002"}]
+    assert load_json("orders.json") == [{"id": "ORD00001"}, {"id": "ORD00002"}]
+    assert [p.name for p in data_dir.glob("orders.json.corrupt-*")]
+
+
+def test_corrupt_file_without_checkpoint_is_never_replaced(data_dir):
+    (data_dir / "orders.json").write_bytes(b'[{"id":"ORD0')
+
+    with pytest.raises(CorruptDataError):
+        load_json("orders.json")
+    with pytest.raises(CorruptDataError):
+        with locked_json("orders.json", []) as orders:
+            orders.append({"id": "ORD00003"})
+    assert (data_dir / "orders.json").read_bytes() == b'[{"id":"ORD0'
+
+
+def test_startup_sweep_keeps_temp_files_of_live_processes(data_dir):
+    save_json("menu.json", {})
+    exited = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                            capture_output=True, text=True).stdout.strip()
+    live = data_dir / f"menu.json.{os.getpid()}.1.tmp"
+    stale = data_dir / f"menu.json.{exited}.1.tmp"
+    live.write_bytes(b"{}")
+    stale.write_bytes(b"{}")
+
+    recover_data_files([str(data_dir / "menu.json")])
+
+    assert live.exists()
+    assert not stale.exists()
+
+
+def test_startup_restores_damaged_file(data_dir):
+    save_json("settings.json", {"tax_rate": 0.1})
+    (data_dir / "settings.json").write_bytes(b"{")
+    assert recover_data_files(["settings.json"]) == ["settings.json"]
+    assert load_json("settings.json") == {"tax_rate": 0.1}
@@ -0,0 +1,22 @@
+from table_state import apply_status_updates, default_tables, load_stats, resize_tables, summarize_stats
+from storage import load_json, save_json
+
+
+def test_shrinking_closes_occupancy_of_removed_tables(data_dir):
+    save_json("tables.json", default_tables(4))
+    apply_status_updates({"3": "Occupied", "4": "Reserved"}, "tables.json", now=1000.0)
+
+    assert resize_tables(2, "tables.json", now=1600.0) == 2
+
+    assert [t["table_number"] for t in load_json("tables.json")] == ["1", "2"]
+    stats = load_stats()
+    assert stats["tables"]["3"] == {"occupied_since": None, "occupied_seconds": 600.0, "turns": 1}
+    summary = summarize_stats(stats, 2, now=2200.0)
+    assert summary["per_table"]["3"]["utilisation"] == 600.0 / 1200.0
+
+
+def test_growing_writes_no_events(data_dir):
+    save_json("tables.json", default_tables(2))
+    resize_tables(5, "tables.json")
+    assert not (data_dir / "table_events.jsonl").exists()
+    assert len(load_json("tables.json")) == 5
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Multi-worker serving mode.
+
+Starts several Streamlit processes of cafe.py on consecutive ports, all
+serving one data directory. Every worker binds a socket in the bus directory
+and announces its data file writes to the others (invalidation.py), and
+rendered QR images are shared through memory-mapped cache entries
+(shared_cache.py). Crashed workers are restarted.
+
+A Streamlit session lives on one worker's websocket, so the proxy in front
+must keep each client on the same worker; --print-nginx writes a config
+that does this with ip_hash.
+
+Usage:
+    python workers.py --workers 4 --base-port 8501
+    python workers.py --workers 4 --data-dir /srv/cafe --print-nginx
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from invalidation import BUS_DIR_ENV
+
+BUS_DIR = ".workers"
+RESTART_BACKOFF = [1, 2, 5, 10, 30]
+
+NGINX_TEMPLATE = """\
+upstream cafe {{
+    ip_hash;   # a Streamlit session must stay on one worker
+{servers}
+}}
+
+server {{
+    listen 80;
+    location / {{
+        proxy_pass http://cafe;
+        proxy_http_version 1.1;
+        proxy_set_header Upgrade $http_upgrade;
+        proxy_set_header Connection "upgrade";
+        proxy_set_header Host $host;
+        proxy_read_timeout 86400;
+    }}
+}}
+"""
+
+
+def nginx_config(ports, host="127.0.0.1"):
+    return NGINX_TEMPLATE.format(servers="\n".join(f"    server {host}:{port};" for port in ports))
+
+
+def worker_command(port, address):
+    return [sys.executable, "-m", "streamlit", "run", os.path.join(HERE, "cafe.py"),
+            "--server.port", str(port), "--server.address", address,
+            "--server.headless", "true", "--server.fileWatcherType", "none",
+            "--browser.gatherUsageStats", "false"]
+
+
+def worker_env(worker_id, bus_dir):
+    env = dict(os.environ, CAFE_WORKER_ID=str(worker_id))
+    env[BUS_DIR_ENV] = bus_dir
+    # One metrics endpoint per worker: CAFE_METRICS_PORT + worker id.
+    if os.getenv("CAFE_METRICS_PORT"):
+        env["CAFE_METRICS_PORT"] = str(int(os.environ["CAFE_METRICS_PORT"]) + worker_id)
+    return env
+
+
+class Supervisor:
+    """Start the workers and restart any that exit, with backoff."""
+
+    def __init__(self, n_workers, base_port, data_dir, address):
+        self.ports = [base_port + i for i in range(n_workers)]
+        self.data_dir = data_dir
+        self.address = address
+        self.bus_dir = os.path.abspath(os.path.join(data_dir, BUS_DIR))
+        self.procs = {}
+        self.restarts = {i: 0 for i in range(n_workers)}
+        self.next_start = {i: 0.0 for i in range(n_workers)}
+        self.stopping = False
+
+    def start_worker(self, worker_id):
+        port = self.ports[worker_id]
+        self.procs[worker_id] = subprocess.Popen(worker_command(port, self.address), cwd=self.data_dir,
+                                                 env=worker_env(worker_id, self.bus_dir))
+        print(f"worker {worker_id}: pid {self.procs[worker_id].pid} on port {port}")
+
+    def run(self):
+        os.makedirs(self.bus_dir, exist_ok=True)
+        for worker_id in range(len(self.ports)):
+            self.start_worker(worker_id)
+        while not self.stopping:
+            time.sleep(1)
+            for worker_id, proc in list(self.procs.items()):
+                if proc.poll() is None:
+                    continue
+                now = time.time()
+                if self.next_start[worker_id] == 0.0:
+                    backoff = RESTART_BACKOFF[min(self.restarts[worker_id], len(RESTART_BACKOFF) - 1)]
+                    print(f"worker {worker_id}: exited with {proc.returncode}, restarting in {backoff}s")
+                    self.next_start[worker_id] = now + backoff
+                elif now >= self.next_start[worker_id] and not self.stopping:
+                    self.restarts[worker_id] += 1
+                    self.next_start[worker_id] = 0.0
+                    self.start_worker(worker_id)
+
+    def stop(self, *_):
+        self.stopping = True
+        for proc in self.procs.values():
+            if proc.poll() is None:
+                proc.terminate()
+        for proc in self.procs.values():
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run cafe.py as several Streamlit workers")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--base-port", type=int, default=8501)
+    parser.add_argument("--address", default="127.0.0.1")
+    parser.add_argument("--data-dir", default=".")
+    parser.add_argument("--print-nginx", action="store_true", help="print a proxy config and exit")
+    args = parser.parse_args()
+
+    supervisor = Supervisor(args.workers, args.base_port, os.path.abspath(args.data_dir), args.address)
+    if args.print_nginx:
+        print(nginx_config(supervisor.ports, args.address))
+        return
+    signal.signal(signal.SIGTERM, supervisor.stop)
+    signal.signal(signal.SIGINT, supervisor.stop)
+    supervisor.run()
+
+
+if __name__ == "__main__":
+    main()